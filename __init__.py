@@ -16,234 +16,56 @@ import aiohttp.web
 import server
 from pathlib import Path
 
-# 首位菜单分组：大炮 AI 主力维护节点
-from .gpt_image_2_allround_node import (
-    NODE_CLASS_MAPPINGS as PRIMARY_MAINTENANCE_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as PRIMARY_MAINTENANCE_DISPLAY_MAPPINGS
-)
-
-from .banana_allround_node import (
-    NODE_CLASS_MAPPINGS as BANANA_ALLROUND_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as BANANA_ALLROUND_DISPLAY_MAPPINGS,
-)
-
-from .seedream_v5_pro_allround_node import (
-    NODE_CLASS_MAPPINGS as SEEDREAM_V5_PRO_ALLROUND_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as SEEDREAM_V5_PRO_ALLROUND_DISPLAY_MAPPINGS,
-)
-
-from .seedream_v5_pro_layer_decomposition_node import (
-    NODE_CLASS_MAPPINGS as SEEDREAM_V5_PRO_LAYER_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as SEEDREAM_V5_PRO_LAYER_DISPLAY_MAPPINGS,
-)
-
-from .gpt_llm_chat_node import (
-    NODE_CLASS_MAPPINGS as GPT_LLM_CHAT_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as GPT_LLM_CHAT_DISPLAY_MAPPINGS,
-)
-
-from .h3_video_prompt_node import (
-    NODE_CLASS_MAPPINGS as H3_VIDEO_PROMPT_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as H3_VIDEO_PROMPT_DISPLAY_MAPPINGS,
-)
-
-from .h3_prompt_box_node import (
-    NODE_CLASS_MAPPINGS as H3_PROMPT_BOX_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as H3_PROMPT_BOX_DISPLAY_MAPPINGS,
-)
-
-from .seedance20_director_node import (
-    NODE_CLASS_MAPPINGS as SEEDANCE20_DIRECTOR_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as SEEDANCE20_DIRECTOR_DISPLAY_MAPPINGS,
-)
-
-from .image_prompt_director_node import (
-    NODE_CLASS_MAPPINGS as IMAGE_PROMPT_DIRECTOR_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as IMAGE_PROMPT_DIRECTOR_DISPLAY_MAPPINGS,
-)
-
-from .visual_style_prompt_node import (
-    NODE_CLASS_MAPPINGS as VISUAL_STYLE_PROMPT_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as VISUAL_STYLE_PROMPT_DISPLAY_MAPPINGS,
-)
-
-from .detail_flow_prompt_node import (
-    NODE_CLASS_MAPPINGS as DETAIL_FLOW_PROMPT_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as DETAIL_FLOW_PROMPT_DISPLAY_MAPPINGS,
-)
-
-from .music3_caption_prompt_node import (
-    NODE_CLASS_MAPPINGS as MUSIC3_CAPTION_PROMPT_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as MUSIC3_CAPTION_PROMPT_DISPLAY_MAPPINGS,
-)
-
-from .seedance20_allround_video_node import (
-    NODE_CLASS_MAPPINGS as SEEDANCE20_ALLROUND_VIDEO_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as SEEDANCE20_ALLROUND_VIDEO_DISPLAY_MAPPINGS,
-)
-
-# 加载Gemini 3多功能节点
-from .gemini3_nodes import (
-    NODE_CLASS_MAPPINGS as GEMINI3_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as GEMINI3_DISPLAY_MAPPINGS
-)
-
-# 加载通用API调用节点
-from .universal_api_node import (
-    NODE_CLASS_MAPPINGS as UNIVERSAL_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as UNIVERSAL_DISPLAY_MAPPINGS
-)
-
-# 加载通用图像生成（文生图）节点
-from .universal_text_to_image_node import (
-    NODE_CLASS_MAPPINGS as UNIVERSAL_TEXT_TO_IMAGE_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as UNIVERSAL_TEXT_TO_IMAGE_DISPLAY_MAPPINGS
-)
-
-# 加载通用图像生成（图像编辑）节点
-from .universal_image_edit_node import (
-    NODE_CLASS_MAPPINGS as UNIVERSAL_IMAGE_EDIT_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as UNIVERSAL_IMAGE_EDIT_DISPLAY_MAPPINGS
-)
-
-# 加载图像编辑API节点
-from .image_edit_api_node import (
-    NODE_CLASS_MAPPINGS as IMAGE_EDIT_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as IMAGE_EDIT_DISPLAY_MAPPINGS
-)
-
-# 加载 RH 全能图片节点
-from .rh_all_image_node import (
-    NODE_CLASS_MAPPINGS as RH_ALL_IMAGE_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as RH_ALL_IMAGE_DISPLAY_MAPPINGS
-)
-
-# 加载 RH 全能图片多并发节点
-from .rh_all_image_concurrent_node import (
-    NODE_CLASS_MAPPINGS as RH_ALL_IMAGE_CONCURRENT_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as RH_ALL_IMAGE_CONCURRENT_DISPLAY_MAPPINGS
-)
-
-# 加载 RH 全能视频 Seedance2.0 节点
-from .rh_all_video_seedance_node import (
-    NODE_CLASS_MAPPINGS as RH_ALL_VIDEO_SEEDANCE_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as RH_ALL_VIDEO_SEEDANCE_DISPLAY_MAPPINGS
-)
-
-# 加载 RH Seedance2.0 Mini 节点
-from .rh_seedance20_mini_node import (
-    NODE_CLASS_MAPPINGS as RH_SEEDANCE20_MINI_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as RH_SEEDANCE20_MINI_DISPLAY_MAPPINGS
-)
-
-# 加载 RH 全能视频 V3.1 节点
-from .rh_all_video_v31_node import (
-    NODE_CLASS_MAPPINGS as RH_ALL_VIDEO_V31_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as RH_ALL_VIDEO_V31_DISPLAY_MAPPINGS
-)
-
-# 加载 RH 全能视频 X-video3 节点
-from .rh_all_video_x_video3_node import (
-    NODE_CLASS_MAPPINGS as RH_ALL_VIDEO_XVIDEO3_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as RH_ALL_VIDEO_XVIDEO3_DISPLAY_MAPPINGS
-)
-
-# 加载 RH Seedance2.0 素材节点
-from .rh_seedance_asset_node import (
-    NODE_CLASS_MAPPINGS as RH_SEEDANCE_ASSET_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as RH_SEEDANCE_ASSET_DISPLAY_MAPPINGS
-)
-
-# 加载 RH 视频超清节点
-from .rh_video_enhance_node import (
-    NODE_CLASS_MAPPINGS as RH_VIDEO_ENHANCE_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as RH_VIDEO_ENHANCE_DISPLAY_MAPPINGS
-)
-
-# 加载 RH LLM 智能对话节点
-from .rh_llm_chat_node import (
-    NODE_CLASS_MAPPINGS as RH_LLM_CHAT_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as RH_LLM_CHAT_DISPLAY_MAPPINGS
-)
-
-# 加载 RH 批量 LLM 提示词节点
-from .rh_batch_llm_prompt_node import (
-    NODE_CLASS_MAPPINGS as RH_BATCH_LLM_PROMPT_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as RH_BATCH_LLM_PROMPT_DISPLAY_MAPPINGS
-)
-
-# 加载 RH 应用节点
-from .rh_app_node import (
-    NODE_CLASS_MAPPINGS as RH_APP_MAPPINGS,
-    NODE_DISPLAY_NAME_MAPPINGS as RH_APP_DISPLAY_MAPPINGS,
-    fetch_rh_app_schema,
-    upload_rh_app_file,
-)
+from .node_registry_utils import LazyNodeRegistry, eager_import_requested
+from .prewarm_utils import start_prewarm
+
+# 节点模块按菜单分组顺序登记；启动时只静态读取节点名称，
+# 首次使用（INPUT_TYPES 或执行）时才真正导入模块。
+NODE_MODULES = [
+    # 首位菜单分组：大炮 AI 主力维护节点
+    "gpt_image_2_allround_node",
+    "banana_allround_node",
+    "seedream_v5_pro_allround_node",
+    "seedream_v5_pro_layer_decomposition_node",
+    "gpt_llm_chat_node",
+    "seedance20_allround_video_node",
+    # 大炮 API 常用工具
+    "h3_video_prompt_node",
+    "h3_prompt_box_node",
+    "seedance20_director_node",
+    "visual_style_prompt_node",
+    "detail_flow_prompt_node",
+    "music3_caption_prompt_node",
+    "image_prompt_director_node",
+    # API 通用工具
+    "gemini3_nodes",
+    "universal_api_node",
+    "universal_text_to_image_node",
+    "universal_image_edit_node",
+    "image_edit_api_node",
+    # RH 功能专区
+    "rh_all_image_node",
+    "rh_all_image_concurrent_node",
+    "rh_all_video_seedance_node",
+    "rh_seedance20_mini_node",
+    "rh_all_video_v31_node",
+    "rh_all_video_x_video3_node",
+    "rh_seedance_asset_node",
+    "rh_video_enhance_node",
+    "rh_llm_chat_node",
+    "rh_batch_llm_prompt_node",
+    "rh_app_node",
+]
+
+NODE_REGISTRY = LazyNodeRegistry(__name__, str(Path(__file__).resolve().parent))
+for _module_name in NODE_MODULES:
+    NODE_REGISTRY.register(_module_name)
+if eager_import_requested():
+    NODE_REGISTRY.load_all()
 
 # 合并所有节点映射
-NODE_CLASS_MAPPINGS = {
-    **PRIMARY_MAINTENANCE_MAPPINGS,
-    **BANANA_ALLROUND_MAPPINGS,
-    **SEEDREAM_V5_PRO_ALLROUND_MAPPINGS,
-    **SEEDREAM_V5_PRO_LAYER_MAPPINGS,
-    **GPT_LLM_CHAT_MAPPINGS,
-    **SEEDANCE20_ALLROUND_VIDEO_MAPPINGS,
-    **H3_VIDEO_PROMPT_MAPPINGS,
-    **H3_PROMPT_BOX_MAPPINGS,
-    **SEEDANCE20_DIRECTOR_MAPPINGS,
-    **VISUAL_STYLE_PROMPT_MAPPINGS,
-    **DETAIL_FLOW_PROMPT_MAPPINGS,
-    **MUSIC3_CAPTION_PROMPT_MAPPINGS,
-    **IMAGE_PROMPT_DIRECTOR_MAPPINGS,
-    **GEMINI3_MAPPINGS,
-    **UNIVERSAL_MAPPINGS,
-    **UNIVERSAL_TEXT_TO_IMAGE_MAPPINGS,
-    **UNIVERSAL_IMAGE_EDIT_MAPPINGS,
-    **IMAGE_EDIT_MAPPINGS,
-    **RH_ALL_IMAGE_MAPPINGS,
-    **RH_ALL_IMAGE_CONCURRENT_MAPPINGS,
-    **RH_ALL_VIDEO_SEEDANCE_MAPPINGS,
-    **RH_SEEDANCE20_MINI_MAPPINGS,
-    **RH_ALL_VIDEO_V31_MAPPINGS,
-    **RH_ALL_VIDEO_XVIDEO3_MAPPINGS,
-    **RH_SEEDANCE_ASSET_MAPPINGS,
-    **RH_VIDEO_ENHANCE_MAPPINGS,
-    **RH_LLM_CHAT_MAPPINGS,
-    **RH_BATCH_LLM_PROMPT_MAPPINGS,
-    **RH_APP_MAPPINGS,
-}
-
-NODE_DISPLAY_NAME_MAPPINGS = {
-    **PRIMARY_MAINTENANCE_DISPLAY_MAPPINGS,
-    **BANANA_ALLROUND_DISPLAY_MAPPINGS,
-    **SEEDREAM_V5_PRO_ALLROUND_DISPLAY_MAPPINGS,
-    **SEEDREAM_V5_PRO_LAYER_DISPLAY_MAPPINGS,
-    **GPT_LLM_CHAT_DISPLAY_MAPPINGS,
-    **SEEDANCE20_ALLROUND_VIDEO_DISPLAY_MAPPINGS,
-    **H3_VIDEO_PROMPT_DISPLAY_MAPPINGS,
-    **H3_PROMPT_BOX_DISPLAY_MAPPINGS,
-    **SEEDANCE20_DIRECTOR_DISPLAY_MAPPINGS,
-    **VISUAL_STYLE_PROMPT_DISPLAY_MAPPINGS,
-    **DETAIL_FLOW_PROMPT_DISPLAY_MAPPINGS,
-    **MUSIC3_CAPTION_PROMPT_DISPLAY_MAPPINGS,
-    **IMAGE_PROMPT_DIRECTOR_DISPLAY_MAPPINGS,
-    **GEMINI3_DISPLAY_MAPPINGS,
-    **UNIVERSAL_DISPLAY_MAPPINGS,
-    **UNIVERSAL_TEXT_TO_IMAGE_DISPLAY_MAPPINGS,
-    **UNIVERSAL_IMAGE_EDIT_DISPLAY_MAPPINGS,
-    **IMAGE_EDIT_DISPLAY_MAPPINGS,
-    **RH_ALL_IMAGE_DISPLAY_MAPPINGS,
-    **RH_ALL_IMAGE_CONCURRENT_DISPLAY_MAPPINGS,
-    **RH_ALL_VIDEO_SEEDANCE_DISPLAY_MAPPINGS,
-    **RH_SEEDANCE20_MINI_DISPLAY_MAPPINGS,
-    **RH_ALL_VIDEO_V31_DISPLAY_MAPPINGS,
-    **RH_ALL_VIDEO_XVIDEO3_DISPLAY_MAPPINGS,
-    **RH_SEEDANCE_ASSET_DISPLAY_MAPPINGS,
-    **RH_VIDEO_ENHANCE_DISPLAY_MAPPINGS,
-    **RH_LLM_CHAT_DISPLAY_MAPPINGS,
-    **RH_BATCH_LLM_PROMPT_DISPLAY_MAPPINGS,
-    **RH_APP_DISPLAY_MAPPINGS,
-}
+NODE_CLASS_MAPPINGS = dict(NODE_REGISTRY.class_mappings)
+NODE_DISPLAY_NAME_MAPPINGS = dict(NODE_REGISTRY.display_mappings)
 
 # 声明 Web 目录，用于加载 JavaScript 扩展
 WEB_DIRECTORY = "./web"
@@ -253,13 +75,18 @@ async def get_rh_app_schema(request: aiohttp.web.Request):
     body = {}
     try:
         body = await request.json()
+        rh_app_node = await asyncio.to_thread(NODE_REGISTRY.load_module, "rh_app_node")
         result = await asyncio.to_thread(
-            fetch_rh_app_schema,
+            rh_app_node.get_rh_app_schema,
             body.get("api_channel", "国内版"),
             body.get("api_key", ""),
             body.get("webapp_id", ""),
             30,
+            bool(body.get("refresh")),
         )
+        # 界面已应用的参数与当前结果一致时只回传 etag，避免重建控件
+        if body.get("etag") and body.get("etag") == result.get("etag"):
+            return aiohttp.web.json_response({"unchanged": True, "etag": result["etag"]})
         return aiohttp.web.json_response(result)
     except Exception as error:
         message = str(error)
@@ -269,34 +96,173 @@ async def get_rh_app_schema(request: aiohttp.web.Request):
         return aiohttp.web.json_response({"error": message}, status=400)
 
 
+@server.PromptServer.instance.routes.get("/dapao/rh-concurrent/stragglers")
+async def get_rh_concurrent_stragglers(request: aiohttp.web.Request):
+    # 多并发节点超过掉队截止时间后转入后台的任务，完成后可在此取回 taskId 与图片链接
+    module = await asyncio.to_thread(NODE_REGISTRY.load_module, "rh_all_image_concurrent_node")
+    return aiohttp.web.json_response({"stragglers": module.straggler_results()})
+
+
+def _metrics_text():
+    from .asset_cache_utils import asset_cache
+    from .download_cache_utils import download_cache
+    from .metrics_utils import prometheus_gauge, prometheus_text
+    from .relay_policy_utils import breaker_snapshot, snapshot
+
+    limiters = snapshot()
+    breaker_states = {"closed": 0, "half_open": 1, "open": 2}
+    parts = [prometheus_text()]
+    for field, help_text in (
+        ("limit", "Current concurrency limit per provider and key."),
+        ("in_flight", "Requests holding a governor slot."),
+        ("waiting", "Requests waiting for a governor slot."),
+        ("rate_limited", "429 responses seen by the governor."),
+        ("max_wait_seconds", "Longest governor slot wait."),
+    ):
+        parts.append(prometheus_gauge(
+            f"dapao_governor_{field}",
+            help_text,
+            [({"provider": item["provider"], "key": item["key"]}, item[field]) for item in limiters],
+        ))
+    parts.append(prometheus_gauge(
+        "dapao_circuit_state",
+        "Circuit breaker state per host (0 closed, 1 half open, 2 open).",
+        [({"host": item["host"]}, breaker_states.get(item["state"], 0)) for item in breaker_snapshot()],
+    ))
+    cache = asset_cache.snapshot()
+    parts.append(prometheus_gauge(
+        "dapao_asset_cache",
+        "Seedance asset metadata cache entries and lookups.",
+        [({"field": field}, cache[field]) for field in ("entries", "hits", "misses")],
+    ))
+    downloads = download_cache.snapshot()
+    parts.append(prometheus_gauge(
+        "dapao_download_cache",
+        "Downloaded result media cache size and lookups.",
+        [({"field": field}, downloads[field]) for field in ("entries", "bytes", "hits", "misses", "evictions")],
+    ))
+    parts.append(prometheus_gauge(
+        "dapao_module_import_seconds",
+        "Import time of node modules loaded so far.",
+        [({"module": module_name}, f"{seconds:.6f}") for module_name, seconds in NODE_REGISTRY.import_profile()],
+    ))
+    return "".join(parts)
+
+
+@server.PromptServer.instance.routes.get("/dapao/metrics")
+async def get_dapao_metrics(request: aiohttp.web.Request):
+    # Prometheus 文本格式：各节点阶段耗时、请求耗时、并发调度与熔断状态
+    text = await asyncio.to_thread(_metrics_text)
+    return aiohttp.web.Response(
+        body=text.encode("utf-8"),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+def _broadcast_prewarm(report):
+    from .prewarm_utils import PREWARM_EVENT
+
+    try:
+        server.PromptServer.instance.send_sync(PREWARM_EVENT, report)
+    except Exception as error:
+        print(f"[dapaoAPI-连接预热] 错误：发送预热结果失败：{error}")
+
+
+@server.PromptServer.instance.routes.get("/dapao/prewarm")
+async def get_dapao_prewarm(request: aiohttp.web.Request):
+    # 启动时后台预热的结果：各主机 DNS 与连接耗时、是否可达
+    from .prewarm_utils import prewarm_report
+
+    return aiohttp.web.json_response(prewarm_report())
+
+
+@server.PromptServer.instance.routes.post("/dapao/prewarm")
+async def run_dapao_prewarm(request: aiohttp.web.Request):
+    # 重新预热一次（例如切换代理或网络之后），返回新的结果
+    from .prewarm_utils import prewarmer
+
+    report = await asyncio.to_thread(prewarmer.run)
+    return aiohttp.web.json_response(report)
+
+
+start_prewarm(_broadcast_prewarm)
+
+
+def _usage_report(group_by, days, provider, recent):
+    from .usage_ledger_utils import ledger
+
+    report = {"group_by": group_by, "days": days, "rows": ledger.aggregate(group_by, days, provider)}
+    if recent:
+        report["recent"] = ledger.recent(recent)
+    return report
+
+
+@server.PromptServer.instance.routes.get("/dapao/usage")
+async def get_dapao_usage(request: aiohttp.web.Request):
+    # 用量账本汇总：默认按天和模型分组统计最近 30 天的任务数、消耗与耗时
+    try:
+        group_by = [name.strip() for name in request.query.get("group", "day,model").split(",") if name.strip()]
+        days = int(request.query.get("days", 30))
+        recent = int(request.query.get("recent", 0))
+        report = await asyncio.to_thread(_usage_report, group_by, days, request.query.get("provider"), recent)
+        return aiohttp.web.json_response(report)
+    except Exception as error:
+        return aiohttp.web.json_response({"error": str(error)}, status=400)
+
+
+RH_APP_UPLOAD_PROGRESS_EVENT = "dapao.rh_app.upload_progress"
+
+
+def _declared_upload_size(values):
+    try:
+        size = int(values.get("file_size", ""))
+    except (TypeError, ValueError):
+        return None
+    return size if size >= 0 else None
+
+
 @server.PromptServer.instance.routes.post("/dapao/rh-app/upload")
 async def upload_rh_app_media(request: aiohttp.web.Request):
+    # 文本字段需排在 file 字段之前；文件按块直接转发给 RunningHub，不在内存中整体缓存
     values = {}
-    file_content = b""
+    file_name = ""
     filename = "upload.bin"
-    mime_type = "application/octet-stream"
     try:
         reader = await request.multipart()
+        rh_app_node = await asyncio.to_thread(NODE_REGISTRY.load_module, "rh_app_node")
         while True:
             field = await reader.next()
             if field is None:
                 break
-            if field.name == "file":
-                file_content = await field.read(decode=False)
-                filename = Path(field.filename or filename).name
-                mime_type = field.headers.get("Content-Type") or mime_type
-            else:
+            if field.name != "file":
                 values[field.name] = await field.text()
-
-        file_name = await asyncio.to_thread(
-            upload_rh_app_file,
-            values.get("api_channel", "国内版"),
-            values.get("api_key", ""),
-            file_content,
-            filename,
-            mime_type,
-            180,
-        )
+                continue
+            if file_name:
+                await field.release()
+                continue
+            filename = Path(field.filename or filename).name
+            upload_id = values.get("upload_id", "")
+
+            def _progress(sent, total, upload_id=upload_id):
+                if upload_id:
+                    server.PromptServer.instance.send_sync(RH_APP_UPLOAD_PROGRESS_EVENT, {
+                        "upload_id": upload_id,
+                        "sent": sent,
+                        "total": total,
+                    })
+
+            file_name = await rh_app_node.stream_rh_app_upload(
+                values.get("api_channel", "国内版"),
+                values.get("api_key", ""),
+                rh_app_node.iter_multipart_field(field),
+                filename,
+                field.headers.get("Content-Type") or "application/octet-stream",
+                size=_declared_upload_size(values),
+                progress=_progress,
+                timeout=180,
+            )
+        if not file_name:
+            raise ValueError("上传素材内容为空。")
         return aiohttp.web.json_response({"fileName": file_name, "originalName": filename})
     except Exception as error:
         message = str(error)
@@ -308,22 +274,30 @@ async def upload_rh_app_media(request: aiohttp.web.Request):
 __all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS', 'WEB_DIRECTORY']
 
 # 启动信息
+def _node_count(*module_names):
+    return sum(len(NODE_REGISTRY.module_nodes.get(module_name, [])) for module_name in module_names)
+
+
 print("=" * 60)
 print("  🎨 大炮 API (dapaoAPI) 节点加载完成!")
 print("=" * 60)
-print(f"  💎 Gemini 3多功能：{len(GEMINI3_MAPPINGS)} 个")
-print(f"  🌐 通用API调用：{len(UNIVERSAL_MAPPINGS)} 个")
-print(f"  🎨 图像编辑API：{len(IMAGE_EDIT_MAPPINGS)} 个")
-print(f"  🌈 RH 全能图片：{len(RH_ALL_IMAGE_MAPPINGS)} 个")
-print(f"  🌈 RH 全能图片多并发：{len(RH_ALL_IMAGE_CONCURRENT_MAPPINGS)} 个")
-print(f"  🎉 RH 全能视频 Seedance2.0：{len(RH_ALL_VIDEO_SEEDANCE_MAPPINGS)} 个")
-print(f"  🎉 RH Seedance2.0 Mini：{len(RH_SEEDANCE20_MINI_MAPPINGS)} 个")
-print(f"  🎉 RH 全能视频 V3.1：{len(RH_ALL_VIDEO_V31_MAPPINGS)} 个")
-print(f"  🎉 RH 全能视频 X-video3：{len(RH_ALL_VIDEO_XVIDEO3_MAPPINGS)} 个")
-print(f"  📦 RH Seedance2.0素材：{len(RH_SEEDANCE_ASSET_MAPPINGS)} 个")
-print(f"  🎉 RH 视频超清：{len(RH_VIDEO_ENHANCE_MAPPINGS)} 个")
-print(f"  🪲 RH 应用：{len(RH_APP_MAPPINGS)} 个")
+print(f"  💎 Gemini 3多功能：{_node_count('gemini3_nodes')} 个")
+print(f"  🌐 通用API调用：{_node_count('universal_api_node')} 个")
+print(f"  🎨 图像编辑API：{_node_count('image_edit_api_node')} 个")
+print(f"  🌈 RH 全能图片：{_node_count('rh_all_image_node')} 个")
+print(f"  🌈 RH 全能图片多并发：{_node_count('rh_all_image_concurrent_node')} 个")
+print(f"  🎉 RH 全能视频 Seedance2.0：{_node_count('rh_all_video_seedance_node')} 个")
+print(f"  🎉 RH Seedance2.0 Mini：{_node_count('rh_seedance20_mini_node')} 个")
+print(f"  🎉 RH 全能视频 V3.1：{_node_count('rh_all_video_v31_node')} 个")
+print(f"  🎉 RH 全能视频 X-video3：{_node_count('rh_all_video_x_video3_node')} 个")
+print(f"  📦 RH Seedance2.0素材：{_node_count('rh_seedance_asset_node')} 个")
+print(f"  🎉 RH 视频超清：{_node_count('rh_video_enhance_node')} 个")
+print(f"  🪲 RH 应用：{_node_count('rh_app_node')} 个")
 print(f"  ✅ 总计：{len(NODE_CLASS_MAPPINGS)} 个节点")
+if eager_import_requested():
+    NODE_REGISTRY.print_import_profile()
+else:
+    print("  ⚡ 节点模块按需加载，设置 DAPAO_EAGER_IMPORT=1 可在启动时全部导入并查看导入耗时")
 print(f"  👨‍🏫 作者：@炮老师的小课堂")
 print(f"  🎨 主题：紫色标题栏 + 橙棕色背景")
 print("=" * 60)
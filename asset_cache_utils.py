@@ -0,0 +1,201 @@
+"""Persistent metadata cache for RunningHub Seedance asset IDs.
+
+Once an asset reaches a terminal state (ACTIVE and friends, or a failure) its
+type, status and dimensions no longer change, yet pipelines reuse the same
+asset IDs across many video generations and every run asked ``/assets/query``
+again.  ``asset_cache`` keeps terminal results in ``seedance_asset_cache.json``
+next to this file; pending assets are never cached, so polling after creation
+still reaches the API.
+
+``lookup_many`` resolves a list of IDs in order, answering hits from the cache
+and fetching the misses concurrently.
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+CACHE_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "seedance_asset_cache.json")
+# 预览链接可能是带时效的签名地址，缓存条目一天后重新查询
+CACHE_TTL_SECONDS = 24 * 3600
+MAX_CACHE_ENTRIES = 5000
+MAX_PARALLEL_LOOKUPS = 4
+
+ASSET_READY_STATUSES = {"ACTIVE", "SUCCESS", "SUCCEEDED", "COMPLETED", "DONE", "READY", "AVAILABLE"}
+ASSET_FAILED_STATUSES = {"FAILED", "ERROR", "CANCEL", "CANCELED"}
+TERMINAL_ASSET_STATUSES = ASSET_READY_STATUSES | ASSET_FAILED_STATUSES
+
+
+def _log_info(message):
+    print(f"[dapaoAPI-素材缓存] 信息：{message}")
+
+
+def _clean(value):
+    return "" if value is None else str(value).strip()
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else number
+
+
+def metadata_from_response(asset_id, response):
+    """Normalize an ``/assets/query`` response into the cached metadata shape."""
+    data = response.get("data") if isinstance(response, dict) else None
+    data = data if isinstance(data, dict) else {}
+    return {
+        "asset_id": _clean(data.get("assetId")) or asset_id,
+        "asset_type": _clean(data.get("assetType")).lower(),
+        "status": _clean(data.get("status")),
+        "preview_url": _clean(data.get("previewUrl")),
+        "width": _number(data.get("width")),
+        "height": _number(data.get("height")),
+        "duration": _number(data.get("duration")),
+        "response": response,
+    }
+
+
+def is_terminal(metadata):
+    return _clean((metadata or {}).get("status")).upper() in TERMINAL_ASSET_STATUSES
+
+
+class AssetMetadataCache:
+    """Terminal-state asset metadata keyed by API channel and asset ID, persisted as JSON."""
+
+    def __init__(self, path=CACHE_FILE_PATH, ttl=CACHE_TTL_SECONDS, max_entries=MAX_CACHE_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._file_mtime = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(api_channel, asset_id):
+        return f"{_clean(api_channel) or '国内版'}:{_clean(asset_id)}"
+
+    def _load(self):
+        """Reload the JSON file when another process has rewritten it."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._file_mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            entries = data.get("assets") if isinstance(data, dict) else None
+            self._entries = entries if isinstance(entries, dict) else {}
+        except Exception as e:
+            _log_info(f"无法读取素材缓存，将重新建立：{e}")
+            self._entries = {}
+        self._file_mtime = mtime
+
+    def _save(self):
+        if len(self._entries) > self.max_entries:
+            newest = sorted(self._entries.items(), key=lambda item: item[1].get("cached_at", 0), reverse=True)
+            self._entries = dict(newest[:self.max_entries])
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "assets": self._entries}, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            self._file_mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            _log_info(f"素材缓存写入失败，本次仅保存在内存中：{e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def get(self, api_channel, asset_id):
+        """Cached metadata for a terminal asset, or ``None``."""
+        with self._lock:
+            self._load()
+            entry = self._entries.get(self._key(api_channel, asset_id))
+            if entry is None or time.time() - entry.get("cached_at", 0) > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return copy.deepcopy(entry["metadata"])
+
+    def put(self, api_channel, asset_id, metadata):
+        """Store ``metadata`` if the asset is in a terminal state; return whether it was stored."""
+        if not is_terminal(metadata):
+            return False
+        with self._lock:
+            self._load()
+            self._entries[self._key(api_channel, asset_id)] = {
+                "cached_at": time.time(),
+                "metadata": copy.deepcopy(metadata),
+            }
+            self._save()
+        return True
+
+    def lookup(self, api_channel, asset_id, fetch):
+        """Metadata for one asset; ``fetch()`` is called on a miss and its result cached if terminal."""
+        metadata = self.get(api_channel, asset_id)
+        if metadata is None:
+            metadata = fetch()
+            self.put(api_channel, asset_id, metadata)
+        return metadata
+
+    def lookup_many(self, api_channel, asset_ids, fetch, workers=MAX_PARALLEL_LOOKUPS):
+        """Metadata for each ID in order; ``fetch(asset_id)`` runs concurrently for the misses.
+
+        Duplicate IDs are fetched once.  The first failing fetch, in ID order,
+        raises.
+        """
+        results = {}
+        missing = []
+        for asset_id in asset_ids:
+            if asset_id in results or asset_id in missing:
+                continue
+            metadata = self.get(api_channel, asset_id)
+            if metadata is None:
+                missing.append(asset_id)
+            else:
+                results[asset_id] = metadata
+        if missing:
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(missing)))) as executor:
+                futures = {asset_id: executor.submit(fetch, asset_id) for asset_id in missing}
+                for asset_id in missing:
+                    metadata = futures[asset_id].result()
+                    self.put(api_channel, asset_id, metadata)
+                    results[asset_id] = metadata
+            _log_info(f"查询素材 {len(results)} 个：缓存命中 {len(results) - len(missing)}，远程查询 {len(missing)}")
+        return [results[asset_id] for asset_id in asset_ids]
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._save()
+
+    def snapshot(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+asset_cache = AssetMetadataCache()
+
+
+__all__ = [
+    "ASSET_FAILED_STATUSES",
+    "ASSET_READY_STATUSES",
+    "AssetMetadataCache",
+    "CACHE_FILE_PATH",
+    "TERMINAL_ASSET_STATUSES",
+    "asset_cache",
+    "is_terminal",
+    "metadata_from_response",
+]
@@ -0,0 +1,346 @@
+"""Shared non-blocking HTTP for dapaoAPI relay clients.
+
+ComfyUI may run each prompt on a fresh event loop, so an ``aiohttp`` session
+bound to the caller's loop would have to be rebuilt for every execution.
+Instead one process-wide background loop thread owns a long-lived session with
+a bounded connection pool.  Node coroutines await ``request`` from whatever
+loop they run on; the HTTP work itself is bridged onto the background loop so
+no executor thread is held while waiting on the network.
+"""
+
+import asyncio
+import concurrent.futures
+import json as json_module
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+try:
+    from .metrics_utils import record_http
+    from .relay_policy_utils import RETRY_POLICY, CircuitOpenError, async_slot, circuit
+except ImportError:
+    # 允许作为独立脚本导入（如 test_video_audio.py）
+    from metrics_utils import record_http
+    from relay_policy_utils import RETRY_POLICY, CircuitOpenError, async_slot, circuit
+
+
+SESSION_POOL_LIMIT = 64
+SESSION_POOL_LIMIT_PER_HOST = 32
+DNS_CACHE_SECONDS = 300
+
+# aiohttp equivalents of ``requests.ConnectionError`` / ``requests.Timeout``,
+# plus the fast failure raised while a relay host's circuit breaker is open.
+CONNECTION_ERRORS = (
+    aiohttp.ClientConnectionError,
+    aiohttp.ClientPayloadError,
+    asyncio.TimeoutError,
+    CircuitOpenError,
+)
+# Any transport level failure, including ``raise_for_status``.
+NETWORK_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError)
+# Failures that count against a host's circuit breaker.
+BREAKER_FAILURES = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+
+class BackgroundLoop:
+    """Process-wide event loop thread that owns the shared ``ClientSession``."""
+
+    def __init__(self, name="dapaoAPI-http-loop"):
+        self._name = name
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or not self._thread or not self._thread.is_alive():
+                ready = threading.Event()
+                loop = asyncio.new_event_loop()
+
+                def _run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._discard_session()
+                self._loop = loop
+                self._thread = threading.Thread(target=_run, name=self._name, daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def _discard_session(self):
+        """Close a session left behind by a dead loop thread.
+
+        The old loop no longer runs, so ``session.close()`` cannot be awaited;
+        closing the connector synchronously still releases its sockets.
+        """
+        session, self._session = self._session, None
+        if session is not None and not session.closed and session.connector is not None:
+            session.connector._close()
+        old_loop = self._loop
+        if old_loop is not None and not old_loop.is_running() and not old_loop.is_closed():
+            old_loop.close()
+
+    def is_current(self) -> bool:
+        """Return whether the caller is running on the background loop."""
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def session(self) -> aiohttp.ClientSession:
+        """Return the shared session; only valid on the background loop."""
+        if not self.is_current():
+            raise RuntimeError("共享会话只能在后台事件循环中使用")
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=SESSION_POOL_LIMIT,
+                limit_per_host=SESSION_POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=DNS_CACHE_SECONDS,
+            )
+            # 与 requests 一致读取 HTTP(S)_PROXY 等代理环境变量，走代理/VPN 的用户才能连上中转站
+            self._session = aiohttp.ClientSession(connector=connector, trust_env=True)
+        return self._session
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule ``coro`` on the background loop and return its future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def run(self, coro):
+        """Await ``coro`` on the background loop from any other event loop."""
+        if self.is_current():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+
+background_loop = BackgroundLoop()
+
+
+class SessionScope:
+    """Yield the shared session on the background loop, or a private one elsewhere.
+
+    Standalone scripts that call ``asyncio.run`` directly still work; they get
+    a temporary session that is closed on exit.
+    """
+
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._owned = False
+
+    async def __aenter__(self) -> aiohttp.ClientSession:
+        if background_loop.is_current():
+            self.session = background_loop.session()
+        else:
+            self.session = aiohttp.ClientSession(trust_env=True)
+            self._owned = True
+        return self.session
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self._owned and self.session:
+            await self.session.close()
+
+
+class AsyncResponse:
+    """Fully read response with the subset of the ``requests.Response`` API the nodes use."""
+
+    def __init__(self, status_code, headers, content, url, reason=""):
+        self.status_code = int(status_code)
+        self.headers = headers
+        self.content = content
+        self.url = url
+        self.reason = reason or ""
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json_module.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise aiohttp.ClientResponseError(
+                None,
+                (),
+                status=self.status_code,
+                message=f"{self.status_code} {self.reason} for url: {self.url}",
+                headers=self.headers,
+            )
+
+
+def client_timeout(timeout):
+    """Translate a ``requests`` style timeout into ``aiohttp.ClientTimeout``.
+
+    ``requests`` applies a number to connect and to each read separately, not
+    to the whole transfer, so large downloads are not cut off mid-stream.
+    """
+    if isinstance(timeout, aiohttp.ClientTimeout):
+        return timeout
+    if isinstance(timeout, (tuple, list)):
+        connect, read = timeout
+        return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+    if timeout is None:
+        return aiohttp.ClientTimeout(total=None)
+    return aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+
+
+class StreamingFilePayload(aiohttp.payload.AsyncIterablePayload):
+    """Async-iterable payload that can advertise a size known in advance.
+
+    With every part sized, a multipart body is sent with a Content-Length
+    instead of chunked encoding.
+    """
+
+    def __init__(self, value, size=None, **kwargs):
+        super().__init__(value, **kwargs)
+        if size is not None:
+            self._size = size
+
+
+async def iter_file_chunks(stream, chunk_size=1024 * 1024):
+    """Yield chunks of a blocking binary stream, reading it off the event loop.
+
+    The stream is left open: it may belong to the caller (e.g. a VIDEO input's
+    ``BytesIO``), which aiohttp's own file payloads would close after sending.
+    """
+    while True:
+        chunk = await asyncio.to_thread(stream.read, chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _form_data(data, files):
+    form = aiohttp.FormData()
+    for key, value in (data or {}).items():
+        form.add_field(str(key), value if isinstance(value, (str, bytes)) else str(value))
+    items = files.items() if isinstance(files, dict) else (files or [])
+    for field_name, spec in items:
+        if isinstance(spec, (tuple, list)):
+            filename, content = spec[0], spec[1]
+            content_type = spec[2] if len(spec) > 2 else "application/octet-stream"
+        else:
+            filename, content, content_type = field_name, spec, "application/octet-stream"
+        form.add_field(field_name, content, filename=filename, content_type=content_type)
+    return form
+
+
+async def _request(method, url, headers, timeout, params, json, data, files, allow_redirects):
+    session = background_loop.session()
+    body = {}
+    if json is not None:
+        body["json"] = json
+    elif files:
+        body["data"] = _form_data(data, files)
+    elif hasattr(data, "read") and hasattr(data, "seek") and hasattr(data, "__len__"):
+        # 流式请求体（stream_body_utils）每次请求从头读取，且不交给 aiohttp 关闭
+        data.seek(0)
+        body["data"] = StreamingFilePayload(
+            iter_file_chunks(data),
+            size=len(data),
+            content_type=getattr(data, "content_type", "application/octet-stream"),
+        )
+    elif data is not None:
+        body["data"] = data
+    async with session.request(
+        method.upper(),
+        url,
+        headers=headers,
+        params=params,
+        timeout=client_timeout(timeout),
+        allow_redirects=allow_redirects,
+        **body,
+    ) as response:
+        content = await response.read()
+        return AsyncResponse(response.status, response.headers, content, str(response.url), response.reason)
+
+
+async def request(
+    method,
+    url,
+    *,
+    headers=None,
+    timeout=None,
+    params=None,
+    json=None,
+    data=None,
+    files=None,
+    allow_redirects=True,
+):
+    """Non-blocking counterpart of ``requests.request`` returning ``AsyncResponse``.
+
+    ``files`` accepts the ``requests`` forms ``[(field, (name, bytes, mime))]``
+    or ``{field: (name, bytes, mime)}``.  Requests to a known relay with an API
+    key hold a slot from ``relay_policy_utils.governor`` while in flight, and
+    every relay host is guarded by its circuit breaker.
+    """
+    with circuit(url, BREAKER_FAILURES):
+        async with async_slot(url, headers) as slot:
+            started = time.perf_counter()
+            status = None
+            try:
+                response = await background_loop.run(
+                    _request(method, url, headers, timeout, params, json, data, files, allow_redirects)
+                )
+                status = response.status_code
+            finally:
+                record_http(urlsplit(url).hostname, method, status, time.perf_counter() - started)
+            return slot.record(response)
+
+
+async def request_with_retry(method, url, retry=None, **kwargs):
+    """``request`` that awaits and retries according to a ``RetryState``.
+
+    Mirrors ``relay_policy_utils.request_with_retry``: the last response is
+    returned once the budget is spent, an exhausted connection error is raised.
+    """
+    retry = retry or RETRY_POLICY.start()
+    while True:
+        try:
+            response = await request(method, url, **kwargs)
+        except CONNECTION_ERRORS as error:
+            delay = retry.next_delay(error=error)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        delay = retry.next_delay(response=response)
+        if delay is None:
+            return response
+        await asyncio.sleep(delay)
+
+
+async def get(url, **kwargs):
+    return await request("GET", url, **kwargs)
+
+
+async def post(url, **kwargs):
+    return await request("POST", url, **kwargs)
+
+
+__all__ = [
+    "AsyncResponse",
+    "BREAKER_FAILURES",
+    "BackgroundLoop",
+    "CONNECTION_ERRORS",
+    "NETWORK_ERRORS",
+    "SessionScope",
+    "StreamingFilePayload",
+    "background_loop",
+    "client_timeout",
+    "get",
+    "iter_file_chunks",
+    "post",
+    "request",
+    "request_with_retry",
+]
@@ -13,15 +13,18 @@ import re
 import sys
 import time
 import traceback
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import numpy as np
-import requests
 import torch
 from PIL import Image
 
+from .async_http_utils import CONNECTION_ERRORS, NETWORK_ERRORS, request as http_request, request_with_retry
+from .download_cache_utils import download_cache
 from .network_error_utils import friendly_443_status, friendly_network_error
+from .relay_policy_utils import RETRY_POLICY, RETRY_RATE_LIMIT
 from .image_input_utils import IMAGE_429_HINT, tensor_to_png_inline_parts
+from .metrics_utils import execution_summary, span, timed_execution
+from .usage_ledger_utils import UsageRecord
 
 try:
     import comfy.model_management
@@ -182,7 +185,7 @@ class DapaoBananaRelayClient:
         self.timeout = timeout
         self.base_url = API_BASE_URL.rstrip("/")
 
-    def generate_content(self, model_id, payload):
+    async def generate_content(self, model_id, payload):
         url = f"{self.base_url}/v1beta/models/{model_id}:generateContent"
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -190,8 +193,18 @@ class DapaoBananaRelayClient:
             "User-Agent": "ComfyUI-dapaoAPI/BananaAllround",
         }
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=self.timeout)
-        except (requests.ConnectionError, requests.Timeout) as error:
+            # 生成请求只在 429（上游未受理）时重试，其他失败不重试以免重复扣费；
+            # 同步接口在这一次请求里完成生成，耗时计入“生成”阶段
+            with span("poll"):
+                response = await request_with_retry(
+                    "POST",
+                    url,
+                    RETRY_POLICY.start(retry_on=(RETRY_RATE_LIMIT,)),
+                    headers=headers,
+                    json=payload,
+                    timeout=self.timeout,
+                )
+        except CONNECTION_ERRORS as error:
             raise RuntimeError(f"{friendly_network_error(error, '提交图像任务')} 生成请求不会自动重试，以免重复扣费。") from error
         if response.status_code >= 400:
             if response.status_code == 443:
@@ -202,18 +215,24 @@ class DapaoBananaRelayClient:
         except json.JSONDecodeError as error:
             raise RuntimeError(f"中转站返回内容不是 JSON：{response.text[:500]}") from error
 
-    def download(self, url):
+    async def download(self, url):
+        content = await asyncio.to_thread(download_cache.read_bytes, url)
+        if content is not None:
+            return content
         try:
-            response = requests.get(
-                url,
-                headers={"User-Agent": "Mozilla/5.0", "Accept": "image/*,*/*;q=0.8"},
-                timeout=max(self.timeout, 300),
-                allow_redirects=True,
-            )
+            with span("download"):
+                response = await http_request(
+                    "GET",
+                    url,
+                    headers={"User-Agent": "Mozilla/5.0", "Accept": "image/*,*/*;q=0.8"},
+                    timeout=max(self.timeout, 300),
+                    allow_redirects=True,
+                )
             response.raise_for_status()
-            return response.content
-        except requests.RequestException as error:
+        except NETWORK_ERRORS as error:
             raise RuntimeError(friendly_network_error(error, "下载生成结果")) from error
+        await asyncio.to_thread(download_cache.store_bytes, url, response.content, response.headers)
+        return response.content
 
 
 def _extract_image_items(result):
@@ -265,7 +284,14 @@ def _extract_image_items(result):
     return items
 
 
-def _image_item_to_pil(client, kind, value):
+def _decode_image(content):
+    try:
+        return Image.open(io.BytesIO(content)).convert("RGB")
+    except Exception as error:
+        raise RuntimeError(f"中转站返回的数据不是有效图片：{error}") from error
+
+
+async def _image_item_to_pil(client, kind, value):
     if kind == "base64":
         encoded = value.split(",", 1)[1] if value.startswith("data:") and "," in value else value
         try:
@@ -273,11 +299,9 @@ def _image_item_to_pil(client, kind, value):
         except Exception as error:
             raise RuntimeError(f"返回图片 Base64 解码失败：{error}") from error
     else:
-        content = client.download(value)
-    try:
-        return Image.open(io.BytesIO(content)).convert("RGB")
-    except Exception as error:
-        raise RuntimeError(f"中转站返回的数据不是有效图片：{error}") from error
+        content = await client.download(value)
+    with span("decode", bytes=len(content)):
+        return await asyncio.to_thread(_decode_image, content)
 
 
 def _sanitized_result(value):
@@ -384,23 +408,36 @@ class DapaoBananaAllroundNode:
         return payload
 
     @staticmethod
-    def _submit_many(client, model_id, payload, count, concurrent):
+    async def _submit_many(client, model_id, payload, count, concurrent, resolution="", unit_price=None):
+        async def request_one():
+            # 同步接口没有任务ID，每次请求在账本中记为一条，价格按单价估算
+            usage = UsageRecord("dapaoai", NODE_NAME, model_id, resolution).submitted()
+            try:
+                response = await client.generate_content(model_id, payload)
+            except Exception as error:
+                usage.failed(error)
+                raise
+            if _extract_image_items(response):
+                usage.succeeded(unit_price)
+            else:
+                usage.failed("任务完成但没有找到图片")
+            return response
+
         if not concurrent or count == 1:
-            return [client.generate_content(model_id, payload) for _ in range(count)]
-        results = [None] * count
-        with ThreadPoolExecutor(max_workers=min(count, 4), thread_name_prefix="dapao-banana") as executor:
-            futures = {executor.submit(client.generate_content, model_id, payload): index for index in range(count)}
-            for future in as_completed(futures):
-                results[futures[future]] = future.result()
-        return results
+            return [await request_one() for _ in range(count)]
+        limit = asyncio.Semaphore(min(count, 4))
+
+        async def submit_one():
+            async with limit:
+                return await request_one()
+
+        return list(await asyncio.gather(*(submit_one() for _ in range(count))))
 
+    @timed_execution
     async def generate(self, **kwargs):
         # Each mapped prompt becomes an independent coroutine in ComfyUI.
-        # Move requests/PIL work to worker threads so list tasks run in
-        # parallel without changing the proven single-prompt implementation.
-        return await asyncio.to_thread(self._generate_sync, **kwargs)
-
-    def _generate_sync(self, **kwargs):
+        # Requests are non-blocking, so list tasks run in parallel without a
+        # worker thread each; only PNG encoding and decoding use threads.
         api_key = (kwargs.get("🔑 API密钥") or "").strip()
         model_label = kwargs.get("🤖 模型", "bananaPRO")
         prompt = (kwargs.get("📝 提示词") or "").strip()
@@ -426,17 +463,22 @@ class DapaoBananaAllroundNode:
             if resolution not in supported_resolutions:
                 raise ValueError(f"模型 {model_label} 不支持清晰度：{resolution}")
             model_id = MODEL_ID_BY_RESOLUTION.get(model_label, {}).get(resolution, model_label)
-            reference_parts = self._collect_reference_parts(kwargs)
+            with span("encode"):
+                reference_parts = await asyncio.to_thread(self._collect_reference_parts, kwargs)
             mode = "图生图" if reference_parts else "文生图"
             payload = self._make_payload(prompt, reference_parts, aspect_ratio, resolution)
             client = DapaoBananaRelayClient(api_key, timeout)
+            unit_price = PRICE_BY_MODEL_RESOLUTION.get(model_label, {}).get(
+                resolution,
+                PRICE_BY_MODEL.get(model_label),
+            )
 
             _log_info(
                 f"提交任务：relay={API_BASE_URL}，model={model_id}，mode={mode}，"
                 f"aspectRatio={aspect_ratio}，imageSize={resolution}，count={count}，"
                 f"并发={concurrent}，参考图={len(reference_parts)}张"
             )
-            responses = self._submit_many(client, model_id, payload, count, concurrent)
+            responses = await self._submit_many(client, model_id, payload, count, concurrent, resolution, unit_price)
 
             image_items = []
             for response in responses:
@@ -448,7 +490,7 @@ class DapaoBananaAllroundNode:
                     )
                 image_items.extend(items)
 
-            pil_images = [_image_item_to_pil(client, kind, value) for kind, value, _ in image_items]
+            pil_images = list(await asyncio.gather(*(_image_item_to_pil(client, kind, value) for kind, value, _ in image_items)))
             # Gemini 映射在同一批次偶尔返回不同像素尺寸（尤其是超宽比例）。
             # ComfyUI IMAGE batch 要求 H/W 完全一致，因此统一到首张图尺寸后再拼接。
             target_size = pil_images[0].size
@@ -463,10 +505,6 @@ class DapaoBananaAllroundNode:
             images = tensors[0] if len(tensors) == 1 else torch.cat(tensors, dim=0)
             urls = [value for kind, value, _ in image_items if kind == "url"]
             elapsed = time.time() - started
-            unit_price = PRICE_BY_MODEL_RESOLUTION.get(model_label, {}).get(
-                resolution,
-                PRICE_BY_MODEL.get(model_label),
-            )
             if unit_price is None:
                 raise RuntimeError(f"模型 {model_label} 的价格尚未配置。")
             estimated_price = unit_price * count
@@ -483,7 +521,8 @@ class DapaoBananaAllroundNode:
                 f"📏 尺寸统一：{'已统一到首张图片' if resized_count else '无需处理'}\n"
                 f"⚡ 提交方式：{'并发' if concurrent and count > 1 else '顺序'}\n"
                 f"💰 单价：¥{unit_price:.2f}/张，预计价格：¥{estimated_price:.2f}\n"
-                f"⏱️ 耗时：{elapsed:.2f} 秒\n\n"
+                f"⏱️ 耗时：{elapsed:.2f} 秒\n"
+                f"{execution_summary()}\n\n"
                 + json.dumps({"responses": _sanitized_result(responses)}, ensure_ascii=False, indent=2)
             )
             return images, "\n".join(urls), info
@@ -0,0 +1,149 @@
+"""
+Music3 自动曲风路由微基准
+
+对比逐条正则匹配的旧路由/关键词实现与预编译的单遍匹配器，
+先确认两者在双语请求语料上结果一致，再分别计时。
+
+用法：python bench_music3_router.py [重复次数]
+"""
+
+import importlib.util
+import re
+import sys
+import timeit
+import types
+from pathlib import Path
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+PACKAGE_NAME = "dapaoapi_bench"
+
+
+def load_music3_module():
+    # 只注册包路径，不执行 __init__.py（它依赖 ComfyUI 的 server 模块）
+    package = types.ModuleType(PACKAGE_NAME)
+    package.__path__ = [str(PACKAGE_DIR)]
+    sys.modules[PACKAGE_NAME] = package
+    spec = importlib.util.spec_from_file_location(
+        f"{PACKAGE_NAME}.music3_caption_prompt_node",
+        PACKAGE_DIR / "music3_caption_prompt_node.py",
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+music3 = load_music3_module()
+
+
+def legacy_keyword_tokens(text):
+    source = str(text or "").lower()
+    expanded = [source]
+    for cue, english in music3.QUERY_ALIASES.items():
+        if cue in source:
+            expanded.append(english)
+    return {
+        token for token in re.findall(r"[a-z0-9+#&']{2,}", str(text or "").lower())
+        if token not in {"the", "and", "with", "for", "from", "into", "auto"}
+    } | {
+        token for token in re.findall(r"[a-z0-9+#&']{2,}", " ".join(expanded))
+        if token not in {"the", "and", "with", "for", "from", "into", "auto"}
+    }
+
+
+def legacy_route_automatic_family(text, exclude=None):
+    source = str(text or "").lower()
+    scored = []
+    for family, cues in music3.AUTO_ROUTE_CUES.items():
+        if family == exclude:
+            continue
+        score = 0
+        for cue in cues:
+            if re.fullmatch(r"[a-z0-9 &+.'/-]+", cue):
+                matched = re.search(rf"(?<![a-z0-9]){re.escape(cue)}(?![a-z0-9])", source) is not None
+            else:
+                matched = cue in source
+            if matched:
+                score += 3 if len(cue) >= 5 else 2
+        if family == "general-pop-ballad":
+            score = min(score, 1)
+        scored.append((score, family))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return scored[0][1] if scored and scored[0][0] > 0 else "general-pop-ballad"
+
+
+CORPUS = [
+    "一首华语流行情歌，女声，钢琴和弦乐，忧伤但温暖，慢速",
+    "Mandopop ballad with female vocal, piano and strings, melancholic, slow tempo",
+    "粤语抒情 男声 木吉他 亲密 夜晚独白",
+    "J-pop anime opening, bright uplifting, fast uptempo, electric guitar and synth",
+    "国风流行，古风意境，二胡与琵琶，笛箫点缀，史诗感副歌",
+    "dark trap beat with 808 bass, male rap verses, ominous pads",
+    "UK drill 说唱，暗黑氛围，滑音贝斯，男声念白开头",
+    "lo-fi hip-hop 学习背景音乐，电钢琴，温暖复古",
+    "epic film score trailer, orchestral strings brass and choir, majestic build",
+    "电影配乐风格的交响史诗合唱，预告片高潮，铜管轰鸣",
+    "cinematic pop ballad 电影感抒情，女声高音，管弦流行编曲",
+    "synthwave retrowave night drive, darkwave bass, dreamy ethereal pads",
+    "梦幻流行 合成器流行 空灵女声 慢速律动",
+    "jazz swing big band with brass section and crooner vocal",
+    "波萨诺瓦爵士，木吉他与轻鼓组，温暖亲密的咖啡馆氛围",
+    "musical theatre show tune, duet, 音乐剧舞台感",
+    "metalcore breakdown with screamed vocals, post-hardcore energy, 金属核",
+    "硬摇滚 电吉他 失真 热血 快速",
+    "indie rock 独立摇滚，朋克能量，男女对唱",
+    "indie folk singer-songwriter, acoustic guitar, banjo and mandolin, intimate",
+    "当代民谣，唱作人，木吉他弹唱，温暖怀旧",
+    "celtic traditional folk with fiddle, reggae offbeat bridge, world music fusion",
+    "nu-disco dance pop with funk bass and string stabs, 迪斯科舞曲",
+    "club EDM progressive house drop, trance lead, 俱乐部能量",
+    "techno warehouse rave, hardstyle kick, 科技舞曲",
+    "country americana with pedal steel, bluegrass banjo, 乡村摇滚",
+    "neo soul R&B groove, 电钢琴, 另类r&b 女声",
+    "gospel choir worship anthem, soul blues organ, 福音合唱",
+    "一首适合婚礼的流行抒情歌，男女对唱，温暖明亮",
+    "pure instrumental ambient piano, no vocals, 纯器乐 空灵",
+    "",
+    "auto",
+]
+
+
+def new_route(text):
+    return music3._route_automatic_family(text), music3._route_automatic_family(text, exclude="general-pop-ballad")
+
+
+def old_route(text):
+    return legacy_route_automatic_family(text), legacy_route_automatic_family(text, exclude="general-pop-ballad")
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    mismatches = []
+    for text in CORPUS:
+        if new_route(text) != old_route(text):
+            mismatches.append(("路由", text, old_route(text), new_route(text)))
+        if music3._keyword_tokens(text) != legacy_keyword_tokens(text):
+            mismatches.append(("关键词", text, sorted(legacy_keyword_tokens(text)), sorted(music3._keyword_tokens(text))))
+    if mismatches:
+        for kind, text, old, new in mismatches:
+            print(f"❌ {kind}不一致：{text!r}\n   旧：{old}\n   新：{new}")
+        sys.exit(1)
+    print(f"✅ {len(CORPUS)} 条双语请求的路由与关键词结果一致")
+
+    cases = [
+        ("路由（含排除）", old_route, new_route),
+        ("关键词展开", legacy_keyword_tokens, music3._keyword_tokens),
+    ]
+    for label, old, new in cases:
+        old_seconds = min(timeit.repeat(lambda: [old(text) for text in CORPUS], number=repeat, repeat=5))
+        new_seconds = min(timeit.repeat(lambda: [new(text) for text in CORPUS], number=repeat, repeat=5))
+        per_call = repeat * len(CORPUS)
+        print(
+            f"{label}：旧 {old_seconds / per_call * 1e6:.1f} µs/条，"
+            f"新 {new_seconds / per_call * 1e6:.1f} µs/条，"
+            f"提速 {old_seconds / new_seconds:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
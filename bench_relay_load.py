@@ -0,0 +1,309 @@
+"""
+中转节点端到端压测
+
+在子进程中启动 mock_relay_server.py，把真实节点类的接口地址指向它，
+按不同并发数重复执行节点，统计吞吐、延迟分位数、线程数峰值与内存峰值，
+最后汇总 metrics_utils 记录的各阶段耗时。需要 ComfyUI 的 Python 环境（torch 等）。
+
+用法：
+  python bench_relay_load.py --scenarios rh-image,seedream --concurrency 1,4,16
+  python bench_relay_load.py --queue-seconds 2 --run-seconds 5 --rate-limit 0.1 --failure-rate 0.05
+  python bench_relay_load.py --server http://127.0.0.1:18600   # 使用已启动的模拟中转站
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import inspect
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+PACKAGE_NAME = "dapaoapi_bench"
+
+# 场景 -> (模块, 节点类, 覆盖的输入)
+SCENARIOS = {
+    "seedream": ("seedream_v5_pro_allround_node", "DapaoSeedreamV5ProAllroundNode", {}),
+    "gpt-image-2": ("gpt_image_2_allround_node", "DapaoGPTImage2AllroundNode", {}),
+    "banana": ("banana_allround_node", "DapaoBananaAllroundNode", {}),
+    "seedance": ("seedance20_allround_video_node", "DapaoSeedance20AllroundVideoNode", {}),
+    "rh-image": ("rh_all_image_node", "DapaoRHAllImageNode", {}),
+    "rh-video": ("rh_all_video_seedance_node", "DapaoRHAllVideoSeedanceNode", {}),
+}
+COMMON_INPUTS = {
+    "🔑 API密钥": "mock-api-key",
+    "📝 提示词": "一只在月光下奔跑的橘猫，电影感光影",
+    "⏱️ 轮询间隔": 1,
+    "🔁 最大轮询秒数": 600,
+}
+# 模拟中转站返回的任务排队/生成时间较短，轮询间隔取 1 秒，避免节点本身的等待掩盖并发瓶颈
+DAPAO_MODULES = (
+    "seedream_v5_pro_allround_node",
+    "gpt_image_2_allround_node",
+    "banana_allround_node",
+    "seedance20_allround_video_node",
+)
+
+
+def load_module(name):
+    # 只注册包路径，不执行 __init__.py（它依赖 ComfyUI 的 server 模块）
+    if PACKAGE_NAME not in sys.modules:
+        package = types.ModuleType(PACKAGE_NAME)
+        package.__path__ = [str(PACKAGE_DIR)]
+        sys.modules[PACKAGE_NAME] = package
+    full_name = f"{PACKAGE_NAME}.{name}"
+    if full_name in sys.modules:
+        return sys.modules[full_name]
+    spec = importlib.util.spec_from_file_location(full_name, PACKAGE_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[full_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def point_nodes_at(server_url):
+    """Redirect every scenario's relay to the mock server and keep the relay governor active.
+
+    dapaoAI traffic goes to ``127.0.0.1`` and RunningHub traffic to
+    ``localhost``, so the governor still sees two providers.
+    """
+    port = urlsplit(server_url).port
+    dapao_base = f"http://127.0.0.1:{port}"
+    rh_base = f"http://localhost:{port}"
+    relay_policy = load_module("relay_policy_utils")
+    relay_policy.PROVIDER_HOST_KEYWORDS = (("127.0.0.1", "dapaoai"), ("localhost", "runninghub"))
+    for name in DAPAO_MODULES:
+        load_module(name).API_BASE_URL = dapao_base
+    rh_image = load_module("rh_all_image_node")
+    for channel in rh_image.API_BASE_URLS:
+        rh_image.API_BASE_URLS[channel] = f"{rh_base}/openapi/v2"
+
+
+def default_inputs(node_class):
+    """Node inputs filled from ``INPUT_TYPES`` defaults, then ``COMMON_INPUTS``."""
+    inputs = {}
+    spec = node_class.INPUT_TYPES()
+    for section in ("required", "optional"):
+        for name, definition in (spec.get(section) or {}).items():
+            kind = definition[0]
+            options = definition[1] if len(definition) > 1 and isinstance(definition[1], dict) else {}
+            if isinstance(kind, (list, tuple)):
+                inputs[name] = options.get("default", kind[0] if kind else "")
+            elif "default" in options:
+                inputs[name] = options["default"]
+            elif options.get("options"):
+                inputs[name] = options["options"][0]
+    inputs.update({key: value for key, value in COMMON_INPUTS.items() if key in inputs or key == "🔑 API密钥"})
+    return inputs
+
+
+def current_rss_bytes():
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # ru_maxrss 只有进程生命周期内的峰值：macOS 单位为字节，Linux 为 KB
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class ResourceSampler:
+    """Sample thread count and RSS on a background thread while a load level runs."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self.peak_rss = max(self.peak_rss, current_rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _failed(result):
+    # RH 节点把错误写进状态文本返回，dapaoAI 节点直接抛出异常
+    items = result if isinstance(result, tuple) else (result,)
+    return any(isinstance(item, str) and item.lstrip().startswith("❌") for item in items)
+
+
+def run_level(node, inputs, concurrency, executions):
+    """Execute the node ``executions`` times, ``concurrency`` at a time; return latencies and failures."""
+    method = getattr(node, node.FUNCTION)
+    latencies = []
+    failures = []
+
+    def record(started, result=None, error=None):
+        latencies.append(time.perf_counter() - started)
+        if error is not None:
+            failures.append(str(error).splitlines()[0][:120])
+        elif _failed(result):
+            failures.append(next(item for item in result if isinstance(item, str) and "❌" in item).splitlines()[0][:120])
+
+    if inspect.iscoroutinefunction(method):
+        async def run_all():
+            limit = asyncio.Semaphore(concurrency)
+
+            async def one():
+                async with limit:
+                    started = time.perf_counter()
+                    try:
+                        record(started, await method(**inputs))
+                    except Exception as error:
+                        record(started, error=error)
+
+            await asyncio.gather(*(one() for _ in range(executions)))
+
+        asyncio.run(run_all())
+    else:
+        def one():
+            started = time.perf_counter()
+            try:
+                record(started, method(**inputs))
+            except Exception as error:
+                record(started, error=error)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(one) for _ in range(executions)]:
+                future.result()
+    return latencies, failures
+
+
+def start_mock_server(args):
+    command = [
+        sys.executable, str(PACKAGE_DIR / "mock_relay_server.py"),
+        "--port", str(args.port),
+        "--latency", str(args.latency),
+        "--queue-seconds", str(args.queue_seconds),
+        "--run-seconds", str(args.run_seconds),
+        "--rate-limit", str(args.rate_limit),
+        "--error-rate", str(args.error_rate),
+        "--failure-rate", str(args.failure_rate),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{args.port}"
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"模拟中转站启动失败，退出码 {process.returncode}")
+        try:
+            requests.get(f"{url}/mock/stats", timeout=1)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("模拟中转站启动超时。")
+
+
+def print_stage_summary():
+    metrics = load_module("metrics_utils")
+    rows = metrics.snapshot()["stages"]
+    if not rows:
+        return
+    print("\n各阶段平均耗时（metrics_utils）：")
+    for row in rows:
+        label = metrics.STAGE_LABELS.get(row["stage"], row["stage"])
+        average = row["seconds"] / row["count"] if row["count"] else 0.0
+        print(f"  {row['node']:<36} {label:<4} 次数 {row['count']:>5}  平均 {average:7.3f}s  失败 {row['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dapaoAPI 中转节点端到端压测")
+    parser.add_argument("--scenarios", default="rh-image,seedream", help=f"逗号分隔：{','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,4,16", help="逗号分隔的并发数")
+    parser.add_argument("--executions", type=int, default=0, help="每个并发档位的执行次数，默认并发数的 2 倍（至少 4 次）")
+    parser.add_argument("--server", default="", help="已启动的模拟中转站地址；留空则自动在子进程中启动")
+    parser.add_argument("--port", type=int, default=18600)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--queue-seconds", type=float, default=1.0)
+    parser.add_argument("--run-seconds", type=float, default=2.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景：{', '.join(unknown)}")
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    # 压测期间不写性能日志文件，只在内存中汇总
+    os.environ.setdefault("DAPAO_METRICS_LOG", "0")
+    process = None
+    server_url = args.server.rstrip("/")
+    if not server_url:
+        process, server_url = start_mock_server(args)
+    try:
+        point_nodes_at(server_url)
+        print(f"模拟中转站：{server_url}")
+        print(f"{'场景':<12}{'并发':>5}{'次数':>6}{'失败':>6}{'吞吐/秒':>9}{'p50':>8}{'p95':>8}{'最大':>8}{'线程峰值':>9}{'RSS峰值MB':>11}{'429':>6}")
+        for scenario in scenarios:
+            module_name, class_name, overrides = SCENARIOS[scenario]
+            node_class = getattr(load_module(module_name), class_name)
+            inputs = {**default_inputs(node_class), **overrides}
+            node = node_class()
+            for concurrency in levels:
+                executions = args.executions or max(4, concurrency * 2)
+                requests.post(f"{server_url}/mock/reset", timeout=5)
+                started = time.perf_counter()
+                with ResourceSampler() as sampler:
+                    latencies, failures = run_level(node, inputs, concurrency, executions)
+                wall = time.perf_counter() - started
+                stats = requests.get(f"{server_url}/mock/stats", timeout=5).json()
+                print(
+                    f"{scenario:<12}{concurrency:>5}{executions:>6}{len(failures):>6}"
+                    f"{executions / wall:>9.2f}{percentile(latencies, 0.5):>8.2f}{percentile(latencies, 0.95):>8.2f}"
+                    f"{max(latencies):>8.2f}{sampler.peak_threads:>9}{sampler.peak_rss / 1024 / 1024:>11.1f}"
+                    f"{stats['counters'].get('status:429', 0):>6}"
+                )
+                for message in sorted(set(failures))[:3]:
+                    print(f"    ❌ {message}")
+        print_stage_summary()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+
+
+if __name__ == "__main__":
+    main()
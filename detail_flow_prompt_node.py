@@ -17,9 +17,9 @@ import time
 import traceback
 
 import numpy as np
-import requests
 from PIL import Image
 
+from .async_http_utils import CONNECTION_ERRORS, request as http_request
 from .network_error_utils import friendly_443_status, friendly_network_error
 from .image_input_utils import IMAGE_429_HINT, resize_pil_for_input
 
@@ -267,15 +267,15 @@ class DetailFlowLLMClient:
         self.api_key = api_key
         self.timeout = timeout
 
-    def chat(self, payload):
+    async def chat(self, payload):
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "User-Agent": "ComfyUI-dapaoAPI/DetailFlowPrompt",
         }
         try:
-            response = requests.post(CHAT_ENDPOINT, headers=headers, json=payload, timeout=self.timeout)
-        except (requests.ConnectionError, requests.Timeout) as error:
+            response = await http_request("POST", CHAT_ENDPOINT, headers=headers, json=payload, timeout=self.timeout)
+        except CONNECTION_ERRORS as error:
             raise RuntimeError(f"{friendly_network_error(error, '提交LLM请求')} LLM请求不会自动重试，以免重复扣费。") from error
         if response.status_code >= 400:
             if response.status_code == 443:
@@ -568,9 +568,6 @@ REFERENCE COUNTS: product={len(product_images)}, style={len(style_images)}
         return issues
 
     async def generate_prompt(self, **kwargs):
-        return await asyncio.to_thread(self._generate_prompt_sync, **kwargs)
-
-    def _generate_prompt_sync(self, **kwargs):
         result = {}
         started = time.time()
         try:
@@ -586,8 +583,8 @@ REFERENCE COUNTS: product={len(product_images)}, style={len(style_images)}
                 raise ValueError(f"分屏数量只能选择1至{MAX_SCREEN_COUNT}。")
             if not brief:
                 raise ValueError("原始电商需求不能为空。")
-            product_images = self._collect_images(kwargs, "📦 产品图", MAX_PRODUCT_IMAGES, 2048)
-            style_images = self._collect_images(kwargs, "🎨 风格参考图", MAX_STYLE_IMAGES, 2048)
+            product_images = await asyncio.to_thread(self._collect_images, kwargs, "📦 产品图", MAX_PRODUCT_IMAGES, 2048)
+            style_images = await asyncio.to_thread(self._collect_images, kwargs, "🎨 风格参考图", MAX_STYLE_IMAGES, 2048)
             total_images = len(product_images) + len(style_images)
             if total_images > MAX_LLM_IMAGES:
                 raise ValueError(f"本次LLM最多接收{MAX_LLM_IMAGES}张图像，目前接入{total_images}张。")
@@ -602,7 +599,7 @@ REFERENCE COUNTS: product={len(product_images)}, style={len(style_images)}
                 "top_p": float(kwargs.get("🎲 Top_P", 1.0)),
                 "stream": False,
             }
-            result = DetailFlowLLMClient(api_key, int(kwargs.get("⌛ 请求超时", 600))).chat(payload)
+            result = await DetailFlowLLMClient(api_key, int(kwargs.get("⌛ 请求超时", 600))).chat(payload)
             raw_text = _extract_text(result)
             parsed = _parse_json(raw_text)
             if isinstance(parsed, dict):
@@ -0,0 +1,330 @@
+"""On-disk cache for downloaded result media, keyed by URL.
+
+Generated images and videos are fetched from the relay's object storage every
+time a node output is decoded or a VIDEO output is saved, so re-running a
+workflow from cache or saving the same video twice downloaded hundreds of MB
+again.  ``download_cache`` keeps each body in ``download_cache/`` beside this
+file, one ``<sha256(url)>.bin`` with a ``.json`` sidecar, and evicts the least
+recently used entries once the directory exceeds ``DAPAO_DOWNLOAD_CACHE_MB``.
+
+Entries expire when the upstream says so: ``Cache-Control: max-age`` or
+``Expires`` on the response, and the expiry embedded in signed URLs
+(``X-Amz-*``, ``X-Tos-*``, ``X-Goog-*``, ``Expires``/``x-oss-expires``); the
+earliest one wins, ``no-store`` is never cached and ``DEFAULT_TTL_SECONDS``
+applies when there is no signal.  ``save_url_to`` hardlinks videos from the
+cache into the output folder, falling back to a copy across filesystems.  Set
+``DAPAO_DOWNLOAD_CACHE`` to another directory, or to ``0`` to turn it off.
+"""
+
+import calendar
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from email.utils import parsedate_tz, mktime_tz
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+
+CACHE_ENV = "DAPAO_DOWNLOAD_CACHE"
+CACHE_SIZE_ENV = "DAPAO_DOWNLOAD_CACHE_MB"
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "download_cache")
+DEFAULT_MAX_MB = 2048
+# 没有任何过期信息时，结果链接按一天有效处理
+DEFAULT_TTL_SECONDS = 24 * 3600
+CHUNK_SIZE = 1024 * 1024
+
+
+def _log_info(message):
+    print(f"[dapaoAPI-下载缓存] 信息：{message}")
+
+
+def _log_error(message):
+    print(f"[dapaoAPI-下载缓存] 错误：{message}")
+
+
+def _int(value):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _signed_url_expiry(url):
+    """Absolute expiry encoded in a presigned URL's query, or ``None``."""
+    params = {key.lower(): value for key, value in parse_qsl(urlsplit(url).query)}
+    # AWS / 火山 TOS / GCS V4 签名：签名时间 + 有效秒数
+    for prefix in ("x-amz", "x-tos", "x-goog"):
+        signed_at = params.get(f"{prefix}-date")
+        seconds = _int(params.get(f"{prefix}-expires"))
+        if signed_at and seconds is not None:
+            try:
+                return calendar.timegm(time.strptime(signed_at, "%Y%m%dT%H%M%SZ")) + seconds
+            except ValueError:
+                pass
+    # 阿里云 OSS V1、CloudFront 等：直接给出过期时间戳
+    for name in ("expires", "x-oss-expires"):
+        expires = _int(params.get(name))
+        if expires is not None and expires > 10 ** 9:
+            return expires
+    return None
+
+
+def expiry_for(url, headers=None, now=None):
+    """Absolute time ``url``'s body stops being valid; ``None`` means do not cache."""
+    now = time.time() if now is None else now
+    candidates = []
+    headers = headers or {}
+    cache_control = str(headers.get("Cache-Control") or "").lower()
+    directives = {}
+    for item in cache_control.split(","):
+        name, _, value = item.strip().partition("=")
+        directives[name.strip()] = value.strip().strip('"')
+    if "no-store" in directives:
+        return None
+    max_age = _int(directives.get("max-age"))
+    if max_age is not None:
+        candidates.append(now + max_age)
+    elif headers.get("Expires"):
+        parsed = parsedate_tz(str(headers.get("Expires")))
+        # 无法解析的 Expires（如 "0"）按已过期处理
+        candidates.append(mktime_tz(parsed) if parsed else now)
+    signed = _signed_url_expiry(url)
+    if signed is not None:
+        candidates.append(signed)
+    expires_at = min(candidates) if candidates else now + DEFAULT_TTL_SECONDS
+    return expires_at if expires_at > now else None
+
+
+def _remove_files(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def link_or_copy(source, destination):
+    """Hardlink ``source`` to ``destination``, copying when a link is not possible."""
+    try:
+        os.link(source, destination)
+        return "link"
+    except OSError:
+        shutil.copyfile(source, destination)
+        return "copy"
+
+
+class DownloadCache:
+    """URL-keyed file cache with upstream expiry and an LRU size bound."""
+
+    def __init__(self, root=None, max_bytes=None):
+        self._root = root
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def root(self):
+        if self._root is None:
+            self._root = os.environ.get(CACHE_ENV, "").strip() or DEFAULT_CACHE_DIR
+        return self._root
+
+    @property
+    def max_bytes(self):
+        if self._max_bytes is None:
+            megabytes = _int(os.environ.get(CACHE_SIZE_ENV))
+            self._max_bytes = (DEFAULT_MAX_MB if megabytes is None else max(0, megabytes)) * 1024 * 1024
+        return self._max_bytes
+
+    @property
+    def enabled(self):
+        return self.root != "0" and self.max_bytes > 0
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, f"{key}.bin"), os.path.join(self.root, f"{key}.json")
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, url):
+        """Path of a fresh cached body for ``url``, or ``None``."""
+        if not self.enabled or not url:
+            return None
+        data_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as handle:
+                meta = json.load(handle)
+            fresh = meta.get("url") == url and meta.get("expires_at", 0) > time.time()
+            if fresh and os.path.getsize(data_path) == meta.get("size"):
+                # 访问时间用 mtime 记录，淘汰时按最久未使用排序
+                os.utime(data_path)
+                self._count(True)
+                return data_path
+            if not fresh:
+                _remove_files(data_path, meta_path)
+        except (OSError, ValueError, AttributeError):
+            pass
+        self._count(False)
+        return None
+
+    def read_bytes(self, url):
+        path = self.lookup(url)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as handle:
+                return handle.read()
+        except OSError:
+            return None
+
+    def temp_file(self):
+        """Open a temporary file inside the cache directory for streaming a download."""
+        os.makedirs(self.root, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=self.root, prefix=".part-", suffix=".tmp", delete=False)
+
+    def store_file(self, url, temp_path, headers=None):
+        """Move a downloaded ``temp_path`` into the cache; return the cached path or ``None``.
+
+        When the body must not be cached ``temp_path`` is left where it is.
+        """
+        if not self.enabled or not url:
+            return None
+        expires_at = expiry_for(url, headers)
+        size = os.path.getsize(temp_path)
+        if expires_at is None or size > self.max_bytes:
+            return None
+        data_path, meta_path = self._paths(url)
+        meta = {
+            "url": url,
+            "size": size,
+            "stored_at": time.time(),
+            "expires_at": expires_at,
+            "content_type": str((headers or {}).get("Content-Type") or ""),
+        }
+        try:
+            os.replace(temp_path, data_path)
+            with tempfile.NamedTemporaryFile("w", dir=self.root, suffix=".tmp", delete=False, encoding="utf-8") as handle:
+                json.dump(meta, handle, ensure_ascii=False)
+            os.replace(handle.name, meta_path)
+        except OSError as e:
+            _log_error(f"写入下载缓存失败：{e}")
+            return None
+        self.evict()
+        return data_path
+
+    def store_bytes(self, url, content, headers=None):
+        if not self.enabled or not url or not content:
+            return None
+        try:
+            with self.temp_file() as handle:
+                handle.write(content)
+        except OSError as e:
+            _log_error(f"写入下载缓存失败：{e}")
+            return None
+        stored = self.store_file(url, handle.name, headers)
+        if stored is None:
+            _remove_files(handle.name)
+        return stored
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(".bin"):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """Drop least recently used entries until the directory fits ``max_bytes``."""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                # 已硬链接到输出目录的视频只删除缓存这一侧的目录项
+                _remove_files(path, path[: -len(".bin")] + ".json")
+                total -= size
+                removed += 1
+            self.evictions += removed
+        if removed:
+            _log_info(f"缓存超过 {self.max_bytes // (1024 * 1024)} MB，已淘汰 {removed} 个最久未使用的文件")
+
+    def snapshot(self):
+        entries = self._entries() if self.enabled else []
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+download_cache = DownloadCache()
+
+
+def save_url_to(url, output_path, timeout=300):
+    """Write ``url``'s body to ``output_path``, linking from the cache when possible."""
+    cached = download_cache.lookup(url)
+    if cached is not None:
+        link_or_copy(cached, output_path)
+        return True
+    response = requests.get(url, stream=True, timeout=timeout, allow_redirects=True)
+    response.raise_for_status()
+    if not download_cache.enabled:
+        with open(output_path, "wb") as handle:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    handle.write(chunk)
+        return True
+    handle = download_cache.temp_file()
+    try:
+        with handle:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    handle.write(chunk)
+        cached = download_cache.store_file(url, handle.name, response.headers)
+        if cached is None:
+            shutil.move(handle.name, output_path)
+        else:
+            link_or_copy(cached, output_path)
+    finally:
+        _remove_files(handle.name)
+    return True
+
+
+__all__ = [
+    "CACHE_ENV",
+    "CACHE_SIZE_ENV",
+    "DEFAULT_TTL_SECONDS",
+    "DownloadCache",
+    "download_cache",
+    "expiry_for",
+    "link_or_copy",
+    "save_url_to",
+]
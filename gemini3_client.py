@@ -4,18 +4,67 @@ Gemini 3 API Client for dapaoAPI
 """
 
 import os
+import copy
 import json
 import base64
 import aiohttp
-import asyncio
+import threading
+import concurrent.futures
 from typing import Optional, List, Dict, Any
 from io import BytesIO
 from PIL import Image
 import numpy as np
 
+try:
+    from .async_http_utils import SessionScope, background_loop
+    from .stream_body_utils import InlineMedia
+except ImportError:
+    # 允许作为独立脚本导入（如 test_video_audio.py）
+    from async_http_utils import SessionScope, background_loop
+    from stream_body_utils import InlineMedia
+
 # 配置文件路径
 CONFIG_FILE_PATH = os.path.join(os.path.dirname(__file__), 'gemini3_config.json')
 
+_config_lock = threading.Lock()
+_config_cache: Dict[str, Any] = {"mtime": None, "data": {}}
+
+
+def load_config() -> Dict[str, Any]:
+    """
+    读取 gemini3_config.json，按文件修改时间缓存，避免每次执行都重新读盘
+    返回缓存的副本，调用方修改返回值不会污染其他客户端
+    """
+    try:
+        mtime = os.path.getmtime(CONFIG_FILE_PATH)
+    except OSError:
+        return {}
+    with _config_lock:
+        if _config_cache["mtime"] == mtime:
+            return copy.deepcopy(_config_cache["data"])
+        try:
+            with open(CONFIG_FILE_PATH, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[dapaoAPI-Gemini3] 警告：无法读取配置文件: {e}")
+            data = {}
+        _config_cache["mtime"] = mtime
+        _config_cache["data"] = data if isinstance(data, dict) else {}
+        return copy.deepcopy(_config_cache["data"])
+
+
+def get_provider_config(api_provider: str) -> Dict[str, Any]:
+    """获取单个提供商的配置（来自缓存）"""
+    providers = load_config().get('api_providers')
+    if isinstance(providers, dict) and isinstance(providers.get(api_provider), dict):
+        return providers[api_provider]
+    return {}
+
+
+def submit_async(coro) -> concurrent.futures.Future:
+    """提交协程到共享后台事件循环，返回 concurrent.futures.Future"""
+    return background_loop.submit(coro)
+
 
 def get_api_key(api_provider: str, api_key_override: str = "") -> Optional[str]:
     """
@@ -26,13 +75,7 @@ def get_api_key(api_provider: str, api_key_override: str = "") -> Optional[str]:
         return api_key_override.strip()
     
     # 2. 从配置文件
-    config = {}
-    if os.path.exists(CONFIG_FILE_PATH):
-        try:
-            with open(CONFIG_FILE_PATH, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-        except Exception as e:
-            print(f"[dapaoAPI-Gemini3] 警告：无法读取配置文件: {e}")
+    config = load_config()
     
     if 'api_providers' in config and api_provider in config['api_providers']:
         provider_config = config['api_providers'][api_provider]
@@ -91,8 +134,8 @@ def encode_image_tensor(image_tensor, max_size=1568) -> str:
     return base64.b64encode(buffer.getvalue()).decode('utf-8')
 
 
-def encode_audio_tensor(audio_data: dict) -> str:
-    """将ComfyUI音频tensor转换为base64 WAV"""
+def encode_audio_tensor(audio_data: dict) -> InlineMedia:
+    """将ComfyUI音频tensor转换为WAV，base64 在 StreamingJSONBody 发送时分块编码"""
     try:
         import scipy.io.wavfile
     except ImportError:
@@ -116,9 +159,7 @@ def encode_audio_tensor(audio_data: dict) -> str:
     # Write to in-memory WAV file
     buffer = BytesIO()
     scipy.io.wavfile.write(buffer, sample_rate, waveform)
-    buffer.seek(0)
-    
-    return base64.b64encode(buffer.read()).decode('utf-8')
+    return InlineMedia(buffer.getvalue(), "audio/wav", data_uri=False)
 
 
 class GeminiClient:
@@ -128,31 +169,26 @@ class GeminiClient:
         self.api_key = api_key
         self.api_provider = api_provider
         self.session: Optional[aiohttp.ClientSession] = None
+        self._scope: Optional[SessionScope] = None
         self.base_url = "https://generativelanguage.googleapis.com"
         self.timeout = 300
         
-        # 加载提供商配置
-        config = {}
-        if os.path.exists(CONFIG_FILE_PATH):
-            try:
-                with open(CONFIG_FILE_PATH, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-            except Exception as e:
-                print(f"[dapaoAPI-Gemini3] 警告：无法读取配置文件: {e}")
-        
+        # 加载提供商配置（缓存）
         if self.api_provider == "柏拉图":
             self.base_url = "https://api.bltcy.ai"
-        elif 'api_providers' in config and self.api_provider in config['api_providers']:
-            provider_config = config['api_providers'][self.api_provider]
-            self.base_url = provider_config.get('base_url', self.base_url)
+        else:
+            self.base_url = get_provider_config(self.api_provider).get('base_url', self.base_url)
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self._scope = SessionScope()
+        self.session = await self._scope.__aenter__()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        if self._scope:
+            await self._scope.__aexit__(exc_type, exc_val, exc_tb)
+        self._scope = None
+        self.session = None
     
     def _get_endpoint(self, model: str) -> str:
         """获取API端点URL"""
@@ -172,7 +208,7 @@ class GeminiClient:
     ) -> Dict[str, Any]:
         """生成内容"""
         if not self.session:
-            self.session = aiohttp.ClientSession()
+            await self.__aenter__()
         
         url = self._get_endpoint(model)
         
@@ -216,24 +252,20 @@ class GeminiClient:
             return await response.json()
 
 
-def run_async(coro):
-    """运行异步协程 - 兼容ComfyUI的事件循环"""
+def run_async(coro, timeout: Optional[float] = None):
+    """
+    在后台事件循环中运行协程并同步等待结果
+
+    兼容 ComfyUI：无论调用方线程是否已有运行中的事件循环，
+    协程都在独立的后台线程执行，不会重入调用方的循环。
+    """
+    if background_loop.is_current():
+        coro.close()
+        raise RuntimeError("不能在 Gemini 后台事件循环内同步等待协程，请直接 await")
+    future = submit_async(coro)
     try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # 如果循环正在运行，使用nest_asyncio
-            try:
-                import nest_asyncio
-                nest_asyncio.apply()
-            except ImportError:
-                print("[dapaoAPI-Gemini3] 警告：建议安装 nest_asyncio")
-            return loop.run_until_complete(coro)
-        else:
-            return loop.run_until_complete(coro)
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(coro)
-        finally:
-            asyncio.set_event_loop(None)
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        # 取消仍在后台循环中运行的协程，释放其占用的连接
+        future.cancel()
+        raise
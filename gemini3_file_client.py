@@ -12,8 +12,13 @@ import numpy as np
 from typing import Optional
 from io import BytesIO
 
-# 配置文件路径
-CONFIG_FILE_PATH = os.path.join(os.path.dirname(__file__), 'gemini3_config.json')
+try:
+    from .async_http_utils import SessionScope
+    from .gemini3_client import get_provider_config
+except ImportError:
+    # 允许作为独立脚本导入（如 test_video_audio.py）
+    from async_http_utils import SessionScope
+    from gemini3_client import get_provider_config
 
 
 def save_audio_to_file(audio_data: dict) -> str:
@@ -102,18 +107,8 @@ class GeminiFileClient:
         self.base_url = "https://generativelanguage.googleapis.com"
         self.timeout = 300  # 5分钟超时（用于大文件上传）
         
-        # 加载提供商配置
-        config = {}
-        if os.path.exists(CONFIG_FILE_PATH):
-            try:
-                with open(CONFIG_FILE_PATH, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-            except Exception as e:
-                print(f"[dapaoAPI-Gemini3-File] 警告：无法读取配置文件: {e}")
-        
-        if 'api_providers' in config and self.api_provider in config['api_providers']:
-            provider_config = config['api_providers'][self.api_provider]
-            self.base_url = provider_config.get('base_url', self.base_url)
+        # 加载提供商配置（缓存）
+        self.base_url = get_provider_config(self.api_provider).get('base_url', self.base_url)
     
     def _get_upload_url(self) -> str:
         """获取文件上传URL"""
@@ -177,8 +172,8 @@ class GeminiFileClient:
         
         url = self._get_upload_url()
         
-        # 构建multipart/form-data
-        async with aiohttp.ClientSession() as session:
+        # 构建multipart/form-data（后台事件循环中复用共享连接池）
+        async with SessionScope() as session:
             # 读取文件内容
             with open(file_path, 'rb') as f:
                 file_content = f.read()
@@ -242,7 +237,7 @@ class GeminiFileClient:
             "x-goog-api-key": self.api_key
         }
         
-        async with aiohttp.ClientSession() as session:
+        async with SessionScope() as session:
             async with session.delete(url, headers=headers) as response:
                 if response.status != 200:
                     error_text = await response.text()
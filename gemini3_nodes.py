@@ -22,46 +22,42 @@
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 """
 
-import os
-import json
 import torch
 from typing import Tuple
 
 from .gemini3_client import (
-    GeminiClient, get_api_key, encode_image_tensor, run_async
+    GeminiClient, get_api_key, encode_image_tensor, load_config, run_async
 )
 from .gemini3_file_client import GeminiFileClient, save_audio_to_file
 
 # 统一节点颜色 (紫色)
 
 
-# 配置文件路径
-CONFIG_FILE_PATH = os.path.join(os.path.dirname(__file__), 'gemini3_config.json')
-
-# 加载配置
+# 加载配置（与客户端共用同一份缓存）
 API_PROVIDERS = ["google", "comfly", "T8"]
 DEFAULT_PROVIDER = "google"
 ALL_MODELS = ["gemini-3-pro-preview"]
 PROVIDER_MODELS = {}
 
-if os.path.exists(CONFIG_FILE_PATH):
-    try:
-        with open(CONFIG_FILE_PATH, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-            if "api_providers" in config and isinstance(config["api_providers"], dict):
-                API_PROVIDERS = list(config["api_providers"].keys())
-                all_models_set = set()
-                for provider, details in config["api_providers"].items():
-                    if "models" in details and isinstance(details["models"], list):
-                        PROVIDER_MODELS[provider] = details["models"]
-                        all_models_set.update(details["models"])
-                if all_models_set:
-                    ALL_MODELS = sorted(list(all_models_set))
-            
-            if "default_provider" in config and config["default_provider"] in API_PROVIDERS:
-                DEFAULT_PROVIDER = config["default_provider"]
-    except Exception as e:
-        print(f"[dapaoAPI-Gemini3] 警告：无法加载配置: {e}")
+
+def _load_provider_options():
+    global API_PROVIDERS, DEFAULT_PROVIDER, ALL_MODELS
+    config = load_config()
+    if "api_providers" in config and isinstance(config["api_providers"], dict):
+        API_PROVIDERS = list(config["api_providers"].keys())
+        all_models_set = set()
+        for provider, details in config["api_providers"].items():
+            if "models" in details and isinstance(details["models"], list):
+                PROVIDER_MODELS[provider] = details["models"]
+                all_models_set.update(details["models"])
+        if all_models_set:
+            ALL_MODELS = sorted(list(all_models_set))
+
+    if "default_provider" in config and config["default_provider"] in API_PROVIDERS:
+        DEFAULT_PROVIDER = config["default_provider"]
+
+
+_load_provider_options()
 
 
 class Gemini3_Multimodal:
@@ -334,7 +330,7 @@ class Gemini3_Multimodal:
         # 收集所有图像
         images = [img for img in [image1, image2, image3, image4] if img is not None]
         
-        # 运行异步任务
+        # 提交到共享后台事件循环执行
         try:
             response = run_async(
                 self.generate_async(
@@ -13,12 +13,16 @@ import time
 import traceback
 
 import numpy as np
-import requests
 import torch
 from PIL import Image
 
+from .async_http_utils import CONNECTION_ERRORS, NETWORK_ERRORS, request as http_request, request_with_retry
+from .download_cache_utils import download_cache
 from .network_error_utils import friendly_443_status, friendly_network_error
+from .relay_policy_utils import ALL_RETRY_CLASSES, RETRY_POLICY, RETRY_RATE_LIMIT
 from .image_input_utils import IMAGE_429_HINT, tensor_to_png_bytes
+from .metrics_utils import QUEUE_STATUSES, TaskWaitTimer, execution_summary, span, timed_execution
+from .usage_ledger_utils import UsageRecord
 
 try:
     import comfy.model_management
@@ -240,6 +244,13 @@ def _task_state(result):
     return (statuses[0] if statuses else ""), progress, message
 
 
+def _raw_status(result):
+    """First upstream status, preferring a queued one so wait time splits into queue and poll."""
+    statuses = [str(layer["status"]).strip() for layer in _response_layers(result) if layer.get("status") is not None]
+    queued = [status for status in statuses if status.upper() in QUEUE_STATUSES]
+    return queued[0] if queued else (statuses[0] if statuses else "")
+
+
 def _extract_image_items(result):
     items = []
     seen = set()
@@ -292,34 +303,39 @@ class DapaoImage2RelayClient:
             headers["Content-Type"] = "application/json"
         return headers
 
-    def _request_json(self, method, path, **kwargs):
+    async def _request_json(self, method, path, **kwargs):
         url = f"{self.base_url}/{path.lstrip('/')}"
         headers = kwargs.pop("headers", self._headers(json_body="json" in kwargs))
-        attempts = 3 if method.upper() == "GET" else 1
-        for attempt in range(attempts):
-            try:
-                response = requests.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
-            except (requests.ConnectionError, requests.Timeout) as error:
-                if attempt < attempts - 1:
-                    time.sleep(attempt + 1)
-                    continue
-                if method.upper() == "GET":
-                    raise RuntimeError(f"{friendly_network_error(error, '查询任务')} 已尝试 {attempts} 次。") from error
-                raise RuntimeError(f"{friendly_network_error(error, '提交图像任务')} 提交请求不会自动重试，以免重复扣费。") from error
-            if response.status_code >= 400:
-                if response.status_code == 443:
-                    raise RuntimeError(friendly_443_status())
-                raise DapaoImage2APIError(response.status_code, _response_error(response))
-            try:
-                return response.json()
-            except json.JSONDecodeError as error:
-                raise RuntimeError(f"中转站返回内容不是 JSON：{response.text[:500]}") from error
-        raise RuntimeError("中转站请求失败。")
+        is_query = method.upper() == "GET"
+        # 查询可以放心重试；付费提交只在 429（上游未受理）时重试，以免重复扣费
+        retry = RETRY_POLICY.start(retry_on=ALL_RETRY_CLASSES if is_query else (RETRY_RATE_LIMIT,))
+        try:
+            response = await request_with_retry(
+                method,
+                url,
+                retry,
+                headers=headers,
+                timeout=self.timeout,
+                **kwargs,
+            )
+        except CONNECTION_ERRORS as error:
+            if is_query:
+                raise RuntimeError(f"{friendly_network_error(error, '查询任务')} 已尝试 {retry.attempts} 次。") from error
+            raise RuntimeError(f"{friendly_network_error(error, '提交图像任务')} 提交请求不会自动重试，以免重复扣费。") from error
+        if response.status_code >= 400:
+            if response.status_code == 443:
+                raise RuntimeError(friendly_443_status())
+            raise DapaoImage2APIError(response.status_code, _response_error(response))
+        try:
+            return response.json()
+        except json.JSONDecodeError as error:
+            raise RuntimeError(f"中转站返回内容不是 JSON：{response.text[:500]}") from error
 
-    def generate(self, payload):
-        return self._request_json("POST", "/v1/images/generations", json=payload)
+    async def generate(self, payload):
+        with span("submit"):
+            return await self._request_json("POST", "/v1/images/generations", json=payload)
 
-    def edit(self, payload, reference_images):
+    async def edit(self, payload, reference_images):
         """Submit image editing through the OpenAI-compatible multipart API.
 
         The relay's image editing route does not consume Base64 references from
@@ -339,59 +355,73 @@ class DapaoImage2RelayClient:
             for index, content in enumerate(reference_images, start=1)
         ]
         params = {"async": "true"} if payload.get("async") else None
-        return self._request_json(
-            "POST",
-            "/v1/images/edits",
-            data=data,
-            files=files,
-            params=params,
-        )
-
-    def poll(self, task_id, max_seconds, interval, image_task=False):
+        # 参考图随 multipart 请求体一起上传，上传与提交计入同一阶段
+        with span("submit", bytes=sum(len(content) for content in reference_images)):
+            return await self._request_json(
+                "POST",
+                "/v1/images/edits",
+                data=data,
+                files=files,
+                params=params,
+            )
+
+    async def poll(self, task_id, max_seconds, interval, image_task=False):
         started = time.monotonic()
         progress_bar = comfy.utils.ProgressBar(100) if comfy is not None else None
         task_path = f"/v1/images/tasks/{task_id}" if image_task else f"/v1/tasks/{task_id}"
-        while time.monotonic() - started < max_seconds:
-            if comfy is not None:
-                comfy.model_management.throw_exception_if_processing_interrupted()
-            result = self._request_json("GET", task_path)
-            status, progress, message = _task_state(result)
-            if status == "succeeded":
+        wait_timer = TaskWaitTimer(task_id=task_id)
+        try:
+            while time.monotonic() - started < max_seconds:
+                if comfy is not None:
+                    comfy.model_management.throw_exception_if_processing_interrupted()
+                result = await self._request_json("GET", task_path)
+                status, progress, message = _task_state(result)
+                wait_timer.observe(_raw_status(result))
+                if status == "succeeded":
+                    if progress_bar:
+                        progress_bar.update_absolute(100)
+                    return result
+                if status == "failed":
+                    raise RuntimeError(f"任务失败：{message or json.dumps(result, ensure_ascii=False)[:1000]}")
                 if progress_bar:
-                    progress_bar.update_absolute(100)
-                return result
-            if status == "failed":
-                raise RuntimeError(f"任务失败：{message or json.dumps(result, ensure_ascii=False)[:1000]}")
-            if progress_bar:
-                elapsed = time.monotonic() - started
-                current = min(95, int(progress)) if progress is not None else min(95, int(elapsed / max_seconds * 95))
-                progress_bar.update_absolute(current)
-            time.sleep(interval)
-        raise RuntimeError(f"任务超过 {max_seconds} 秒仍未完成。")
-
-    def download(self, url):
+                    elapsed = time.monotonic() - started
+                    current = min(95, int(progress)) if progress is not None else min(95, int(elapsed / max_seconds * 95))
+                    progress_bar.update_absolute(current)
+                await asyncio.sleep(interval)
+            raise RuntimeError(f"任务超过 {max_seconds} 秒仍未完成。")
+        finally:
+            wait_timer.finish()
+
+    async def download(self, url):
+        content = await asyncio.to_thread(download_cache.read_bytes, url)
+        if content is not None:
+            return content
         try:
-            response = requests.get(
-                url,
-                headers={"User-Agent": "Mozilla/5.0", "Accept": "image/*,*/*;q=0.8"},
-                timeout=max(self.timeout, 300),
-                allow_redirects=True,
-            )
+            with span("download"):
+                response = await http_request(
+                    "GET",
+                    url,
+                    headers={"User-Agent": "Mozilla/5.0", "Accept": "image/*,*/*;q=0.8"},
+                    timeout=max(self.timeout, 300),
+                    allow_redirects=True,
+                )
             response.raise_for_status()
-            return response.content
-        except requests.RequestException as error:
+        except NETWORK_ERRORS as error:
             raise RuntimeError(friendly_network_error(error, "下载生成结果")) from error
+        await asyncio.to_thread(download_cache.store_bytes, url, response.content, response.headers)
+        return response.content
 
 
-def _image_item_to_pil(client, kind, value):
+async def _image_item_to_pil(client, kind, value):
     if kind == "base64":
         encoded = value.split(",", 1)[1] if value.startswith("data:") and "," in value else value
         content = base64.b64decode(encoded)
     elif value.startswith("data:image/"):
         content = base64.b64decode(value.split(",", 1)[1])
     else:
-        content = client.download(value)
-    return Image.open(io.BytesIO(content)).convert("RGB")
+        content = await client.download(value)
+    with span("decode", bytes=len(content)):
+        return await asyncio.to_thread(lambda: Image.open(io.BytesIO(content)).convert("RGB"))
 
 
 class DapaoGPTImage2AllroundNode:
@@ -469,13 +499,12 @@ class DapaoGPTImage2AllroundNode:
             )
         return contents
 
+    @timed_execution
     async def generate(self, **kwargs):
-        # ComfyUI maps list outputs into one coroutine per prompt.  Running the
-        # blocking requests work in worker threads lets those mapped prompts
-        # progress concurrently while preserving the single-prompt code path.
-        return await asyncio.to_thread(self._generate_sync, **kwargs)
-
-    def _generate_sync(self, **kwargs):
+        # ComfyUI maps list outputs into one coroutine per prompt.  HTTP and
+        # polling are non-blocking, so mapped prompts progress concurrently
+        # without holding a worker thread each; only PNG encoding and image
+        # decoding are handed to short-lived threads.
         api_key = (kwargs.get("🔑 API密钥") or "").strip()
         model_label = kwargs.get("🤖 模型", MODEL_LABEL)
         prompt = (kwargs.get("📝 提示词") or "").strip()
@@ -491,6 +520,7 @@ class DapaoGPTImage2AllroundNode:
         submitted = {}
         final = {}
         started = time.time()
+        usage = UsageRecord("dapaoai", NODE_NAME, model_label, resolution_label)
         try:
             if not api_key:
                 raise ValueError("请填写 dapaoAI API 密钥。")
@@ -507,7 +537,8 @@ class DapaoGPTImage2AllroundNode:
             resolution = RESOLUTION_API_VALUES[resolution_label]
             quality = QUALITY_API_VALUES[quality_label]
             # 后端以实际收到的 IMAGE 输入为准，避免前端连线状态与工作流参数不同步。
-            reference_images = self._collect_reference_images(kwargs)
+            with span("encode"):
+                reference_images = await asyncio.to_thread(self._collect_reference_images, kwargs)
             mode = "图生图" if reference_images else "文生图"
 
             core_payload = {
@@ -546,17 +577,18 @@ class DapaoGPTImage2AllroundNode:
                 f"n={count}，参考图={len(reference_images)}张"
             )
             if mode == "文生图":
-                submitted = client.generate(core_payload)
+                submitted = await client.generate(core_payload)
             else:
                 # 图生图必须走 edits multipart；重复的 image 文件字段对应多张参考图。
-                submitted = client.edit(core_payload, reference_images)
+                submitted = await client.edit(core_payload, reference_images)
 
             final = submitted
             image_items = _extract_image_items(final)
             task_identifier = _task_id(submitted)
+            usage.submitted(task_identifier)
             state, _, _ = _task_state(submitted)
             if not image_items and task_identifier and (async_mode or state == "processing"):
-                final = client.poll(
+                final = await client.poll(
                     task_identifier,
                     max_poll_seconds,
                     poll_interval,
@@ -567,7 +599,7 @@ class DapaoGPTImage2AllroundNode:
             if not image_items:
                 raise RuntimeError(f"任务完成但没有找到图片：{json.dumps(final, ensure_ascii=False)[:1200]}")
 
-            tensors = [_pil_to_tensor(_image_item_to_pil(client, kind, value)) for kind, value in image_items]
+            tensors = [_pil_to_tensor(await _image_item_to_pil(client, kind, value)) for kind, value in image_items]
             first_shape = tensors[0].shape
             if any(tensor.shape[1:] != first_shape[1:] for tensor in tensors[1:]):
                 raise RuntimeError("中转站返回的多张图片尺寸不一致，无法组成 ComfyUI IMAGE 批次。")
@@ -576,6 +608,8 @@ class DapaoGPTImage2AllroundNode:
             elapsed = time.time() - started
             unit_price = PRICE_BY_MODEL.get(model_label, PRICE_BY_RESOLUTION[resolution_label])
             estimated_price = unit_price * count
+            # 中转站不返回实际扣费，账本记录按单价估算的价格
+            usage.succeeded(estimated_price)
             info = (
                 "✅ GPT-image-2 全能图像任务完成\n"
                 f"🌐 中转站：{API_BASE_URL}\n"
@@ -590,11 +624,13 @@ class DapaoGPTImage2AllroundNode:
                 f"🖼️ 请求数量：{count} 张，实际返回：{len(tensors)} 张\n"
                 f"💰 单价：¥{unit_price:.2f}/张，预计价格：¥{estimated_price:.2f}\n"
                 f"🆔 任务ID：{task_identifier or '同步返回'}\n"
-                f"⏱️ 耗时：{elapsed:.2f} 秒\n\n"
+                f"⏱️ 耗时：{elapsed:.2f} 秒\n"
+                f"{execution_summary()}\n\n"
                 + json.dumps({"submit": submitted, "final": final}, ensure_ascii=False, indent=2)
             )
             return images, "\n".join(urls), info
         except Exception as error:
+            usage.failed(error)
             message = f"❌ GPT-image-2 全能图像生成失败：{error}"
             _log_error(message)
             _log_error(traceback.format_exc())
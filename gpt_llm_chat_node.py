@@ -9,11 +9,12 @@ import time
 import traceback
 
 import numpy as np
-import requests
 from PIL import Image
 
+from .async_http_utils import CONNECTION_ERRORS, request as http_request
 from .network_error_utils import friendly_443_status, friendly_network_error
 from .image_input_utils import IMAGE_429_HINT, tensor_to_png_data_uris
+from .metrics_utils import execution_summary, span, timed_execution
 
 
 API_BASE_URL = "https://api.dapaoai.com"
@@ -119,15 +120,17 @@ class DapaoGPTLLMClient:
         self.api_key = api_key
         self.timeout = timeout
 
-    def chat(self, payload):
+    async def chat(self, payload):
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "User-Agent": "ComfyUI-dapaoAPI/GPTLLMChat",
         }
         try:
-            response = requests.post(CHAT_ENDPOINT, headers=headers, json=payload, timeout=self.timeout)
-        except (requests.ConnectionError, requests.Timeout) as error:
+            # 非流式对话在一次请求内生成完整回复，计入“生成”阶段
+            with span("poll"):
+                response = await http_request("POST", CHAT_ENDPOINT, headers=headers, json=payload, timeout=self.timeout)
+        except CONNECTION_ERRORS as error:
             raise RuntimeError(f"{friendly_network_error(error, '提交对话请求')} 对话请求不会自动重试，以免重复扣费。") from error
         if response.status_code >= 400:
             if response.status_code == 443:
@@ -292,10 +295,8 @@ class DapaoGPTLLMChatNode:
             messages.append({"role": "user", "content": user_input})
         return messages
 
+    @timed_execution
     async def chat(self, **kwargs):
-        return await asyncio.to_thread(self._chat_sync, **kwargs)
-
-    def _chat_sync(self, **kwargs):
         api_key = (kwargs.get("🔑 API密钥") or "").strip()
         model_id = kwargs.get("🤖 模型", "gemini-3.7-flash")
         system_role = (kwargs.get("🎯 系统角色") or "").strip()
@@ -311,7 +312,8 @@ class DapaoGPTLLMChatNode:
             if not user_input:
                 raise ValueError("用户输入不能为空。")
 
-            image_uris = self._collect_images(kwargs)
+            with span("encode"):
+                image_uris = await asyncio.to_thread(self._collect_images, kwargs)
             messages = self._build_messages(system_role, user_input, image_uris)
             payload = {
                 "model": model_id,
@@ -330,7 +332,7 @@ class DapaoGPTLLMChatNode:
 
             _log_info(f"提交对话：relay={API_BASE_URL}，model={model_id}，参考图={len(image_uris)}张")
             started = time.time()
-            result = DapaoGPTLLMClient(api_key, int(kwargs.get("⌛ 请求超时", 300))).chat(payload)
+            result = await DapaoGPTLLMClient(api_key, int(kwargs.get("⌛ 请求超时", 300))).chat(payload)
             text = _extract_text(result)
             if not text:
                 tool_calls = _extract_tool_calls(result)
@@ -350,7 +352,8 @@ class DapaoGPTLLMChatNode:
                 f"📥 输入令牌：{input_tokens}\n"
                 f"📤 输出令牌：{output_tokens}\n"
                 f"📊 总令牌：{total_tokens}\n"
-                f"⏱️ 耗时：{time.time() - started:.2f} 秒"
+                f"⏱️ 耗时：{time.time() - started:.2f} 秒\n"
+                f"{execution_summary()}"
             )
             return text, json.dumps(_sanitized_result(result), ensure_ascii=False, indent=2), info
         except Exception as error:
@@ -21,8 +21,11 @@ import numpy as np
 import requests
 from PIL import Image
 
+from .async_http_utils import CONNECTION_ERRORS, request as http_request
 from .network_error_utils import friendly_443_status, friendly_network_error
 from .image_input_utils import IMAGE_429_HINT
+from .stream_body_utils import InlineMedia, StreamingJSONBody
+from .video_source_utils import open_video_source
 
 
 API_BASE_URL = "https://api.dapaoai.com"
@@ -672,27 +675,14 @@ def _temporary_video_path(video_input, index):
                 raise
         raise ValueError(f"参考视频{index}路径不存在或不是HTTP/HTTPS地址。")
 
-    if isinstance(video_input, dict):
-        for key in ("file_path", "path", "filename"):
-            path = video_input.get(key)
-            if isinstance(path, str) and os.path.isfile(path):
-                return path, False
-
-    if not hasattr(video_input, "save_to"):
-        raise ValueError(f"无法读取参考视频{index}，请连接ComfyUI原生VIDEO输出。")
-    handle = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-    handle.close()
+    # 已有文件路径直接使用；只有需要重新编码的 VIDEO 才写临时文件
     try:
-        saved = video_input.save_to(handle.name)
-        if saved is False or not os.path.isfile(handle.name) or os.path.getsize(handle.name) <= 0:
-            raise ValueError(f"参考视频{index}保存失败。")
-        return handle.name, True
-    except Exception:
-        try:
-            os.remove(handle.name)
-        except OSError:
-            pass
-        raise
+        source = open_video_source(video_input, need_path=True)
+    except ValueError as error:
+        raise ValueError(f"参考视频{index}保存失败。") from error
+    if source is None:
+        raise ValueError(f"无法读取参考视频{index}，请连接ComfyUI原生VIDEO输出。")
+    return source.path, source.temporary
 
 
 def _analyze_video_with_imageio(path, index, sample_count):
@@ -856,7 +846,7 @@ def _audio_to_wav_base64(channels, sample_rate):
         output.setsampwidth(2)
         output.setframerate(int(sample_rate))
         output.writeframes(pcm.tobytes())
-    return base64.b64encode(buffer.getvalue()).decode("ascii")
+    return InlineMedia(buffer.getvalue(), "audio/wav", data_uri=False)
 
 
 def _audio_spectrogram_uri(mono, sample_rate):
@@ -1140,15 +1130,15 @@ class H3PromptLLMClient:
         self.api_key = api_key
         self.timeout = timeout
 
-    def chat(self, payload):
+    async def chat(self, payload):
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "User-Agent": "ComfyUI-dapaoAPI/H3PromptCompiler",
         }
         try:
-            response = requests.post(CHAT_ENDPOINT, headers=headers, json=payload, timeout=self.timeout)
-        except (requests.ConnectionError, requests.Timeout) as error:
+            response = await http_request("POST", CHAT_ENDPOINT, headers=headers, data=StreamingJSONBody(payload), timeout=self.timeout)
+        except CONNECTION_ERRORS as error:
             raise RuntimeError(f"{friendly_network_error(error, '提交LLM请求')} LLM请求不会自动重试，以免重复扣费。") from error
         if response.status_code >= 400:
             if response.status_code == 443:
@@ -1483,9 +1473,6 @@ class DapaoH3VideoPromptNode:
         return content
 
     async def generate_prompt(self, **kwargs):
-        return await asyncio.to_thread(self._generate_prompt_sync, **kwargs)
-
-    def _generate_prompt_sync(self, **kwargs):
         api_key = (kwargs.get("🔑 API密钥") or "").strip()
         model_id = kwargs.get("🤖 LLM模型", "gemini-3.7-flash")
         selected_mode = kwargs.get("🎛️ H3生成模式", "自动识别")
@@ -1507,8 +1494,9 @@ class DapaoH3VideoPromptNode:
             if not (kwargs.get("🔗 外部文本输入") or kwargs.get("📝 原始视频需求") or "").strip():
                 raise ValueError("原始视频需求不能为空。")
 
-            ordered_images = self._collect_images(kwargs)
-            videos, audios = self._collect_video_audio(kwargs)
+            # 图片编码与音视频分析是 CPU/磁盘密集步骤，交给线程执行以免阻塞事件循环。
+            ordered_images = await asyncio.to_thread(self._collect_images, kwargs)
+            videos, audios = await asyncio.to_thread(self._collect_video_audio, kwargs)
             self._validate_source_limits(ordered_images, videos, audios)
             # 外部专用提示词框的素材标记始终优先；只有未连接外部标记时，
             # 才使用本节点根据下游官方H3节点自动维护的清单。
@@ -1577,7 +1565,7 @@ class DapaoH3VideoPromptNode:
                 f"图片={len(ordered_images)}，视频={len(videos)}，音频={len(audios)}"
             )
             started = time.time()
-            result = H3PromptLLMClient(api_key, int(kwargs.get("⌛ 请求超时", 300))).chat(payload)
+            result = await H3PromptLLMClient(api_key, int(kwargs.get("⌛ 请求超时", 300))).chat(payload)
             raw_text = _extract_text(result)
             if not raw_text:
                 raise RuntimeError("LLM返回内容为空。")
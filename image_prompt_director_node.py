@@ -15,9 +15,9 @@ import time
 import traceback
 
 import numpy as np
-import requests
 from PIL import Image
 
+from .async_http_utils import CONNECTION_ERRORS, request as http_request
 from .network_error_utils import friendly_443_status, friendly_network_error
 from .image_input_utils import IMAGE_429_HINT, resize_pil_for_input
 
@@ -470,15 +470,15 @@ class ImagePromptLLMClient:
         self.api_key = api_key
         self.timeout = timeout
 
-    def chat(self, payload):
+    async def chat(self, payload):
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "User-Agent": "ComfyUI-dapaoAPI/AllroundImagePrompt",
         }
         try:
-            response = requests.post(CHAT_ENDPOINT, headers=headers, json=payload, timeout=self.timeout)
-        except (requests.ConnectionError, requests.Timeout) as error:
+            response = await http_request("POST", CHAT_ENDPOINT, headers=headers, json=payload, timeout=self.timeout)
+        except CONNECTION_ERRORS as error:
             raise RuntimeError(f"{friendly_network_error(error, '提交LLM请求')} LLM请求不会自动重试，以免重复扣费。") from error
         if response.status_code >= 400:
             if response.status_code == 443:
@@ -603,9 +603,6 @@ class DapaoAllroundImagePromptNode:
         return content
 
     async def generate_prompt(self, **kwargs):
-        return await asyncio.to_thread(self._generate_prompt_sync, **kwargs)
-
-    def _generate_prompt_sync(self, **kwargs):
         result = {}
         try:
             api_key = (kwargs.get("🔑 API密钥") or "").strip()
@@ -626,7 +623,7 @@ class DapaoAllroundImagePromptNode:
             if task == "蒙版局部编辑提示词" and kwargs.get("🎭 蒙版") is None:
                 raise ValueError("蒙版局部编辑提示词必须接入MASK蒙版。")
 
-            images = self._collect_images(kwargs)
+            images = await asyncio.to_thread(self._collect_images, kwargs)
             output_chinese = _as_bool(kwargs.get("🌐 输出中文提示词", False))
             language_policy = LANGUAGE_POLICY_CHINESE if output_chinese else LANGUAGE_POLICY_ENGLISH
             messages = [
@@ -642,7 +639,7 @@ class DapaoAllroundImagePromptNode:
                 "stream": False,
             }
             started = time.time()
-            result = ImagePromptLLMClient(api_key, int(kwargs.get("⌛ 请求超时", 300))).chat(payload)
+            result = await ImagePromptLLMClient(api_key, int(kwargs.get("⌛ 请求超时", 300))).chat(payload)
             raw_text = _extract_text(result)
             if not raw_text:
                 raise RuntimeError("LLM返回内容为空。")
@@ -669,7 +666,7 @@ class DapaoAllroundImagePromptNode:
                     "top_p": 1.0,
                     "stream": False,
                 }
-                correction_result = ImagePromptLLMClient(
+                correction_result = await ImagePromptLLMClient(
                     api_key, int(kwargs.get("⌛ 请求超时", 300))
                 ).chat(correction_payload)
                 corrected_text = _extract_text(correction_result)
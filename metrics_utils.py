@@ -0,0 +1,380 @@
+"""Timing instrumentation shared by dapaoAPI relay nodes.
+
+A slow workflow can spend its time locally (encoding references, decoding
+results) or upstream (queueing, generating, slow CDNs).  Nodes wrap those
+phases in ``span(stage)``; one node call is wrapped in ``execution(node)``,
+whose ``summary()`` line goes into the node's status output.  Entry points
+decorated with ``timed_execution`` run inside an execution named after the
+node class and add ``execution_summary()`` to their status text.
+
+Every finished span and execution is
+
+* aggregated per node and stage for ``prometheus_text()`` (served at
+  ``/dapao/metrics``);
+* written as one JSON line to a rotating log, ``logs/dapao_metrics.log``
+  beside this file.  Set ``DAPAO_METRICS_LOG`` to another path, or to ``0``
+  to turn the file off.
+
+The shared HTTP helpers also record each request per host with
+``record_http``, so network time is visible for every node, not only the
+instrumented ones.
+
+Spans opened in ``ThreadPoolExecutor`` workers only reach the current
+execution's summary when the callable is wrapped with ``propagate``
+(``asyncio.to_thread`` copies the context by itself).
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+METRICS_LOG_ENV = "DAPAO_METRICS_LOG"
+DEFAULT_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "dapao_metrics.log")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+STAGE_LABELS = {
+    "encode": "编码",
+    "upload": "上传",
+    "submit": "提交",
+    "queue": "排队",
+    "poll": "生成",
+    "download": "下载",
+    "decode": "解码",
+    "place": "图层定位",
+}
+# RunningHub 与中转站任务在开始生成前报告的状态
+QUEUE_STATUSES = {"QUEUED", "QUEUING", "PENDING", "WAITING", "SUBMITTED", "CREATED", "NOT_START"}
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+_current_execution = contextvars.ContextVar("dapao_execution", default=None)
+
+
+def _log_error(message):
+    print(f"[dapaoAPI-性能统计] 错误：{message}")
+
+
+class _Histogram:
+    __slots__ = ("count", "errors", "total", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+    def observe(self, seconds, ok=True):
+        self.count += 1
+        self.errors += 0 if ok else 1
+        self.total += seconds
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+
+
+class MetricsRegistry:
+    """Process-wide aggregates of stage, execution and HTTP timings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._executions = {}
+        self._http = {}
+        self._logger = None
+        self._log_path = None
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = _Histogram()
+        return histogram
+
+    def observe_stage(self, node, stage, seconds, ok):
+        with self._lock:
+            self._histogram(self._stages, (node, stage)).observe(seconds, ok)
+
+    def observe_execution(self, node, seconds, ok):
+        with self._lock:
+            self._histogram(self._executions, (node,)).observe(seconds, ok)
+
+    def observe_http(self, host, method, status, seconds):
+        with self._lock:
+            self._histogram(self._http, (host, method, str(status))).observe(seconds, True)
+
+    def _json_logger(self):
+        setting = os.environ.get(METRICS_LOG_ENV, "").strip()
+        if setting.lower() in ("0", "false", "off", "no"):
+            return None
+        path = setting or DEFAULT_LOG_PATH
+        if self._logger is not None and self._log_path == path:
+            return self._logger
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+            )
+        except OSError as error:
+            _log_error(f"无法打开性能日志 {path}：{error}")
+            os.environ[METRICS_LOG_ENV] = "0"
+            return None
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger("dapaoAPI.metrics")
+        for old in list(logger.handlers):
+            logger.removeHandler(old)
+            old.close()
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        self._logger, self._log_path = logger, path
+        return logger
+
+    def emit(self, record):
+        """Append one JSON line to the rotating metrics log."""
+        with self._lock:
+            logger = self._json_logger()
+        if logger is not None:
+            logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+    def snapshot(self):
+        """Aggregates as plain dicts, for diagnostics."""
+        def rows(table, names):
+            return [
+                dict(zip(names, key), count=item.count, errors=item.errors, seconds=round(item.total, 4))
+                for key, item in sorted(table.items())
+            ]
+
+        with self._lock:
+            return {
+                "stages": rows(self._stages, ("node", "stage")),
+                "executions": rows(self._executions, ("node",)),
+                "http": rows(self._http, ("host", "method", "status")),
+            }
+
+    def prometheus_text(self):
+        """All aggregates in the Prometheus text exposition format."""
+        lines = []
+
+        def histogram(name, help_text, table, label_names):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, item in sorted(table.items()):
+                labels = ",".join(f'{label}="{_escape(value)}"' for label, value in zip(label_names, key))
+                for bound, count in zip(DURATION_BUCKETS, item.buckets):
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {item.count}')
+                lines.append(f"{name}_sum{{{labels}}} {item.total:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {item.count}")
+
+        def errors(name, help_text, table, label_names):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, item in sorted(table.items()):
+                labels = ",".join(f'{label}="{_escape(value)}"' for label, value in zip(label_names, key))
+                lines.append(f"{name}{{{labels}}} {item.errors}")
+
+        with self._lock:
+            histogram("dapao_stage_seconds", "Time spent per node and stage.", self._stages, ("node", "stage"))
+            errors("dapao_stage_errors_total", "Stages that raised.", self._stages, ("node", "stage"))
+            histogram("dapao_execution_seconds", "Wall time of one node execution.", self._executions, ("node",))
+            errors("dapao_execution_errors_total", "Node executions that failed.", self._executions, ("node",))
+            histogram("dapao_http_request_seconds", "Relay HTTP requests by host and status.", self._http, ("host", "method", "status"))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+registry = MetricsRegistry()
+
+
+class Execution:
+    """Spans collected during one node call; ``summary()`` renders them for the status output."""
+
+    def __init__(self, node):
+        self.node = node
+        self.started = time.perf_counter()
+        self.seconds = None
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self._stages[stage] = self._stages.get(stage, 0.0) + seconds
+
+    def stages(self):
+        with self._lock:
+            return dict(self._stages)
+
+    def summary(self):
+        """One line like ``⏱️ 耗时分布：上传 1.20s · 排队 8.00s · 生成 30.10s · 本地其他 0.40s``.
+
+        Stages that ran in parallel overlap, so their sum can exceed the wall time.
+        """
+        stages = self.stages()
+        elapsed = self.seconds if self.seconds is not None else time.perf_counter() - self.started
+        ordered = [stage for stage in STAGE_LABELS if stage in stages] + sorted(set(stages) - set(STAGE_LABELS))
+        parts = [f"{STAGE_LABELS.get(stage, stage)} {stages[stage]:.2f}s" for stage in ordered]
+        other = elapsed - sum(stages.values())
+        if parts and other > 0.005:
+            parts.append(f"本地其他 {other:.2f}s")
+        return "⏱️ 耗时分布：" + (" · ".join(parts) if parts else f"总计 {elapsed:.2f}s")
+
+
+def current_execution():
+    return _current_execution.get()
+
+
+@contextmanager
+def execution(node):
+    """Collect the spans of one node call; yields the ``Execution``."""
+    run = Execution(node)
+    token = _current_execution.set(run)
+    ok = False
+    try:
+        yield run
+        ok = True
+    finally:
+        _current_execution.reset(token)
+        run.seconds = time.perf_counter() - run.started
+        registry.observe_execution(node, run.seconds, ok)
+        registry.emit({
+            "ts": time.time(),
+            "type": "execution",
+            "node": node,
+            "seconds": round(run.seconds, 4),
+            "ok": ok,
+            "stages": {stage: round(seconds, 4) for stage, seconds in run.stages().items()},
+        })
+
+
+def timed_execution(method):
+    """Decorator for a node's entry point (sync or async): run it inside ``execution(<class name>)``."""
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            with execution(type(self).__name__):
+                return await method(self, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with execution(type(self).__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def execution_summary():
+    """Summary line of the current execution, or ``""`` outside one."""
+    run = _current_execution.get()
+    return run.summary() if run is not None else ""
+
+
+def record(stage, seconds, node=None, ok=True, **fields):
+    """Record a finished stage that was timed by the caller."""
+    run = _current_execution.get()
+    node = node or (run.node if run is not None else "unknown")
+    if run is not None:
+        run.add(stage, seconds)
+    registry.observe_stage(node, stage, seconds, ok)
+    registry.emit({"ts": time.time(), "type": "span", "node": node, "stage": stage, "seconds": round(seconds, 4), "ok": ok, **fields})
+
+
+@contextmanager
+def span(stage, node=None, **fields):
+    """Time the enclosed block as ``stage``; extra ``fields`` go into the JSON log line."""
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        record(stage, time.perf_counter() - started, node, ok, **fields)
+
+
+def propagate(fn):
+    """Bind ``fn`` to the caller's context so executor workers report into the current execution."""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+class TaskWaitTimer:
+    """Split the time spent polling a remote task into ``queue`` and ``poll`` (generating).
+
+    Call ``observe(status)`` after every status check and ``finish()`` once
+    the task is done or abandoned.
+    """
+
+    def __init__(self, node=None, **fields):
+        self.node = node
+        self.fields = fields
+        self._phase = "queue"
+        self._phase_started = time.perf_counter()
+        self._finished = False
+
+    def observe(self, status):
+        if self._phase == "queue" and str(status or "").upper() not in QUEUE_STATUSES:
+            self._switch("poll")
+
+    def _switch(self, phase):
+        now = time.perf_counter()
+        record(self._phase, now - self._phase_started, self.node, True, **self.fields)
+        self._phase, self._phase_started = phase, now
+
+    def finish(self, ok=True):
+        if self._finished:
+            return
+        self._finished = True
+        record(self._phase, time.perf_counter() - self._phase_started, self.node, ok, **self.fields)
+
+
+def record_http(host, method, status, seconds):
+    """Per-host request timing from the shared HTTP helpers; aggregated only, not logged."""
+    registry.observe_http(host or "unknown", str(method).upper(), status if status is not None else "error", seconds)
+
+
+def prometheus_text():
+    return registry.prometheus_text()
+
+
+def prometheus_gauge(name, help_text, samples):
+    """Render a gauge family from ``[(labels_dict, value)]`` for state owned by other modules."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in samples:
+        label_text = ",".join(f'{key}="{_escape(item)}"' for key, item in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot():
+    return registry.snapshot()
+
+
+__all__ = [
+    "DEFAULT_LOG_PATH",
+    "Execution",
+    "METRICS_LOG_ENV",
+    "MetricsRegistry",
+    "QUEUE_STATUSES",
+    "STAGE_LABELS",
+    "TaskWaitTimer",
+    "current_execution",
+    "execution",
+    "execution_summary",
+    "prometheus_gauge",
+    "prometheus_text",
+    "propagate",
+    "record",
+    "record_http",
+    "registry",
+    "snapshot",
+    "span",
+    "timed_execution",
+]
@@ -0,0 +1,524 @@
+"""
+本地模拟中转站：dapaoAI 中转与 RunningHub openapi 的离线替身
+
+只实现节点实际调用到的接口与响应结构，用于离线压测与故障演练，不校验密钥。
+延迟、排队时长、生成时长、429 比例与故障比例都可以在启动参数中设置，
+也可以在运行中通过 POST /mock/config 修改。
+
+模拟的接口：
+- dapaoAI：/v1/images/generations、/v1/images/edits、/v1/images/tasks/{id}、/v1/tasks/{id}、
+  /v1beta/models/{model}:generateContent、/v1/files、/v1/video/generations[/{id}]、/v1/chat/completions
+- RunningHub：/openapi/v2/media/upload/binary、/openapi/v2/{端点}、/openapi/v2/query、
+  /openapi/v2/assets/create、/openapi/v2/assets/query、/task/openapi/upload、
+  /task/openapi/ai-app/run、/task/openapi/outputs
+- 结果素材：/mock/media/{名称}.png|.mp4；统计：GET /mock/stats；重置：POST /mock/reset
+
+用法：python mock_relay_server.py --port 18600 --queue-seconds 1 --run-seconds 2 --rate-limit 0.05
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import struct
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+
+from aiohttp import web
+
+
+DEFAULT_CONFIG = {
+    # 每个接口请求的固定延迟与随机抖动（秒）
+    "latency": 0.05,
+    "latency_jitter": 0.05,
+    # 异步任务的排队与生成时长（秒）；同步接口直接把两者计入响应时间
+    "queue_seconds": 1.0,
+    "run_seconds": 2.0,
+    # 返回 429 的比例与 Retry-After 秒数
+    "rate_limit_ratio": 0.0,
+    "retry_after": 1,
+    # 返回 HTTP 500 的比例，以及任务最终 FAILED 的比例
+    "error_ratio": 0.0,
+    "failure_ratio": 0.0,
+    # 结果图片边长与结果视频大小
+    "image_size": 512,
+    "video_bytes": 2 * 1024 * 1024,
+}
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def solid_png(width, height, color=(120, 90, 200)):
+    """A solid-colour RGB PNG built without PIL, so the server has no image dependency."""
+    row = b"\x00" + bytes(color) * width
+    raw = zlib.compress(row * height, 6)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header) + _png_chunk(b"IDAT", raw) + _png_chunk(b"IEND", b"")
+
+
+class MockRelayState:
+    """Tasks and request counters shared by all handlers."""
+
+    def __init__(self, config=None):
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update(config or {})
+        self.tasks = {}
+        self.counters = Counter()
+        self.started_at = time.time()
+        self._png_cache = {}
+
+    def reset(self):
+        self.tasks.clear()
+        self.counters.clear()
+        self.started_at = time.time()
+
+    def png(self):
+        size = int(self.config["image_size"])
+        if size not in self._png_cache:
+            self._png_cache[size] = solid_png(size, size)
+        return self._png_cache[size]
+
+    def create_task(self, kind, sync=False):
+        task_id = uuid.uuid4().hex
+        self.tasks[task_id] = {
+            "kind": kind,
+            "created": time.monotonic(),
+            "queue": 0.0 if sync else float(self.config["queue_seconds"]),
+            "run": 0.0 if sync else float(self.config["run_seconds"]),
+            "fail": random.random() < float(self.config["failure_ratio"]),
+        }
+        self.counters[f"task:{kind}"] += 1
+        return task_id
+
+    def task_phase(self, task_id):
+        """``queued`` / ``running`` / ``succeeded`` / ``failed``, or ``None`` for unknown IDs."""
+        task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        elapsed = time.monotonic() - task["created"]
+        if elapsed < task["queue"]:
+            return "queued"
+        if elapsed < task["queue"] + task["run"]:
+            return "running"
+        return "failed" if task["fail"] else "succeeded"
+
+    def progress(self, task_id):
+        task = self.tasks[task_id]
+        if not task["run"]:
+            return 100
+        elapsed = time.monotonic() - task["created"] - task["queue"]
+        return max(0, min(99, int(elapsed / task["run"] * 100)))
+
+
+def media_url(request, name):
+    return f"{request.scheme}://{request.host}/mock/media/{name}"
+
+
+@web.middleware
+async def fault_middleware(request, handler):
+    """Apply latency, 429 and 500 injection to every API route (not /mock/*)."""
+    state = request.app["state"]
+    config = state.config
+    if request.path.startswith("/mock/"):
+        return await handler(request)
+    state.counters["requests"] += 1
+    route = getattr(request.match_info.route.resource, "canonical", request.path)
+    state.counters[f"route:{request.method} {route}"] += 1
+    await asyncio.sleep(float(config["latency"]) + random.random() * float(config["latency_jitter"]))
+    if random.random() < float(config["rate_limit_ratio"]):
+        state.counters["status:429"] += 1
+        return web.json_response(
+            {"error": {"message": "模拟限流：请求过于频繁", "code": "rate_limit"}},
+            status=429,
+            headers={"Retry-After": str(config["retry_after"])},
+        )
+    if random.random() < float(config["error_ratio"]):
+        state.counters["status:500"] += 1
+        return web.json_response({"error": {"message": "模拟上游故障"}}, status=500)
+    return await handler(request)
+
+
+async def _json_body(request):
+    if request.content_type == "application/json" or request.content_type.endswith("+json"):
+        try:
+            return await request.json()
+        except json.JSONDecodeError:
+            return {}
+    if request.content_type.startswith("multipart/") or request.content_type == "application/x-www-form-urlencoded":
+        # 读取并丢弃上传内容，统计字节数
+        size = 0
+        if request.content_type.startswith("multipart/"):
+            reader = await request.multipart()
+            while True:
+                part = await reader.next()
+                if part is None:
+                    break
+                while True:
+                    chunk = await part.read_chunk()
+                    if not chunk:
+                        break
+                    size += len(chunk)
+        else:
+            size = len(await request.read())
+        request.app["state"].counters["upload_bytes"] += size
+        return {}
+    body = await request.read()
+    try:
+        return json.loads(body) if body else {}
+    except json.JSONDecodeError:
+        return {}
+
+
+async def _wait_sync_generation(state):
+    # 同步接口：排队与生成时间都体现在响应耗时中
+    await asyncio.sleep(float(state.config["queue_seconds"]) + float(state.config["run_seconds"]))
+    return not (random.random() < float(state.config["failure_ratio"]))
+
+
+# ---------------------------------------------------------------- dapaoAI
+
+
+def _image_result(request, payload, task_id):
+    if payload.get("response_format") == "b64_json":
+        return {"b64_json": base64.b64encode(request.app["state"].png()).decode("ascii")}
+    return {"url": media_url(request, f"{task_id}.png")}
+
+
+async def dapao_image_generations(request):
+    state = request.app["state"]
+    payload = await _json_body(request)
+    is_async = str(payload.get("async") or request.query.get("async") or "").lower() in ("true", "1")
+    if is_async:
+        task_id = state.create_task("image")
+        return web.json_response({"id": task_id, "task_id": task_id, "status": "queued"})
+    if not await _wait_sync_generation(state):
+        return web.json_response({"error": {"message": "模拟生成失败"}}, status=500)
+    task_id = state.create_task("image", sync=True)
+    count = max(1, int(payload.get("n") or 1))
+    return web.json_response({
+        "created": int(time.time()),
+        "data": [_image_result(request, payload, f"{task_id}_{index}") for index in range(count)],
+        "usage": {"total_tokens": 0},
+    })
+
+
+async def dapao_image_task(request):
+    state = request.app["state"]
+    task_id = request.match_info["task_id"]
+    phase = state.task_phase(task_id)
+    if phase is None:
+        return web.json_response({"error": {"message": "任务不存在"}}, status=404)
+    status = {"queued": "queued", "running": "in_progress"}.get(phase, phase)
+    body = {"id": task_id, "task_id": task_id, "status": status, "progress": state.progress(task_id)}
+    if phase == "succeeded":
+        body["data"] = [{"url": media_url(request, f"{task_id}.png")}]
+    elif phase == "failed":
+        body["fail_reason"] = "模拟任务失败"
+    return web.json_response(body)
+
+
+async def dapao_generate_content(request):
+    state = request.app["state"]
+    await _json_body(request)
+    if not await _wait_sync_generation(state):
+        return web.json_response({"error": {"message": "模拟生成失败"}}, status=500)
+    state.counters["task:gemini"] += 1
+    encoded = base64.b64encode(state.png()).decode("ascii")
+    return web.json_response({
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"inlineData": {"mimeType": "image/png", "data": encoded}}]},
+            "finishReason": "STOP",
+        }],
+        "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": 0},
+    })
+
+
+async def dapao_files(request):
+    await _json_body(request)
+    file_id = uuid.uuid4().hex
+    return web.json_response({"id": file_id, "object": "file", "url": media_url(request, f"{file_id}.png")})
+
+
+async def dapao_video_generations(request):
+    state = request.app["state"]
+    await _json_body(request)
+    task_id = state.create_task("video")
+    return web.json_response({"task_id": task_id, "status": "queued"})
+
+
+async def dapao_video_task(request):
+    state = request.app["state"]
+    task_id = request.match_info["task_id"]
+    phase = state.task_phase(task_id)
+    if phase is None:
+        return web.json_response({"error": {"message": "任务不存在"}}, status=404)
+    status = {"queued": "queued", "running": "processing", "succeeded": "completed"}.get(phase, phase)
+    body = {"task_id": task_id, "status": status, "progress": state.progress(task_id)}
+    if phase == "succeeded":
+        body["data"] = {"video_url": media_url(request, f"{task_id}.mp4")}
+    elif phase == "failed":
+        body["fail_reason"] = "模拟任务失败"
+    return web.json_response(body)
+
+
+async def dapao_chat(request):
+    state = request.app["state"]
+    payload = await _json_body(request)
+    if not await _wait_sync_generation(state):
+        return web.json_response({"error": {"message": "模拟生成失败"}}, status=500)
+    state.counters["task:chat"] += 1
+    return web.json_response({
+        "id": uuid.uuid4().hex,
+        "object": "chat.completion",
+        "model": payload.get("model", "mock"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "模拟回复：一只在月光下奔跑的橘猫。"}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    })
+
+
+# ---------------------------------------------------------------- RunningHub
+
+
+async def rh_upload_binary(request):
+    await _json_body(request)
+    file_id = uuid.uuid4().hex
+    return web.json_response({"code": 0, "msg": "success", "data": {"download_url": media_url(request, f"{file_id}.png")}})
+
+
+async def rh_submit(request):
+    state = request.app["state"]
+    await _json_body(request)
+    task_id = state.create_task("rh")
+    return web.json_response({"taskId": task_id, "status": "QUEUED", "errorCode": "", "errorMessage": ""})
+
+
+async def rh_query(request):
+    state = request.app["state"]
+    payload = await _json_body(request)
+    task_id = str(payload.get("taskId") or "")
+    phase = state.task_phase(task_id)
+    if phase is None:
+        return web.json_response({"code": 404, "msg": "任务不存在"})
+    status = {"queued": "QUEUED", "running": "RUNNING", "succeeded": "SUCCESS", "failed": "FAILED"}[phase]
+    body = {"taskId": task_id, "status": status, "errorCode": "", "errorMessage": "", "results": None}
+    if phase == "succeeded":
+        body["results"] = [
+            {"url": media_url(request, f"{task_id}.mp4"), "outputType": "mp4"},
+            {"url": media_url(request, f"{task_id}.png"), "outputType": "png"},
+        ] if state.tasks[task_id]["kind"] == "rh-video" else [{"url": media_url(request, f"{task_id}.png"), "outputType": "png"}]
+        body["usage"] = {"consumeMoney": "0.05", "taskCostTime": f"{state.tasks[task_id]['run']:.1f}"}
+    elif phase == "failed":
+        body["errorCode"] = "MOCK_FAILED"
+        body["errorMessage"] = "模拟任务失败"
+    return web.json_response(body)
+
+
+async def rh_submit_endpoint(request):
+    state = request.app["state"]
+    await _json_body(request)
+    endpoint = request.match_info["endpoint"]
+    kind = "rh-video" if "video" in endpoint.lower() else "rh"
+    task_id = state.create_task(kind)
+    return web.json_response({"taskId": task_id, "status": "QUEUED", "errorCode": "", "errorMessage": ""})
+
+
+async def rh_asset_create(request):
+    state = request.app["state"]
+    await _json_body(request)
+    asset_id = f"asset-{state.create_task('asset')}"
+    return web.json_response({"code": 0, "msg": "success", "data": {"assetId": asset_id, "status": "PENDING"}})
+
+
+async def rh_asset_query(request):
+    state = request.app["state"]
+    payload = await _json_body(request)
+    asset_id = str(payload.get("assetId") or "")
+    phase = state.task_phase(asset_id.removeprefix("asset-")) or "succeeded"
+    status = {"queued": "PENDING", "running": "PROCESSING", "succeeded": "ACTIVE", "failed": "FAILED"}[phase]
+    return web.json_response({"code": 0, "msg": "success", "data": {
+        "assetId": asset_id,
+        "assetType": "Image",
+        "status": status,
+        "previewUrl": media_url(request, f"{asset_id}.png"),
+        "width": state.config["image_size"],
+        "height": state.config["image_size"],
+    }})
+
+
+async def rh_app_upload(request):
+    await _json_body(request)
+    return web.json_response({"code": 0, "msg": "success", "data": {"fileName": f"api/{uuid.uuid4().hex}.png", "fileType": "input"}})
+
+
+async def rh_app_run(request):
+    state = request.app["state"]
+    await _json_body(request)
+    task_id = state.create_task("rh-app")
+    return web.json_response({"code": 0, "msg": "success", "data": {"taskId": task_id, "taskStatus": "QUEUED"}})
+
+
+async def rh_app_outputs(request):
+    state = request.app["state"]
+    payload = await _json_body(request)
+    task_id = str(payload.get("taskId") or "")
+    phase = state.task_phase(task_id)
+    if phase in (None, "failed"):
+        return web.json_response({"code": 805, "msg": "APIKEY_TASK_STATUS_ERROR", "data": {"failedReason": {"exception_message": "模拟任务失败"}}})
+    if phase in ("queued", "running"):
+        return web.json_response({"code": 804 if phase == "running" else 813, "msg": "APIKEY_TASK_IS_RUNNING", "data": None})
+    return web.json_response({"code": 0, "msg": "success", "data": [
+        {"fileUrl": media_url(request, f"{task_id}.png"), "fileType": "png", "taskCostTime": "0"},
+    ]})
+
+
+# ---------------------------------------------------------------- 素材与控制接口
+
+
+async def media(request):
+    state = request.app["state"]
+    name = request.match_info["name"]
+    state.counters["media_downloads"] += 1
+    if name.endswith(".mp4"):
+        size = int(state.config["video_bytes"])
+        # ftyp 头让按扩展名或魔数判断类型的调用方识别为 MP4
+        head = b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom"
+        body = head + b"\x00" * max(0, size - len(head))
+        return web.Response(body=body, content_type="video/mp4")
+    return web.Response(body=state.png(), content_type="image/png")
+
+
+async def mock_stats(request):
+    state = request.app["state"]
+    phases = Counter(state.task_phase(task_id) for task_id in state.tasks)
+    return web.json_response({
+        "uptime_seconds": round(time.time() - state.started_at, 3),
+        "config": state.config,
+        "counters": dict(state.counters),
+        "tasks": dict(phases),
+    })
+
+
+async def mock_config(request):
+    state = request.app["state"]
+    updates = await request.json()
+    unknown = sorted(set(updates) - set(DEFAULT_CONFIG))
+    if unknown:
+        return web.json_response({"error": f"未知配置项：{', '.join(unknown)}"}, status=400)
+    state.config.update(updates)
+    return web.json_response(state.config)
+
+
+async def mock_reset(request):
+    request.app["state"].reset()
+    return web.json_response({"ok": True})
+
+
+def create_app(config=None):
+    """The mock relay as an ``aiohttp.web.Application``; ``config`` overrides ``DEFAULT_CONFIG``."""
+    app = web.Application(middlewares=[fault_middleware], client_max_size=1024 ** 3)
+    app["state"] = MockRelayState(config)
+    app.router.add_post("/v1/images/generations", dapao_image_generations)
+    app.router.add_post("/v1/images/edits", dapao_image_generations)
+    app.router.add_get("/v1/images/tasks/{task_id}", dapao_image_task)
+    app.router.add_get("/v1/tasks/{task_id}", dapao_image_task)
+    app.router.add_post("/v1beta/models/{model}:generateContent", dapao_generate_content)
+    app.router.add_post("/v1/files", dapao_files)
+    app.router.add_post("/v1/video/generations", dapao_video_generations)
+    app.router.add_get("/v1/video/generations/{task_id}", dapao_video_task)
+    app.router.add_post("/v1/chat/completions", dapao_chat)
+    # 具体路由须先于 /openapi/v2/{endpoint} 通配路由注册
+    app.router.add_post("/openapi/v2/media/upload/binary", rh_upload_binary)
+    app.router.add_post("/openapi/v2/query", rh_query)
+    app.router.add_post("/openapi/v2/assets/create", rh_asset_create)
+    app.router.add_post("/openapi/v2/assets/query", rh_asset_query)
+    app.router.add_post("/openapi/v2/{endpoint:.+}", rh_submit_endpoint)
+    app.router.add_post("/task/openapi/upload", rh_app_upload)
+    app.router.add_post("/task/openapi/ai-app/run", rh_app_run)
+    app.router.add_post("/task/openapi/outputs", rh_app_outputs)
+    app.router.add_get("/mock/media/{name}", media)
+    app.router.add_get("/mock/stats", mock_stats)
+    app.router.add_post("/mock/config", mock_config)
+    app.router.add_post("/mock/reset", mock_reset)
+    return app
+
+
+class MockRelayServer:
+    """Run the mock relay on a background thread, for use inside a benchmark process."""
+
+    def __init__(self, host="127.0.0.1", port=0, config=None):
+        self.host = host
+        self.port = port
+        self.app = create_app(config)
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def state(self):
+        return self.app["state"]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="dapao-mock-relay", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(10):
+            raise RuntimeError("模拟中转站启动超时。")
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self.app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+        self._loop = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dapaoAI / RunningHub 本地模拟中转站")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18600)
+    parser.add_argument("--latency", type=float, default=DEFAULT_CONFIG["latency"], help="每个请求的固定延迟（秒）")
+    parser.add_argument("--latency-jitter", type=float, default=DEFAULT_CONFIG["latency_jitter"], help="额外随机延迟上限（秒）")
+    parser.add_argument("--queue-seconds", type=float, default=DEFAULT_CONFIG["queue_seconds"], help="任务排队时长（秒）")
+    parser.add_argument("--run-seconds", type=float, default=DEFAULT_CONFIG["run_seconds"], help="任务生成时长（秒）")
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_CONFIG["rate_limit_ratio"], help="返回 429 的比例 0-1")
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_CONFIG["error_ratio"], help="返回 HTTP 500 的比例 0-1")
+    parser.add_argument("--failure-rate", type=float, default=DEFAULT_CONFIG["failure_ratio"], help="任务最终失败的比例 0-1")
+    parser.add_argument("--image-size", type=int, default=DEFAULT_CONFIG["image_size"], help="结果图片边长（像素）")
+    parser.add_argument("--video-mb", type=float, default=DEFAULT_CONFIG["video_bytes"] / 1024 / 1024, help="结果视频大小（MB）")
+    args = parser.parse_args()
+    config = {
+        "latency": args.latency,
+        "latency_jitter": args.latency_jitter,
+        "queue_seconds": args.queue_seconds,
+        "run_seconds": args.run_seconds,
+        "rate_limit_ratio": args.rate_limit,
+        "error_ratio": args.error_rate,
+        "failure_ratio": args.failure_rate,
+        "image_size": args.image_size,
+        "video_bytes": int(args.video_mb * 1024 * 1024),
+    }
+    print(f"模拟中转站：http://{args.host}:{args.port}  配置：{json.dumps(config, ensure_ascii=False)}")
+    web.run_app(create_app(config), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
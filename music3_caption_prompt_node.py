@@ -9,12 +9,13 @@ import asyncio
 import json
 import re
 import sys
+import threading
 import time
 import traceback
 from pathlib import Path
 
-import requests
 
+from .async_http_utils import CONNECTION_ERRORS, request as http_request
 from .network_error_utils import friendly_443_status, friendly_network_error
 
 
@@ -572,42 +573,188 @@ def _parse_index_cards(index_path):
     return cards
 
 
+# 拉丁字母线索按整词匹配，其余（中文）线索按子串匹配
+_LATIN_CUE = re.compile(r"[a-z0-9 &+.'/-]+")
+_WORD_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789")
+_CUE_END = None
+KEYWORD_STOPWORDS = frozenset({"the", "and", "with", "for", "from", "into", "auto"})
+
+
+class _CueMatcher:
+    """Find every cue present in a text in one pass.
+
+    All cues share one character trie walked from each position, so
+    overlapping cues ("pop" inside "dance pop") are all reported.  Latin cues
+    must sit on word boundaries, as ``(?<![a-z0-9])cue(?![a-z0-9])`` would;
+    other cues match anywhere.
+    """
+
+    def __init__(self, cues):
+        self._root = {}
+        for cue in cues:
+            node = self._root
+            for char in cue:
+                node = node.setdefault(char, {})
+            node[_CUE_END] = (cue, _LATIN_CUE.fullmatch(cue) is not None)
+
+    def find(self, text):
+        found = set()
+        root = self._root
+        length = len(text)
+        for start in range(length):
+            node = root.get(text[start])
+            if node is None:
+                continue
+            at_boundary = start == 0 or text[start - 1] not in _WORD_CHARS
+            end = start + 1
+            while True:
+                terminal = node.get(_CUE_END)
+                if terminal is not None:
+                    cue, latin = terminal
+                    if not latin or (at_boundary and (end == length or text[end] not in _WORD_CHARS)):
+                        found.add(cue)
+                if end == length:
+                    break
+                node = node.get(text[end])
+                if node is None:
+                    break
+                end += 1
+        return found
+
+
+def _cue_families():
+    """``{cue: [(family, weight)]}``; longer cues weigh more."""
+    families = {}
+    for family, cues in AUTO_ROUTE_CUES.items():
+        for cue in cues:
+            families.setdefault(cue, []).append((family, 3 if len(cue) >= 5 else 2))
+    return families
+
+
+CUE_FAMILIES = _cue_families()
+ALIAS_TOKENS = {
+    cue: frozenset(token for token in re.findall(r"[a-z0-9+#&']{2,}", english) if token not in KEYWORD_STOPWORDS)
+    for cue, english in QUERY_ALIASES.items()
+}
+CUE_MATCHER = _CueMatcher(CUE_FAMILIES)
+
+
 def _keyword_tokens(text):
     source = str(text or "").lower()
-    expanded = [source]
-    for cue, english in QUERY_ALIASES.items():
+    tokens = {token for token in re.findall(r"[a-z0-9+#&']{2,}", source) if token not in KEYWORD_STOPWORDS}
+    # 别名都是短中文词，逐个子串判断比走字典树更快；英文展开词已预先分词
+    for cue, alias_tokens in ALIAS_TOKENS.items():
         if cue in source:
-            expanded.append(english)
-    return {
-        token for token in re.findall(r"[a-z0-9+#&']{2,}", str(text or "").lower())
-        if token not in {"the", "and", "with", "for", "from", "into", "auto"}
-    } | {
-        token for token in re.findall(r"[a-z0-9+#&']{2,}", " ".join(expanded))
-        if token not in {"the", "and", "with", "for", "from", "into", "auto"}
-    }
+            tokens |= alias_tokens
+    return tokens
+
+
+def _family_scores(text):
+    """Score every family in ``AUTO_ROUTE_CUES`` against ``text`` at once."""
+    scores = dict.fromkeys(AUTO_ROUTE_CUES, 0)
+    for cue in CUE_MATCHER.find(str(text or "").lower()):
+        for family, weight in CUE_FAMILIES.get(cue, ()):
+            scores[family] += weight
+    scores["general-pop-ballad"] = min(scores["general-pop-ballad"], 1)
+    return scores
 
 
 def _route_automatic_family(text, exclude=None):
-    source = str(text or "").lower()
-    scored = []
-    for family, cues in AUTO_ROUTE_CUES.items():
-        if family == exclude:
-            continue
-        score = 0
-        for cue in cues:
-            if re.fullmatch(r"[a-z0-9 &+.'/-]+", cue):
-                matched = re.search(rf"(?<![a-z0-9]){re.escape(cue)}(?![a-z0-9])", source) is not None
-            else:
-                matched = cue in source
-            if matched:
-                score += 3 if len(cue) >= 5 else 2
-        if family == "general-pop-ballad":
-            score = min(score, 1)
-        scored.append((score, family))
+    scored = [(score, family) for family, score in _family_scores(text).items() if family != exclude]
     scored.sort(key=lambda item: (-item[0], item[1]))
     return scored[0][1] if scored and scored[0][0] > 0 else "general-pop-ballad"
 
 
+CARD_TEXT_KEYS = ("style", "secondary", "tempo", "mood", "vocal", "palette")
+
+
+class _FamilyIndex:
+    """Cards of one family with their keyword tokens and a token -> card inverted map."""
+
+    def __init__(self, cards):
+        self.cards = cards
+        self.postings = {}
+        for order, card in enumerate(cards):
+            for token in _keyword_tokens(" ".join(card[key] for key in CARD_TEXT_KEYS)):
+                self.postings.setdefault(token, []).append(order)
+
+    def ranked(self, tokens):
+        """Cards by descending token overlap; ties keep index order, as before."""
+        scores = [0] * len(self.cards)
+        for token in tokens:
+            for order in self.postings.get(token, ()):
+                scores[order] += 1
+        return [self.cards[order] for order in sorted(range(len(self.cards)), key=lambda order: (-scores[order], order))]
+
+
+class _ReferenceIndex:
+    """Compiled Music 3 reference library, rebuilt when the resource files change.
+
+    Index cards are parsed once per change of the references directory or any
+    index file; template bodies are read on first use and kept until the
+    templates directory changes.
+    """
+
+    def __init__(self, root):
+        self.references_dir = root / "references"
+        self.templates_dir = root / "templates"
+        self._lock = threading.Lock()
+        self._families = {}
+        self._templates = {}
+        self._references_signature = None
+        self._templates_signature = None
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _current_references_signature(self):
+        try:
+            index_files = sorted(self.references_dir.glob("index-*.md"))
+        except OSError:
+            index_files = []
+        return (self._mtime(self.references_dir),) + tuple(self._mtime(path) for path in index_files)
+
+    def _refresh(self):
+        references_signature = self._current_references_signature()
+        if references_signature != self._references_signature:
+            self._families = {}
+            self._references_signature = references_signature
+        templates_signature = self._mtime(self.templates_dir)
+        if templates_signature != self._templates_signature:
+            self._templates = {}
+            self._templates_signature = templates_signature
+
+    def family(self, family):
+        with self._lock:
+            self._refresh()
+            index = self._families.get(family)
+            if index is None:
+                index = self._families[family] = _FamilyIndex(
+                    _parse_index_cards(self.references_dir / f"index-{family}.md")
+                )
+            return index
+
+    def template(self, name):
+        with self._lock:
+            content = self._templates.get(name)
+        if content is not None:
+            return content
+        try:
+            content = (self.templates_dir / name).read_text(encoding="utf-8").strip()
+        except OSError:
+            content = ""
+        with self._lock:
+            self._templates[name] = content
+        return content
+
+
+REFERENCE_INDEX = _ReferenceIndex(RESOURCE_ROOT)
+
+
 def _select_templates(families, query, maximum=3):
     tokens = _keyword_tokens(query)
     ranked_by_family = []
@@ -616,15 +763,9 @@ def _select_templates(families, query, maximum=3):
         if not family or family in seen:
             continue
         seen.add(family)
-        cards = _parse_index_cards(RESOURCE_ROOT / "references" / f"index-{family}.md")
-        scored = []
-        for order, card in enumerate(cards):
-            text = " ".join(card[key] for key in ("style", "secondary", "tempo", "mood", "vocal", "palette"))
-            score = len(tokens & _keyword_tokens(text))
-            scored.append((score, -order, card))
-        if scored:
-            scored.sort(reverse=True)
-            ranked_by_family.append([item[2] for item in scored])
+        ranked = REFERENCE_INDEX.family(family).ranked(tokens)
+        if ranked:
+            ranked_by_family.append(ranked)
     selected = []
     if ranked_by_family:
         selected.append(ranked_by_family[0][0])
@@ -637,10 +778,7 @@ def _select_templates(families, query, maximum=3):
             break
     references = []
     for card in selected[:maximum]:
-        try:
-            content = (RESOURCE_ROOT / "templates" / card["template"]).read_text(encoding="utf-8").strip()
-        except OSError:
-            content = ""
+        content = REFERENCE_INDEX.template(card["template"])
         if content:
             references.append({"card": card, "caption": content})
     return references
@@ -688,15 +826,15 @@ class Music3CaptionLLMClient:
         self.api_key = api_key
         self.timeout = timeout
 
-    def chat(self, payload):
+    async def chat(self, payload):
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "User-Agent": "ComfyUI-dapaoAPI/Music3CaptionCompiler",
         }
         try:
-            response = requests.post(CHAT_ENDPOINT, headers=headers, json=payload, timeout=self.timeout)
-        except (requests.ConnectionError, requests.Timeout) as error:
+            response = await http_request("POST", CHAT_ENDPOINT, headers=headers, json=payload, timeout=self.timeout)
+        except CONNECTION_ERRORS as error:
             raise RuntimeError(f"{friendly_network_error(error, '提交LLM请求')} LLM请求不会自动重试，以免重复扣费。") from error
         if response.status_code >= 400:
             if response.status_code == 443:
@@ -895,9 +1033,6 @@ class DapaoMusic3CaptionPromptNode:
         )
 
     async def generate_prompt(self, **kwargs):
-        return await asyncio.to_thread(self._generate_prompt_sync, **kwargs)
-
-    def _generate_prompt_sync(self, **kwargs):
         result = {}
         try:
             api_key = str(kwargs.get("🔑 API密钥") or "").strip()
@@ -933,7 +1068,7 @@ class DapaoMusic3CaptionPromptNode:
             }
             _safe_print(f"[Music3Caption] 提交编译：model={model_id}，参考族={reference_families or ['自动路由']}，模板={len(references)}")
             started = time.time()
-            result = Music3CaptionLLMClient(api_key, int(kwargs.get("⌛ 请求超时", 300))).chat(payload)
+            result = await Music3CaptionLLMClient(api_key, int(kwargs.get("⌛ 请求超时", 300))).chat(payload)
             raw_text = _extract_text(result)
             if not raw_text:
                 raise RuntimeError("LLM返回内容为空。")
@@ -0,0 +1,207 @@
+"""Lazy node registry for dapaoAPI.
+
+Importing every node module at ComfyUI startup pulls in torch, numpy, PIL,
+requests, aiohttp and the large prompt/style tables of several nodes before a
+single node is used.  Instead ``LazyNodeRegistry`` reads each module's
+``NODE_CLASS_MAPPINGS`` / ``NODE_DISPLAY_NAME_MAPPINGS`` statically (only
+those statements are parsed; nothing is executed) and registers a lightweight
+stub class per node.
+The real module is imported the first time anything on the stub is touched:
+``INPUT_TYPES()``, ``FUNCTION``, instantiation by the executor, and so on.
+
+Each real import is timed; ``import_profile()`` returns the cost per module.
+Set ``DAPAO_EAGER_IMPORT=1`` to import every module at startup and print the
+profile instead.
+"""
+
+import ast
+import importlib
+import os
+import re
+import threading
+import time
+
+
+EAGER_IMPORT_ENV = "DAPAO_EAGER_IMPORT"
+
+
+def _log_info(message):
+    print(f"[dapaoAPI-节点注册] 信息：{message}")
+
+
+def _log_error(message):
+    print(f"[dapaoAPI-节点注册] 错误：{message}")
+
+
+def _literal(node, constants):
+    """Resolve a string literal or a module-level string constant."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Name) and node.id in constants:
+        return constants[node.id]
+    raise ValueError("not a static string")
+
+
+# 顶层字符串常量，如 NODE_NAME = "..."、DISPLAY_NAME = "..."
+_STRING_CONSTANT = re.compile(r"^([A-Za-z_][A-Za-z0-9_]*)\s*=\s*(['\"].*['\"])\s*$", re.MULTILINE)
+
+
+def _top_level_statement(source, name):
+    """Source of the top-level ``name = ...`` statement, parsed on its own.
+
+    Only the few lines that define the mappings are parsed, not the whole
+    module; some node modules carry thousands of lines of prompt tables.
+    """
+    match = re.search(rf"^{name}\s*=", source, re.MULTILINE)
+    if not match:
+        return None
+    lines = source[match.start():].splitlines()
+    for end in range(1, min(len(lines), 200) + 1):
+        try:
+            tree = ast.parse("\n".join(lines[:end]))
+        except SyntaxError:
+            continue
+        return tree.body[0].value
+    raise ValueError(f"{name} is not a parsable statement")
+
+
+def read_static_mappings(path):
+    """Return ``[(node_name, class_name, display_name)]`` without importing ``path``.
+
+    Raises ``ValueError`` when the mappings are not plain dict literals keyed by
+    strings or module-level string constants.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    constants = {}
+    for match in _STRING_CONSTANT.finditer(source):
+        try:
+            value = ast.literal_eval(match.group(2))
+        except (ValueError, SyntaxError):
+            continue
+        if isinstance(value, str):
+            constants.setdefault(match.group(1), value)
+
+    class_dict = _top_level_statement(source, "NODE_CLASS_MAPPINGS")
+    if not isinstance(class_dict, ast.Dict):
+        raise ValueError("NODE_CLASS_MAPPINGS is not a dict literal")
+    class_mapping = []
+    for key, item in zip(class_dict.keys, class_dict.values):
+        if not isinstance(item, ast.Name):
+            raise ValueError("NODE_CLASS_MAPPINGS values must be class names")
+        class_mapping.append((_literal(key, constants), item.id))
+
+    display_mapping = {}
+    display_dict = _top_level_statement(source, "NODE_DISPLAY_NAME_MAPPINGS")
+    if isinstance(display_dict, ast.Dict):
+        display_mapping = {
+            _literal(key, constants): _literal(item, constants)
+            for key, item in zip(display_dict.keys, display_dict.values)
+        }
+    return [(name, class_name, display_mapping.get(name, name)) for name, class_name in class_mapping]
+
+
+class _LazyNodeMeta(type):
+    """Metaclass that forwards class attribute access and instantiation to the real node."""
+
+    def _real(cls):
+        return cls._registry.node_class(cls._module_name, cls._class_name)
+
+    def __getattr__(cls, name):
+        # 只转发普通属性；双下划线属性由 inspect/copy 等工具探测，不应触发导入
+        if name.startswith("__") and name.endswith("__"):
+            raise AttributeError(name)
+        return getattr(cls._real(), name)
+
+    def __call__(cls, *args, **kwargs):
+        return cls._real()(*args, **kwargs)
+
+
+class LazyNodeRegistry:
+    """Build stub ``NODE_CLASS_MAPPINGS`` and import node modules on first use."""
+
+    def __init__(self, package, base_dir):
+        self.package = package
+        self.base_dir = base_dir
+        self._lock = threading.RLock()
+        self._modules = {}
+        self._profile = {}
+        self.class_mappings = {}
+        self.display_mappings = {}
+        self.module_nodes = {}
+
+    def register(self, module_name):
+        """Register every node of ``module_name``; fall back to a real import if needed."""
+        path = os.path.join(self.base_dir, f"{module_name}.py")
+        try:
+            entries = read_static_mappings(path)
+        except (OSError, SyntaxError, ValueError) as error:
+            _log_info(f"{module_name} 无法静态读取节点映射（{error}），改为直接导入")
+            module = self.load_module(module_name)
+            entries = [
+                (name, node_class.__name__, module.NODE_DISPLAY_NAME_MAPPINGS.get(name, name))
+                for name, node_class in module.NODE_CLASS_MAPPINGS.items()
+            ]
+        self.module_nodes[module_name] = [name for name, _, _ in entries]
+        for name, class_name, display_name in entries:
+            stub = _LazyNodeMeta(class_name, (), {
+                "_registry": self,
+                "_module_name": module_name,
+                "_class_name": class_name,
+                "__module__": f"{self.package}.{module_name}",
+                "__doc__": f"Lazy stub for {module_name}.{class_name}.",
+            })
+            self.class_mappings[name] = stub
+            self.display_mappings[name] = display_name
+
+    def load_module(self, module_name):
+        """Import a node module once, recording how long the import took."""
+        module = self._modules.get(module_name)
+        if module is not None:
+            return module
+        with self._lock:
+            module = self._modules.get(module_name)
+            if module is None:
+                started = time.perf_counter()
+                module = importlib.import_module(f".{module_name}", self.package)
+                self._profile[module_name] = time.perf_counter() - started
+                self._modules[module_name] = module
+        return module
+
+    def node_class(self, module_name, class_name):
+        return getattr(self.load_module(module_name), class_name)
+
+    def load_all(self):
+        for module_name in self.module_nodes:
+            try:
+                self.load_module(module_name)
+            except Exception as error:
+                _log_error(f"{module_name} 导入失败：{error}")
+
+    def import_profile(self):
+        """``[(module, seconds)]`` for modules imported so far, slowest first.
+
+        Modules are timed in the order they load, so shared dependencies
+        (torch, numpy, ...) are charged to whichever module imported them first.
+        """
+        with self._lock:
+            return sorted(self._profile.items(), key=lambda item: item[1], reverse=True)
+
+    def print_import_profile(self):
+        profile = self.import_profile()
+        print("  ⏱️ 节点模块导入耗时：")
+        for module_name, seconds in profile:
+            print(f"     {seconds * 1000:8.1f} ms  {module_name}")
+        print(f"     {sum(seconds for _, seconds in profile) * 1000:8.1f} ms  合计")
+
+
+def eager_import_requested():
+    return os.environ.get(EAGER_IMPORT_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+__all__ = [
+    "EAGER_IMPORT_ENV",
+    "LazyNodeRegistry",
+    "eager_import_requested",
+    "read_static_mappings",
+]
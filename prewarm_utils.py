@@ -0,0 +1,214 @@
+"""Background connection warm-up for the relay hosts dapaoAPI nodes talk to.
+
+The first execution after ComfyUI starts used to pay DNS resolution, the TCP
+connect and the TLS handshake to every relay before any work happened, which
+is slowest behind the local proxies ``friendly_network_error`` warns about.
+``start_prewarm`` runs once on a daemon thread at extension load:
+
+* each host is resolved once with ``getaddrinfo`` to measure DNS time for
+  the report; the result itself is not reused;
+* a ``HEAD`` request opens a keep-alive connection in the pool the nodes use
+  later: the aiohttp session of ``async_http_utils`` for dapaoAI and the Gemini
+  mirrors (which also fills its ``ttl_dns_cache``),
+  ``relay_policy_utils.shared_session()`` for RunningHub.  Nodes skip DNS,
+  TCP and TLS for as long as those pooled connections stay open.
+
+Targets are the dapaoAI relay, both RunningHub channels and the Gemini
+mirrors in ``gemini3_config.json`` that have an API key filled in.  The
+per-host reachability and latency report is served at ``/dapao/prewarm`` and
+pushed to the UI as the ``dapao.prewarm`` event.  Set ``DAPAO_PREWARM=0`` to
+turn warm-up off.
+"""
+
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+PREWARM_ENV = "DAPAO_PREWARM"
+PREWARM_EVENT = "dapao.prewarm"
+WARM_TIMEOUT_SECONDS = 8
+MAX_PARALLEL_WARMUPS = 8
+
+# (名称, 地址, 连接池)：aiohttp 为 async_http_utils 的共享会话，requests 为 relay_policy_utils 的共享会话
+DEFAULT_TARGETS = (
+    ("dapaoAI", "https://api.dapaoai.com", "aiohttp"),
+    ("RunningHub 国内版", "https://www.runninghub.cn", "requests"),
+    ("RunningHub 国外版", "https://www.runninghub.ai", "requests"),
+)
+
+
+def _log_info(message):
+    print(f"[dapaoAPI-连接预热] 信息：{message}")
+
+
+def prewarm_enabled():
+    return os.environ.get(PREWARM_ENV, "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def resolve(host, port):
+    """Resolve ``host:port`` and return its distinct addresses."""
+    infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+def _gemini_targets():
+    try:
+        from .gemini3_client import load_config
+    except Exception:
+        return []
+    targets = []
+    providers = load_config().get("api_providers")
+    for name, config in (providers if isinstance(providers, dict) else {}).items():
+        if not isinstance(config, dict):
+            continue
+        api_key = str(config.get("api_key") or "").strip()
+        base_url = str(config.get("base_url") or "").strip()
+        # 示例配置里的占位密钥（“你的…API密钥”）说明该镜像站没有实际使用
+        if base_url.startswith("https://") and api_key and not api_key.startswith("你的"):
+            targets.append((f"Gemini {name}", base_url, "aiohttp"))
+    return targets
+
+
+def warm_targets():
+    """Targets as ``(name, url, pool)``; duplicate hosts are warmed once."""
+    targets = []
+    seen = set()
+    for name, url, pool in list(DEFAULT_TARGETS) + _gemini_targets():
+        parts = urlsplit(url)
+        key = (parts.hostname, parts.port, pool)
+        if parts.hostname and key not in seen:
+            seen.add(key)
+            targets.append((name, url, pool))
+    return targets
+
+
+async def _head_async(url):
+    from .async_http_utils import background_loop, client_timeout
+
+    session = background_loop.session()
+    async with session.head(url, timeout=client_timeout(WARM_TIMEOUT_SECONDS), allow_redirects=False) as response:
+        await response.read()
+        return response.status
+
+
+def _open_connection(url, pool):
+    if pool == "requests":
+        from .relay_policy_utils import shared_session
+
+        response = shared_session().head(url, timeout=WARM_TIMEOUT_SECONDS, allow_redirects=False)
+        response.close()
+        return response.status_code
+    from .async_http_utils import background_loop
+
+    return background_loop.submit(_head_async(url)).result(WARM_TIMEOUT_SECONDS * 2)
+
+
+def warm_host(name, url, pool):
+    """Resolve and connect to one target; return its report entry."""
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    entry = {
+        "name": name,
+        "host": parts.hostname,
+        "pool": pool,
+        "reachable": False,
+        "dns_ms": None,
+        "connect_ms": None,
+        "status": None,
+        "addresses": [],
+        "error": "",
+    }
+    try:
+        started = time.perf_counter()
+        addresses = resolve(parts.hostname, port)
+        entry.update(dns_ms=round((time.perf_counter() - started) * 1000, 1), addresses=addresses[:4])
+        started = time.perf_counter()
+        # 任何 HTTP 状态码都说明 TCP 与 TLS 已经建立，连接留在连接池中复用
+        entry["status"] = _open_connection(url, pool)
+        entry["connect_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        entry["reachable"] = True
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"[:300]
+    return entry
+
+
+class Prewarmer:
+    """Runs warm-up passes and keeps the latest report."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = threading.Lock()
+        self._report = {"state": "idle", "hosts": []}
+
+    def report(self):
+        with self._lock:
+            return dict(self._report)
+
+    def run(self):
+        """Warm every target now, in parallel; return the report."""
+        with self._running:
+            with self._lock:
+                self._report = {**self._report, "state": "running"}
+            started = time.time()
+            targets = warm_targets()
+            with ThreadPoolExecutor(max_workers=max(1, min(MAX_PARALLEL_WARMUPS, len(targets)))) as executor:
+                hosts = list(executor.map(lambda target: warm_host(*target), targets))
+            report = {
+                "state": "done",
+                "started_at": started,
+                "seconds": round(time.time() - started, 3),
+                "hosts": hosts,
+            }
+            with self._lock:
+                self._report = report
+        for host in hosts:
+            if host["reachable"]:
+                _log_info(f"{host['name']}（{host['host']}）DNS {host['dns_ms']} ms，连接 {host['connect_ms']} ms，HTTP {host['status']}")
+            else:
+                _log_info(f"{host['name']}（{host['host']}）无法连接：{host['error']}")
+        return report
+
+    def start(self, on_done=None):
+        """Run one pass on a daemon thread unless ``DAPAO_PREWARM=0``; return whether it started."""
+        if not prewarm_enabled():
+            with self._lock:
+                self._report = {"state": "disabled", "hosts": []}
+            return False
+
+        def _run():
+            report = self.run()
+            if on_done is not None:
+                on_done(report)
+
+        threading.Thread(target=_run, name="dapaoAPI-prewarm", daemon=True).start()
+        return True
+
+
+prewarmer = Prewarmer()
+
+
+def start_prewarm(on_done=None):
+    return prewarmer.start(on_done)
+
+
+def prewarm_report():
+    return prewarmer.report()
+
+
+__all__ = [
+    "DEFAULT_TARGETS",
+    "PREWARM_ENV",
+    "PREWARM_EVENT",
+    "Prewarmer",
+    "prewarm_enabled",
+    "prewarm_report",
+    "prewarmer",
+    "resolve",
+    "start_prewarm",
+    "warm_host",
+    "warm_targets",
+]
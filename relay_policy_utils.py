@@ -0,0 +1,753 @@
+"""Process-wide traffic policy shared by dapaoAPI relay clients.
+
+Every node already caps its own fan-out, but several nodes in one graph (or
+list-mapped prompts running as separate coroutines) still add up against the
+same relay account.  ``governor`` keeps one limiter per provider and API key so
+all of them draw from a single budget:
+
+* a concurrency cap on in-flight requests;
+* a token bucket that smooths the request rate;
+* AIMD adjustment: a 429 halves the concurrency cap, sustained success grows
+  it back one slot at a time.
+
+``RETRY_POLICY`` is the single retry schedule for the same clients: decorrelated
+jitter so concurrent workers do not retry in lockstep, ``Retry-After`` support,
+a budget per failure class and a cap on the total time spent retrying.
+
+``breakers`` holds one circuit breaker per relay host.  After
+``BREAKER_FAILURE_THRESHOLD`` consecutive connection failures the host is
+treated as down and requests fail immediately with ``CircuitOpenError``; after
+``BREAKER_OPEN_SECONDS`` a single probe request decides whether to close it.
+
+Limits come from ``DEFAULT_LIMITS`` and may be overridden per provider in
+``relay_limits.json`` (see ``relay_limits.example.json``) or at runtime with
+``configure_limits``.  Hosts that are not a known relay, and requests that
+carry no API key (result downloads from a CDN), are not governed.
+
+``request`` sends through ``shared_session()``, one pooled ``requests.Session``
+per process, so polling loops and warm-up (``prewarm_utils``) reuse keep-alive
+connections instead of paying DNS, TCP and TLS setup on every call.
+"""
+
+import asyncio
+import copy
+import hashlib
+import http.cookiejar
+import json
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+try:
+    from .metrics_utils import record_http
+except ImportError:
+    from metrics_utils import record_http
+
+
+LIMITS_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "relay_limits.json")
+
+DEFAULT_LIMITS = {
+    "dapaoai": {"max_concurrency": 8, "rate_per_second": 5.0, "burst": 10},
+    "runninghub": {"max_concurrency": 8, "rate_per_second": 5.0, "burst": 10},
+}
+
+# 主机名关键字 -> 服务商
+PROVIDER_HOST_KEYWORDS = (
+    ("dapaoai", "dapaoai"),
+    ("runninghub", "runninghub"),
+)
+
+# 共享连接池：每个主机最多保留的空闲连接数与主机数
+SESSION_POOL_CONNECTIONS = 16
+SESSION_POOL_MAXSIZE = 32
+
+# 429 后至少间隔这么久才开始恢复并发上限
+RECOVERY_COOLDOWN_SECONDS = 30.0
+# 排队等待时单次最长睡眠，保证释放后的名额能尽快被拿到
+MAX_WAIT_STEP_SECONDS = 0.25
+
+
+def _log_info(message):
+    print(f"[dapaoAPI-中转策略] 信息：{message}")
+
+
+def provider_for_url(url):
+    """Return the relay provider for ``url`` or ``None`` for other hosts."""
+    host = (urlsplit(str(url or "")).hostname or "").lower()
+    for keyword, provider in PROVIDER_HOST_KEYWORDS:
+        if keyword in host:
+            return provider
+    return None
+
+
+def api_key_from_headers(headers):
+    """Pull the API key out of ``Authorization: Bearer`` style headers."""
+    for name, value in (headers or {}).items():
+        if str(name).lower() in ("authorization", "x-api-key", "apikey", "api-key"):
+            text = str(value or "").strip()
+            if text.lower().startswith("bearer "):
+                text = text[7:].strip()
+            return text
+    return ""
+
+
+def _key_fingerprint(api_key):
+    return hashlib.sha256(str(api_key).encode("utf-8")).hexdigest()[:12]
+
+
+class ProviderLimiter:
+    """Concurrency cap plus token bucket for one provider / API key pair."""
+
+    def __init__(self, provider, fingerprint, max_concurrency, rate_per_second, burst):
+        self.provider = provider
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.limit = self.max_concurrency
+        self.rate_per_second = max(0.0, float(rate_per_second or 0))
+        self.burst = max(1, int(burst or 1))
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._last_decrease = 0.0
+        self._successes_since_change = 0
+        self.in_flight = 0
+        self.acquired = 0
+        self.waiting = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.rate_limited = 0
+
+    def reconfigure(self, max_concurrency, rate_per_second, burst):
+        with self._lock:
+            self.max_concurrency = max(1, int(max_concurrency))
+            self.limit = min(self.limit, self.max_concurrency) if self._last_decrease else self.max_concurrency
+            self.rate_per_second = max(0.0, float(rate_per_second or 0))
+            self.burst = max(1, int(burst or 1))
+            self._tokens = min(self._tokens, float(self.burst))
+            self._released.notify_all()
+
+    def _refill(self, now):
+        if self.rate_per_second <= 0:
+            self._tokens = float(self.burst)
+        else:
+            elapsed = max(0.0, now - self._refilled_at)
+            self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate_per_second)
+        self._refilled_at = now
+
+    def _try_acquire(self):
+        """Take a slot if possible; otherwise return how long to wait (lock held)."""
+        if self.in_flight >= self.limit:
+            return MAX_WAIT_STEP_SECONDS
+        now = time.monotonic()
+        self._refill(now)
+        if self._tokens < 1.0:
+            return min(MAX_WAIT_STEP_SECONDS, (1.0 - self._tokens) / self.rate_per_second)
+        self._tokens -= 1.0
+        self.in_flight += 1
+        return 0.0
+
+    def _record_wait(self, waited):
+        self.acquired += 1
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def acquire(self):
+        """Block the calling thread until a slot is free; return the queue wait."""
+        started = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+            try:
+                while True:
+                    delay = self._try_acquire()
+                    if not delay:
+                        break
+                    self._released.wait(delay)
+            finally:
+                self.waiting -= 1
+            waited = time.monotonic() - started
+            self._record_wait(waited)
+        return waited
+
+    async def acquire_async(self):
+        """Await a slot without blocking the event loop; return the queue wait."""
+        started = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    delay = self._try_acquire()
+                if not delay:
+                    break
+                await asyncio.sleep(delay)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        waited = time.monotonic() - started
+        with self._lock:
+            self._record_wait(waited)
+        return waited
+
+    def release(self, status_code=None):
+        """Return the slot and feed the response status into the AIMD limit."""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if status_code == 429:
+                self._on_rate_limited()
+            elif status_code is not None and int(status_code) < 400:
+                self._on_success()
+            self._released.notify_all()
+
+    def _on_rate_limited(self):
+        self.rate_limited += 1
+        self._successes_since_change = 0
+        now = time.monotonic()
+        # 同一波 429 通常成批返回，短时间内只减半一次
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        new_limit = max(1, self.limit // 2)
+        if new_limit != self.limit:
+            _log_info(f"{self.provider} 返回 429，并发上限 {self.limit} -> {new_limit}")
+            self.limit = new_limit
+
+    def _on_success(self):
+        if self.limit >= self.max_concurrency:
+            return
+        self._successes_since_change += 1
+        cooled_down = time.monotonic() - self._last_decrease >= RECOVERY_COOLDOWN_SECONDS
+        if cooled_down and self._successes_since_change >= self.limit:
+            self.limit += 1
+            self._successes_since_change = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "provider": self.provider,
+                "key": self.fingerprint,
+                "limit": self.limit,
+                "max_concurrency": self.max_concurrency,
+                "rate_per_second": self.rate_per_second,
+                "burst": self.burst,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "acquired": self.acquired,
+                "rate_limited": self.rate_limited,
+                "avg_wait_seconds": round(self.total_wait_seconds / self.acquired, 4) if self.acquired else 0.0,
+                "max_wait_seconds": round(self.max_wait_seconds, 4),
+            }
+
+
+class RelayGovernor:
+    """Registry of ``ProviderLimiter`` objects keyed by provider and API key."""
+
+    def __init__(self, limits_path=LIMITS_FILE_PATH):
+        self._lock = threading.Lock()
+        self._limiters = {}
+        self._overrides = {}
+        self._limits_path = limits_path
+        self._file_mtime = None
+        self._file_limits = {}
+
+    def _load_file_limits(self):
+        """Read ``relay_limits.json``; cached by mtime like ``gemini3_config.json``."""
+        try:
+            mtime = os.path.getmtime(self._limits_path)
+        except OSError:
+            mtime = None
+        if mtime == self._file_mtime:
+            return False
+        self._file_mtime = mtime
+        data = {}
+        if mtime is not None:
+            try:
+                with open(self._limits_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception as e:
+                _log_info(f"无法读取 relay_limits.json，使用默认限流配置：{e}")
+                data = {}
+        self._file_limits = data if isinstance(data, dict) else {}
+        return True
+
+    def limits_for(self, provider):
+        """Effective limits: defaults, then the JSON file, then ``configure_limits``."""
+        limits = copy.deepcopy(DEFAULT_LIMITS.get(provider, {}))
+        for source in (self._file_limits, self._overrides):
+            value = source.get(provider)
+            if isinstance(value, dict):
+                limits.update({key: value[key] for key in ("max_concurrency", "rate_per_second", "burst") if key in value})
+        return limits
+
+    def _apply_limits(self):
+        for (provider, _), limiter in self._limiters.items():
+            limits = self.limits_for(provider)
+            limiter.reconfigure(limits["max_concurrency"], limits["rate_per_second"], limits["burst"])
+
+    def configure_limits(self, provider, **limits):
+        """Override limits for ``provider`` at runtime, e.g. ``max_concurrency=4``."""
+        with self._lock:
+            self._overrides.setdefault(provider, {}).update(limits)
+            self._apply_limits()
+
+    def limiter(self, url, headers=None, api_key=None):
+        """Return the limiter for the request, or ``None`` if it is not governed."""
+        provider = provider_for_url(url)
+        if provider is None:
+            return None
+        if api_key is None:
+            api_key = api_key_from_headers(headers)
+        if not api_key:
+            return None
+        fingerprint = _key_fingerprint(api_key)
+        with self._lock:
+            if self._load_file_limits():
+                self._apply_limits()
+            limiter = self._limiters.get((provider, fingerprint))
+            if limiter is None:
+                limits = self.limits_for(provider)
+                limiter = ProviderLimiter(
+                    provider,
+                    fingerprint,
+                    limits["max_concurrency"],
+                    limits["rate_per_second"],
+                    limits["burst"],
+                )
+                self._limiters[(provider, fingerprint)] = limiter
+            return limiter
+
+    def snapshot(self):
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return [limiter.snapshot() for limiter in limiters]
+
+
+governor = RelayGovernor()
+
+
+class _Slot:
+    """Handle yielded by ``slot``/``async_slot``; record the response status on it."""
+
+    __slots__ = ("status_code", "wait_seconds")
+
+    def __init__(self):
+        self.status_code = None
+        self.wait_seconds = 0.0
+
+    def record(self, response):
+        self.status_code = getattr(response, "status_code", None)
+        return response
+
+
+@contextmanager
+def slot(url, headers=None, api_key=None):
+    """Hold one governed slot around a blocking request."""
+    limiter = governor.limiter(url, headers, api_key)
+    handle = _Slot()
+    if limiter is None:
+        yield handle
+        return
+    handle.wait_seconds = limiter.acquire()
+    try:
+        yield handle
+    finally:
+        limiter.release(handle.status_code)
+
+
+@asynccontextmanager
+async def async_slot(url, headers=None, api_key=None):
+    """Hold one governed slot around an awaited request."""
+    limiter = governor.limiter(url, headers, api_key)
+    handle = _Slot()
+    if limiter is None:
+        yield handle
+        return
+    handle.wait_seconds = await limiter.acquire_async()
+    try:
+        yield handle
+    finally:
+        limiter.release(handle.status_code)
+
+
+# 同一主机连续连接失败多少次后熔断，以及熔断后多久放行一次探测请求
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_OPEN_SECONDS = 30.0
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of sending a request to a relay host whose breaker is open.
+
+    Subclasses ``requests.ConnectionError`` (and is listed in
+    ``async_http_utils.CONNECTION_ERRORS``) so existing connection-failure
+    handlers turn it into their usual friendly message.
+    """
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one relay host."""
+
+    def __init__(self, host, failure_threshold=BREAKER_FAILURE_THRESHOLD, open_seconds=BREAKER_OPEN_SECONDS):
+        self.host = host
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.open_seconds = float(open_seconds)
+        self._lock = threading.Lock()
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+
+    def before_request(self):
+        """Let the request through or raise ``CircuitOpenError`` without touching the network."""
+        with self._lock:
+            if self.state == BREAKER_CLOSED:
+                return
+            remaining = self.open_seconds - (time.monotonic() - self._opened_at)
+            if self.state == BREAKER_OPEN and remaining <= 0:
+                self.state = BREAKER_HALF_OPEN
+            if self.state == BREAKER_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self.rejected += 1
+            raise CircuitOpenError(
+                f"{self.host} 连续 {self.consecutive_failures} 次连接失败，已暂停请求"
+                f"（约 {max(1, int(remaining))} 秒后自动探测恢复）。"
+            )
+
+    def record_success(self):
+        with self._lock:
+            if self.state != BREAKER_CLOSED:
+                _log_info(f"{self.host} 探测成功，恢复请求")
+            self.state = BREAKER_CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            probe_failed = self.state == BREAKER_HALF_OPEN
+            self._probe_in_flight = False
+            if probe_failed or (self.state == BREAKER_CLOSED and self.consecutive_failures >= self.failure_threshold):
+                if self.state == BREAKER_CLOSED:
+                    _log_info(f"{self.host} 连续 {self.consecutive_failures} 次连接失败，熔断 {self.open_seconds:.0f} 秒")
+                self.state = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+
+    def record_neutral(self):
+        """The request ended without telling whether the host is up; free the probe."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "host": self.host,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "rejected": self.rejected,
+            }
+
+
+class BreakerRegistry:
+    """One ``CircuitBreaker`` per relay host; other hosts are not tracked."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def breaker(self, url):
+        if provider_for_url(url) is None:
+            return None
+        host = (urlsplit(str(url)).hostname or "").lower()
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(host)
+            return breaker
+
+    def snapshot(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [breaker.snapshot() for breaker in breakers]
+
+
+breakers = BreakerRegistry()
+
+
+def is_circuit_open(error):
+    """Whether ``error`` or anything in its ``raise ... from`` chain is ``CircuitOpenError``."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, CircuitOpenError):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+@contextmanager
+def circuit(url, failure_types=(requests.ConnectionError, requests.Timeout)):
+    """Guard one request with the host's breaker.
+
+    Raises ``CircuitOpenError`` up front while the host is considered down.
+    ``failure_types`` are the transport errors that count as a failed attempt;
+    any HTTP response counts as the host being reachable.
+    """
+    breaker = breakers.breaker(url)
+    if breaker is None:
+        yield
+        return
+    breaker.before_request()
+    try:
+        yield
+    except failure_types:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        breaker.record_neutral()
+        raise
+    else:
+        breaker.record_success()
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def shared_session():
+    """Process-wide pooled ``requests.Session`` used by ``request``.
+
+    Cookies are not kept, so requests made with different API keys stay as
+    independent as separate ``requests.request`` calls.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=SESSION_POOL_CONNECTIONS,
+                pool_maxsize=SESSION_POOL_MAXSIZE,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def request(method, url, api_key=None, **kwargs):
+    """``requests.request`` for the threaded RunningHub clients, drawn from the governor."""
+    with circuit(url), slot(url, kwargs.get("headers"), api_key) as handle:
+        started = time.perf_counter()
+        status = None
+        try:
+            response = shared_session().request(method, url, **kwargs)
+            status = response.status_code
+        finally:
+            record_http(urlsplit(url).hostname, method, status, time.perf_counter() - started)
+        return handle.record(response)
+
+
+RETRY_CONNECTION = "connection"
+RETRY_RATE_LIMIT = "rate_limit"
+RETRY_SERVER = "server"
+ALL_RETRY_CLASSES = (RETRY_CONNECTION, RETRY_RATE_LIMIT, RETRY_SERVER)
+
+# 每类失败最多重试几次
+DEFAULT_RETRY_BUDGETS = {RETRY_CONNECTION: 2, RETRY_RATE_LIMIT: 4, RETRY_SERVER: 2}
+
+
+def decorrelated_jitter(previous, base, cap):
+    """Next sleep for "decorrelated jitter" backoff: ``uniform(base, previous * 3)``."""
+    previous = max(float(previous or 0), float(base))
+    return min(float(cap), random.uniform(float(base), previous * 3))
+
+
+def parse_retry_after(headers):
+    """Seconds requested by a ``Retry-After`` header (delta or HTTP date), else ``None``."""
+    value = None
+    for name, header_value in (headers or {}).items():
+        if str(name).lower() == "retry-after":
+            value = str(header_value or "").strip()
+            break
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def classify_failure(error=None, status_code=None):
+    """Map a transport error or HTTP status to a retry class, or ``None`` if final."""
+    if isinstance(error, CircuitOpenError):
+        return None
+    if error is not None:
+        return RETRY_CONNECTION
+    if status_code == 429:
+        return RETRY_RATE_LIMIT
+    if status_code in (500, 502, 503, 504):
+        return RETRY_SERVER
+    return None
+
+
+class RetryPolicy:
+    """Shared retry schedule; call ``start`` once per logical request."""
+
+    def __init__(self, base_delay=1.0, max_delay=20.0, deadline=120.0, budgets=None):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.budgets = dict(DEFAULT_RETRY_BUDGETS if budgets is None else budgets)
+
+    def start(self, retry_on=ALL_RETRY_CLASSES, deadline=None, budgets=None):
+        """Begin a retry sequence that only retries the classes in ``retry_on``.
+
+        ``budgets`` overrides the per-class retry counts for this sequence only.
+        """
+        merged = dict(self.budgets)
+        merged.update(budgets or {})
+        return RetryState(self, retry_on, self.deadline if deadline is None else deadline, merged)
+
+
+class RetryState:
+    """Per-request retry bookkeeping created by ``RetryPolicy.start``."""
+
+    def __init__(self, policy, retry_on, deadline, budgets):
+        self.policy = policy
+        self.retry_on = set(retry_on)
+        self.deadline = deadline
+        self.budgets = budgets
+        self.started = time.monotonic()
+        self.attempts = 1
+        self.used = {}
+        self._previous = policy.base_delay
+
+    def next_delay(self, error=None, response=None):
+        """Seconds to sleep before the next attempt, or ``None`` to give up.
+
+        Pass the transport ``error`` or the failed ``response``.  A server
+        ``Retry-After`` wins over the jittered backoff, plus a little jitter of
+        its own so that every worker told "retry in 5 s" does not return at once.
+        """
+        status_code = getattr(response, "status_code", None)
+        failure = classify_failure(error, status_code)
+        if failure is None or failure not in self.retry_on:
+            return None
+        if self.used.get(failure, 0) >= self.budgets.get(failure, 0):
+            return None
+        delay = decorrelated_jitter(self._previous, self.policy.base_delay, self.policy.max_delay)
+        self._previous = delay
+        retry_after = parse_retry_after(getattr(response, "headers", None)) if response is not None else None
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, self.policy.base_delay)
+        remaining = self.deadline - (time.monotonic() - self.started)
+        if delay > remaining:
+            return None
+        self.used[failure] = self.used.get(failure, 0) + 1
+        self.attempts += 1
+        return delay
+
+
+RETRY_POLICY = RetryPolicy()
+
+
+def _retry_reason(error, response):
+    if error is not None:
+        return f"连接失败（{type(error).__name__}）"
+    return f"HTTP {response.status_code}"
+
+
+def request_with_retry(method, url, retry=None, api_key=None, **kwargs):
+    """Governed ``requests.request`` that sleeps and retries according to ``retry``.
+
+    Returns the last response, retryable or not, once the budget is spent; a
+    transport error that exhausts the budget is re-raised so callers keep their
+    own connection-failure messages.  ``retry.attempts`` tells how many were made.
+    A seekable ``data`` body is rewound before every attempt.
+    """
+    retry = retry or RETRY_POLICY.start()
+    body = kwargs.get("data")
+    while True:
+        # 流式请求体（如 MultipartFileBody）每次尝试都从头发送
+        if hasattr(body, "read") and hasattr(body, "seek"):
+            body.seek(0)
+        try:
+            response = request(method, url, api_key=api_key, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as error:
+            delay = retry.next_delay(error=error)
+            if delay is None:
+                raise
+            _log_info(f"{_retry_reason(error, None)}，{delay:.1f} 秒后进行第 {retry.attempts} 次尝试")
+            time.sleep(delay)
+            continue
+        delay = retry.next_delay(response=response)
+        if delay is None:
+            return response
+        _log_info(f"{_retry_reason(None, response)}，{delay:.1f} 秒后进行第 {retry.attempts} 次尝试")
+        time.sleep(delay)
+
+
+def configure_limits(provider, **limits):
+    governor.configure_limits(provider, **limits)
+
+
+def snapshot():
+    """Per provider/key limiter state, for logs and diagnostics."""
+    return governor.snapshot()
+
+
+def breaker_snapshot():
+    """Per host circuit breaker state, for logs and diagnostics."""
+    return breakers.snapshot()
+
+
+__all__ = [
+    "ALL_RETRY_CLASSES",
+    "BreakerRegistry",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "DEFAULT_LIMITS",
+    "RETRY_CONNECTION",
+    "RETRY_POLICY",
+    "RETRY_RATE_LIMIT",
+    "RETRY_SERVER",
+    "ProviderLimiter",
+    "RelayGovernor",
+    "RetryPolicy",
+    "RetryState",
+    "api_key_from_headers",
+    "async_slot",
+    "breaker_snapshot",
+    "breakers",
+    "circuit",
+    "classify_failure",
+    "configure_limits",
+    "decorrelated_jitter",
+    "governor",
+    "is_circuit_open",
+    "parse_retry_after",
+    "provider_for_url",
+    "request",
+    "request_with_retry",
+    "shared_session",
+    "slot",
+    "snapshot",
+]
@@ -7,10 +7,12 @@ RH 全能图片多并发节点
 
 import json
 import re
+import threading
 import time
 import traceback
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
 
+import numpy as np
 import torch
 
 try:
@@ -18,6 +20,11 @@ try:
 except Exception:
     comfy = None
 
+try:
+    from server import PromptServer
+except Exception:
+    PromptServer = None
+
 from .rh_all_image_node import (
     API_CHANNEL_CHOICES,
     ALL_RATIOS,
@@ -27,13 +34,23 @@ from .rh_all_image_node import (
     MODEL_CHOICES,
     DapaoRHAllImageNode,
     create_blank_tensor,
-    pil2tensor,
 )
+from .metrics_utils import TaskWaitTimer, execution_summary, propagate, span, timed_execution
+from .relay_policy_utils import decorrelated_jitter, is_circuit_open
+from .usage_ledger_utils import UsageRecord
 
 
 NODE_NAME = "DapaoRHAllImageConcurrentNode"
 FAILURE_CHOICES = ["跳过失败继续", "失败返回占位", "任一失败中断"]
 
+# 前端 websocket 事件：每个任务完成时的状态，以及掉队任务在后台完成时的结果
+TASK_EVENT = "dapao.rh_concurrent.task"
+STRAGGLER_EVENT = "dapao.rh_concurrent.straggler"
+MAX_STRAGGLER_RECORDS = 200
+
+_stragglers = {}
+_stragglers_lock = threading.Lock()
+
 
 def _log_info(message):
     print(f"[dapaoAPI-RH全能图片多并发] 信息：{message}")
@@ -43,6 +60,130 @@ def _log_error(message):
     print(f"[dapaoAPI-RH全能图片多并发] 错误：{message}")
 
 
+def _send_event(event, data):
+    server = getattr(PromptServer, "instance", None)
+    if server is None:
+        return
+    try:
+        server.send_sync(event, data, getattr(server, "client_id", None))
+    except Exception as e:
+        _log_error(f"发送 {event} 事件失败：{e}")
+
+
+def _record_straggler(key, record):
+    with _stragglers_lock:
+        _stragglers.pop(key, None)
+        _stragglers[key] = record
+        while len(_stragglers) > MAX_STRAGGLER_RECORDS:
+            del _stragglers[next(iter(_stragglers))]
+
+
+def _straggler_done(key, future):
+    """Done callback of a task that outlived the straggler deadline."""
+    with _stragglers_lock:
+        record = dict(_stragglers.get(key) or {})
+    if future.cancelled():
+        record.update(status="cancelled", error="超过掉队截止时间且尚未开始，已取消")
+    else:
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        record.update(
+            status="succeeded" if result.get("ok") else "failed",
+            task_id=result.get("task_id") or record.get("task_id"),
+            urls=result.get("urls") or [],
+            error=result.get("error", ""),
+        )
+    record["finished_at"] = time.time()
+    _record_straggler(key, record)
+    if record["status"] != "cancelled":
+        _log_info(f"掉队任务 #{record.get('index', 0) + 1} 已在后台结束：{record['status']}，taskId={record.get('task_id') or '-'}")
+        _send_event(STRAGGLER_EVENT, record)
+
+
+def straggler_results():
+    """Tasks left running past the straggler deadline, newest last."""
+    with _stragglers_lock:
+        return [dict(record) for record in _stragglers.values()]
+
+
+class _BatchAssembler:
+    """Write task images straight into one preallocated IMAGE batch.
+
+    The batch is allocated once, when the first image arrives: its size becomes
+    the output size (mismatched images are resized to it) and every task owns a
+    fixed run of slots, so images land in prompt order whichever task finishes
+    first.  Skipped failures are compacted away in place at the end.
+    """
+
+    def __init__(self, task_count, failure_strategy):
+        self.task_count = task_count
+        self.keep_placeholders = failure_strategy == "失败返回占位"
+        self.tensor = None
+        self.size = None
+        self.per_task = 0
+        self._filled = {}
+        self._failed = set()
+        self._overflow = {}
+
+    def add(self, index, images):
+        if not images:
+            self.fail(index)
+            return
+        if self.tensor is None:
+            self.size = images[0].size
+            self.per_task = len(images)
+            width, height = self.size
+            self.tensor = torch.zeros((self.task_count * self.per_task, height, width, 3), dtype=torch.float32)
+        base = index * self.per_task
+        for offset, image in enumerate(images):
+            if image.size != self.size:
+                image = image.resize(self.size)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            pixels = torch.from_numpy(np.array(image, dtype=np.uint8))
+            if offset < self.per_task:
+                self.tensor[base + offset].copy_(pixels).div_(255.0)
+            else:
+                # 单个任务返回的图片多于预留槽位时单独保存，最后再拼接
+                self._overflow.setdefault(index, []).append(pixels.float().div_(255.0).unsqueeze(0))
+        self._filled[index] = min(len(images), self.per_task)
+
+    def fail(self, index):
+        self._failed.add(index)
+
+    def finish(self):
+        if self.tensor is None:
+            return create_blank_tensor()
+        if self._overflow:
+            return self._concatenate()
+        written = 0
+        for index in range(self.task_count):
+            if index in self._filled:
+                source = index * self.per_task
+                for offset in range(self._filled[index]):
+                    if source + offset != written:
+                        self.tensor[written].copy_(self.tensor[source + offset])
+                    written += 1
+            elif index in self._failed and self.keep_placeholders:
+                self.tensor[written].zero_()
+                written += 1
+        return self.tensor if written == self.tensor.shape[0] else self.tensor[:written]
+
+    def _concatenate(self):
+        width, height = self.size
+        pieces = []
+        for index in range(self.task_count):
+            if index in self._filled:
+                source = index * self.per_task
+                pieces.append(self.tensor[source:source + self._filled[index]])
+                pieces.extend(self._overflow.get(index, []))
+            elif index in self._failed and self.keep_placeholders:
+                pieces.append(create_blank_tensor(width, height))
+        return torch.cat(pieces, dim=0)
+
+
 class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
     INPUT_IS_LIST = True
 
@@ -145,6 +286,13 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
                 "🔁 最大轮询秒数": ("INT", {"default": 1200, "min": 60, "max": 3600, "step": 10}),
                 "⏱️ 轮询间隔": ("INT", {"default": 5, "min": 2, "max": 30, "step": 1}),
                 "⌛ 请求超时": ("INT", {"default": 60, "min": 10, "max": 300, "step": 1}),
+                "⏳ 掉队截止秒数": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 3600,
+                    "step": 10,
+                    "tooltip": "0 表示等待全部任务。大于 0 时，到时仍未完成的任务不再等待，先返回已完成的图片；掉队任务在后台继续并记录 taskId。"
+                }),
             }
         }
         result["hidden"] = {
@@ -313,37 +461,96 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
                 image_urls.append(self._image_bytes_to_input_url(api_key, content, filename, timeout))
         return image_urls
 
+    @staticmethod
+    def _tensor_identity(image_tensor):
+        # 同一输入张量切出的同一张图共享存储，据此识别重复的参考图
+        return (
+            image_tensor.data_ptr(),
+            tuple(image_tensor.shape),
+            tuple(image_tensor.stride()),
+            str(image_tensor.dtype),
+            str(image_tensor.device),
+        )
+
+    def _prepare_task_references(self, image_inputs, task_count, api_key, timeout, max_images, workers):
+        """Encode and upload every distinct reference image once, in parallel.
+
+        Returns one URL list per task, in the order ``_collect_task_image_urls``
+        would build it.  A task whose references could not be prepared gets
+        ``None`` and falls back to preparing its own inside ``_run_one_task``.
+        """
+        task_keys = []
+        unique = {}
+        for task_index in range(task_count):
+            keys = []
+            for input_index in range(1, 11):
+                image_tensor = self._select_task_image(image_inputs.get(f"🖼️ 图像{input_index}"), task_index)
+                if image_tensor is None:
+                    continue
+                for batch_index in range(image_tensor.shape[0]):
+                    if len(keys) >= max_images:
+                        break
+                    image = image_tensor[batch_index:batch_index + 1]
+                    key = self._tensor_identity(image)
+                    unique.setdefault(key, image)
+                    keys.append(key)
+            task_keys.append(keys)
+
+        def _prepare(order, image):
+            content = self._tensor_batch_to_png_bytes(image)[0]
+            return self._image_bytes_to_input_url(api_key, content, f"comfyui_ref_{order + 1}.png", timeout)
+
+        prepared = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(unique)))) as executor:
+            futures = {executor.submit(propagate(_prepare), order, image): key for order, (key, image) in enumerate(unique.items())}
+            for future in as_completed(futures):
+                try:
+                    prepared[futures[future]] = future.result()
+                except Exception as e:
+                    _log_error(f"参考图预上传失败，相关任务将各自重试上传：{e}")
+
+        total_references = sum(len(keys) for keys in task_keys)
+        _log_info(f"参考图去重：{total_references} 次引用 → {len(unique)} 张唯一图片，成功准备 {len(prepared)} 张")
+        return [
+            [prepared[key] for key in keys] if all(key in prepared for key in keys) else None
+            for keys in task_keys
+        ]
+
     def _poll_task_no_progress(self, task_id, api_key, max_seconds, interval, timeout):
         elapsed = 0
         consecutive_failures = 0
-
-        while elapsed < max_seconds:
-            time.sleep(interval)
-            elapsed += interval
-            try:
-                result = self._post_json(
-                    self._current_api_urls()["poll"],
-                    api_key,
-                    {"taskId": task_id},
-                    timeout,
-                )
-                consecutive_failures = 0
-            except Exception as e:
-                consecutive_failures += 1
-                if consecutive_failures >= 5:
-                    raise RuntimeError(f"连续多次轮询失败，任务状态未知。最后错误：{e}")
-                continue
-
-            result_data = self._payload_data(result)
-            status = result_data.get("status") or result.get("status", "UNKNOWN")
-            if status == "SUCCESS":
-                return result_data or result
-            if status == "FAILED":
-                error_msg = result_data.get("errorMessage") or result.get("msg") or "Unknown error"
-                error_code = result_data.get("errorCode") or result.get("errorCode") or ""
-                raise RuntimeError(f"任务失败：[{error_code}] {error_msg}")
-
-        raise RuntimeError(f"任务超过 {max_seconds} 秒仍未完成，请稍后查询任务ID：{task_id}")
+        wait_timer = TaskWaitTimer(task_id=task_id)
+        try:
+            while elapsed < max_seconds:
+                time.sleep(interval)
+                elapsed += interval
+                try:
+                    result = self._post_json(
+                        self._current_api_urls()["poll"],
+                        api_key,
+                        {"taskId": task_id},
+                        timeout,
+                    )
+                    consecutive_failures = 0
+                except Exception as e:
+                    consecutive_failures += 1
+                    if consecutive_failures >= 5:
+                        raise RuntimeError(f"连续多次轮询失败，任务状态未知。最后错误：{e}")
+                    continue
+
+                result_data = self._payload_data(result)
+                status = result_data.get("status") or result.get("status", "UNKNOWN")
+                wait_timer.observe(status)
+                if status == "SUCCESS":
+                    return result_data or result
+                if status == "FAILED":
+                    error_msg = result_data.get("errorMessage") or result.get("msg") or "Unknown error"
+                    error_code = result_data.get("errorCode") or result.get("errorCode") or ""
+                    raise RuntimeError(f"任务失败：[{error_code}] {error_msg}")
+
+            raise RuntimeError(f"任务超过 {max_seconds} 秒仍未完成，请稍后查询任务ID：{task_id}")
+        finally:
+            wait_timer.finish()
 
     def _run_one_task(
         self,
@@ -360,15 +567,25 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
         interval,
         timeout,
         retry_count,
+        task_ids=None,
+        reference_urls=None,
+        usage_labels=(),
     ):
         last_error = None
         last_traceback = ""
+        retry_delay = 0
         for attempt in range(retry_count + 1):
             submit_response = {}
             final_response = {}
+            # 每次重试都会提交新任务，账本按任务逐条记录
+            usage = UsageRecord("runninghub", NODE_NAME, *usage_labels)
             try:
                 image_urls = []
-                if image_inputs is not None:
+                if reference_urls is not None and reference_urls[task_index] is not None:
+                    image_urls = list(reference_urls[task_index])
+                    if not image_urls:
+                        raise ValueError("选择图生图时，请至少接入一张参考图。")
+                elif image_inputs is not None:
                     image_urls = self._collect_task_image_urls(
                         image_inputs,
                         task_index,
@@ -389,12 +606,13 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
                     dict(extra_params),
                 )
                 endpoint = config["endpoint"]
-                submit_response = self._post_json(
-                    f"{self._current_api_urls()['base']}/{endpoint}",
-                    api_key,
-                    payload,
-                    timeout,
-                )
+                with span("submit"):
+                    submit_response = self._post_json(
+                        f"{self._current_api_urls()['base']}/{endpoint}",
+                        api_key,
+                        payload,
+                        timeout,
+                    )
                 if submit_response.get("errorCode") or submit_response.get("errorMessage"):
                     raise RuntimeError(
                         f"RunningHub 提交失败：[{submit_response.get('errorCode') or ''}] "
@@ -403,6 +621,9 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
                 task_id = self._extract_task_id(submit_response)
                 if not task_id:
                     raise RuntimeError(f"提交成功但响应中没有 taskId：{json.dumps(submit_response, ensure_ascii=False)[:1000]}")
+                if task_ids is not None:
+                    task_ids[task_index] = task_id
+                usage.submitted(task_id)
 
                 submit_data = self._payload_data(submit_response)
                 if submit_data.get("status") == "SUCCESS" and submit_data.get("results"):
@@ -416,6 +637,7 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
 
                 images = [self._download_image(url, timeout) for url in urls]
                 cost, duration = self._extract_usage(final_response)
+                usage.succeeded(cost, duration)
                 return {
                     "index": task_index,
                     "ok": True,
@@ -436,9 +658,15 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
             except Exception as e:
                 last_error = e
                 last_traceback = traceback.format_exc()
+                usage.failed(e)
+                if is_circuit_open(e):
+                    # 上游已熔断，重试只会继续快速失败
+                    break
                 if attempt < retry_count:
-                    _log_info(f"任务 {task_index + 1} 第 {attempt + 1} 次失败，准备重试：{e}")
-                    time.sleep(min(10, 2 + attempt * 2))
+                    # 去相关抖动：并发任务不会在同一时刻一起重试
+                    retry_delay = decorrelated_jitter(retry_delay, 2, 10)
+                    _log_info(f"任务 {task_index + 1} 第 {attempt + 1} 次失败，{retry_delay:.1f} 秒后重试：{e}")
+                    time.sleep(retry_delay)
 
         return {
             "index": task_index,
@@ -448,29 +676,7 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
             "traceback": last_traceback,
         }
 
-    @staticmethod
-    def _results_to_tensor(results, failure_strategy):
-        ok_images = []
-        for result in results:
-            if result.get("ok"):
-                ok_images.extend(result.get("images") or [])
-
-        if not ok_images:
-            return create_blank_tensor()
-
-        base_size = ok_images[0].size if ok_images else (1024, 1024)
-        tensors = []
-        for result in results:
-            if result.get("ok"):
-                for image in result.get("images") or []:
-                    if image.size != base_size:
-                        image = image.resize(base_size)
-                    tensors.append(pil2tensor(image))
-            elif failure_strategy == "失败返回占位":
-                tensors.append(create_blank_tensor(*base_size))
-
-        return torch.cat(tensors, dim=0) if tensors else create_blank_tensor()
-
+    @timed_execution
     def generate_concurrent(self, **kwargs):
         api_channel = self._text_input_value(kwargs, "🌐 API渠道", "国内版")
         self._activate_api_channel(api_channel)
@@ -496,6 +702,8 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
         max_seconds = self._int_input_value(kwargs, "🔁 最大轮询秒数", 1200)
         interval = self._int_input_value(kwargs, "⏱️ 轮询间隔", 5)
         timeout = self._int_input_value(kwargs, "⌛ 请求超时", 60)
+        straggler_seconds = max(0, self._int_input_value(kwargs, "⏳ 掉队截止秒数", 0))
+        unique_id = self._first_input_value(kwargs.get("unique_id"))
 
         prompt_lines = self._split_prompt_lines(prompt_text)
         prompt_line_count = len(prompt_lines)
@@ -554,14 +762,29 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
             )
 
             results = [None] * task_count
+            assembler = _BatchAssembler(task_count, failure_strategy)
             pbar = comfy.utils.ProgressBar(task_count) if comfy is not None else None
             completed = 0
             abort_error = None
 
-            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            reference_urls = None
+            if image_inputs is not None:
+                reference_urls = self._prepare_task_references(
+                    image_inputs,
+                    task_count,
+                    api_key,
+                    timeout,
+                    config["max_images"],
+                    concurrency,
+                )
+
+            task_ids = {}
+            straggler_futures = []
+            executor = ThreadPoolExecutor(max_workers=concurrency)
+            try:
                 future_map = {
                     executor.submit(
-                        self._run_one_task,
+                        propagate(self._run_one_task),
                         index,
                         prompts[index],
                         api_key,
@@ -575,34 +798,84 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
                         interval,
                         timeout,
                         retry_count,
+                        task_ids,
+                        reference_urls,
+                        (model, channel, api_channel),
                     ): index
                     for index in range(task_count)
                 }
 
-                for future in as_completed(future_map):
-                    index = future_map[future]
-                    try:
-                        result = future.result()
-                    except Exception as e:
-                        result = {
-                            "index": index,
-                            "ok": False,
-                            "prompt": prompts[index],
-                            "error": str(e),
-                            "traceback": traceback.format_exc(),
-                        }
-                    results[index] = result
-                    completed += 1
-                    if pbar:
-                        if stream_receive and result.get("ok") and result.get("images"):
-                            pbar.update_absolute(completed, preview=("PNG", result["images"][0], None))
+                try:
+                    for future in as_completed(future_map, timeout=straggler_seconds or None):
+                        index = future_map[future]
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = {
+                                "index": index,
+                                "ok": False,
+                                "prompt": prompts[index],
+                                "error": str(e),
+                                "traceback": traceback.format_exc(),
+                            }
+                        results[index] = result
+                        completed += 1
+                        if pbar:
+                            if stream_receive and result.get("ok") and result.get("images"):
+                                pbar.update_absolute(completed, preview=("PNG", result["images"][0], None))
+                            else:
+                                pbar.update_absolute(completed)
+                        if stream_receive:
+                            _send_event(TASK_EVENT, {
+                                "node": unique_id,
+                                "index": index + 1,
+                                "ok": bool(result.get("ok")),
+                                "completed": completed,
+                                "total": task_count,
+                                "task_id": result.get("task_id"),
+                                "urls": result.get("urls") or [],
+                                "error": result.get("error", ""),
+                            })
+                        # 完成即写入输出张量，随后释放 PIL 图片
+                        if result.get("ok"):
+                            assembler.add(index, result.pop("images", None))
                         else:
-                            pbar.update_absolute(completed)
-                    if not result.get("ok") and failure_strategy == "任一失败中断":
-                        abort_error = result
-                        for pending in future_map:
-                            pending.cancel()
-                        break
+                            assembler.fail(index)
+                        if not result.get("ok") and failure_strategy == "任一失败中断":
+                            abort_error = result
+                            for pending in future_map:
+                                pending.cancel()
+                            break
+                except FuturesTimeoutError:
+                    straggler_futures = [future for future in future_map if not future.done()]
+            finally:
+                # 掉队任务不再等待：未开始的取消，已在运行的留在后台线程中完成
+                executor.shutdown(wait=not straggler_futures, cancel_futures=bool(straggler_futures))
+
+            for future in straggler_futures:
+                index = future_map[future]
+                task_id = task_ids.get(index)
+                key = f"{unique_id}:{start_time:.3f}:{index}"
+                _record_straggler(key, {
+                    "node": unique_id,
+                    "index": index,
+                    "prompt": prompts[index],
+                    "task_id": task_id,
+                    "status": "running",
+                    "started_at": start_time,
+                })
+                future.add_done_callback(lambda done, key=key: _straggler_done(key, done))
+                results[index] = {
+                    "index": index,
+                    "ok": False,
+                    "straggler": True,
+                    "prompt": prompts[index],
+                    "task_id": task_id,
+                    "error": f"超过掉队截止时间 {straggler_seconds} 秒，已转入后台继续：taskId={task_id or '尚未提交'}",
+                }
+                assembler.fail(index)
+            if straggler_futures:
+                _log_info(f"{len(straggler_futures)} 个任务超过掉队截止时间，先返回已完成的 {completed} 个任务")
 
             results = [result for result in results if result is not None]
             if abort_error:
@@ -611,7 +884,7 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
 
             success_count = sum(1 for result in results if result.get("ok"))
             failed_count = len(results) - success_count
-            final_tensor = self._results_to_tensor(results, failure_strategy)
+            final_tensor = assembler.finish()
             all_urls = []
             for result in results:
                 if result.get("ok"):
@@ -642,13 +915,16 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
                 f"🚀 并发数：{concurrency}",
                 f"🌊 流式接收：{'开启' if stream_receive else '关闭'}",
                 f"🛟 失败重试次数：{retry_count}",
+                f"⏳ 掉队截止：{f'{straggler_seconds} 秒' if straggler_seconds else '关闭'}",
                 f"🧪 失败策略：{failure_strategy}",
                 f"✅ 成功任务：{success_count}",
-                f"❌ 失败任务：{failed_count}",
+                f"❌ 失败任务：{failed_count - len(straggler_futures)}",
+                f"⏳ 掉队任务：{len(straggler_futures)}",
                 f"🖼️ 输出图片数：{final_tensor.shape[0]}",
                 f"🧷 参考图批次数：{image_batch_count if mode == '图生图' else 0}",
                 f"🎲 随机种：{cache_seed}（仅用于 ComfyUI 缓存控制）",
                 f"⏱️ 总耗时：{elapsed_time:.2f} 秒",
+                execution_summary(),
             ]
             if image_counts:
                 info_lines.append("🧷 图像输入数量：" + "，".join(f"{key}={count}" for key, count in image_counts))
@@ -662,6 +938,8 @@ class DapaoRHAllImageConcurrentNode(DapaoRHAllImageNode):
                     cost_text = f"，消耗 ¥{result.get('cost')}" if result.get("cost") is not None else ""
                     ref_text = f"，参考图 {result.get('reference_images', 0)} 张" if mode == "图生图" else ""
                     info_lines.append(f"{label} ✅ taskId={result.get('task_id')}，图片 {len(result.get('urls') or [])} 张{ref_text}，尝试 {result.get('attempts')} 次{cost_text}")
+                elif result.get("straggler"):
+                    info_lines.append(f"{label} ⏳ {result.get('error')}")
                 else:
                     info_lines.append(f"{label} ❌ {result.get('error')}")
 
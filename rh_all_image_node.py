@@ -16,6 +16,11 @@ import requests
 import torch
 from PIL import Image
 
+from .download_cache_utils import download_cache
+from .metrics_utils import TaskWaitTimer, execution_summary, span, timed_execution
+from .relay_policy_utils import RETRY_CONNECTION, RETRY_POLICY, RETRY_RATE_LIMIT, request_with_retry
+from .usage_ledger_utils import UsageRecord
+
 try:
     import comfy.utils
 except Exception:
@@ -354,27 +359,24 @@ class DapaoRHAllImageNode:
         connection_retries=2,
     ):
         api_channel = api_channel or self._current_api_channel()
-        response = None
-        for attempt in range(connection_retries + 1):
-            try:
-                response = requests.post(
-                    url,
-                    headers=self._headers(api_key),
-                    json=payload,
-                    timeout=timeout,
-                )
-                break
-            except (requests.ConnectionError, requests.Timeout) as error:
-                if attempt >= connection_retries:
-                    raise RuntimeError(
-                        f"RunningHub {api_channel}连接失败，已尝试 {attempt + 1} 次：{error}\n"
-                        "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
-                    ) from error
-                wait_seconds = attempt + 1
-                _log_info(
-                    f"{api_channel}连接中断，{wait_seconds} 秒后进行第 {attempt + 2} 次尝试。"
-                )
-                time.sleep(wait_seconds)
+        retry = RETRY_POLICY.start(
+            retry_on=(RETRY_CONNECTION, RETRY_RATE_LIMIT),
+            budgets={RETRY_CONNECTION: connection_retries},
+        )
+        try:
+            response = request_with_retry(
+                "POST",
+                url,
+                retry,
+                headers=self._headers(api_key),
+                json=payload,
+                timeout=timeout,
+            )
+        except (requests.ConnectionError, requests.Timeout) as error:
+            raise RuntimeError(
+                f"RunningHub {api_channel}连接失败，已尝试 {retry.attempts} 次：{error}\n"
+                "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
+            ) from error
 
         if response.status_code >= 400:
             message = self._error_message(response)
@@ -453,50 +455,55 @@ class DapaoRHAllImageNode:
         pbar = comfy.utils.ProgressBar(100) if comfy is not None else None
         if pbar:
             pbar.update_absolute(5)
-
-        while elapsed < max_seconds:
-            time.sleep(interval)
-            elapsed += interval
-            try:
-                result = self._post_json(
-                    poll_url,
-                    api_key,
-                    {"taskId": task_id},
-                    timeout,
-                    api_channel,
-                )
-                consecutive_failures = 0
-            except Exception as e:
-                consecutive_failures += 1
-                if consecutive_failures >= 5:
-                    raise RuntimeError(f"连续多次轮询失败，任务状态未知。最后错误：{e}")
-                continue
-
-            result_data = self._payload_data(result)
-            status = result_data.get("status") or result.get("status", "UNKNOWN")
-            if pbar:
-                pbar.update_absolute(min(95, max(5, int(elapsed / max_seconds * 95))))
-
-            if status == "SUCCESS":
+        wait_timer = TaskWaitTimer(task_id=task_id)
+        try:
+            while elapsed < max_seconds:
+                time.sleep(interval)
+                elapsed += interval
+                try:
+                    result = self._post_json(
+                        poll_url,
+                        api_key,
+                        {"taskId": task_id},
+                        timeout,
+                        api_channel,
+                    )
+                    consecutive_failures = 0
+                except Exception as e:
+                    consecutive_failures += 1
+                    if consecutive_failures >= 5:
+                        raise RuntimeError(f"连续多次轮询失败，任务状态未知。最后错误：{e}")
+                    continue
+
+                result_data = self._payload_data(result)
+                status = result_data.get("status") or result.get("status", "UNKNOWN")
+                wait_timer.observe(status)
                 if pbar:
-                    pbar.update_absolute(100)
-                return result_data or result
-            if status == "FAILED":
-                error_msg = result_data.get("errorMessage") or result.get("msg") or "Unknown error"
-                error_code = result_data.get("errorCode") or result.get("errorCode") or ""
-                raise RuntimeError(f"任务失败：[{error_code}] {error_msg}")
+                    pbar.update_absolute(min(95, max(5, int(elapsed / max_seconds * 95))))
 
-        raise RuntimeError(f"任务超过 {max_seconds} 秒仍未完成，请稍后查询任务ID：{task_id}")
+                if status == "SUCCESS":
+                    if pbar:
+                        pbar.update_absolute(100)
+                    return result_data or result
+                if status == "FAILED":
+                    error_msg = result_data.get("errorMessage") or result.get("msg") or "Unknown error"
+                    error_code = result_data.get("errorCode") or result.get("errorCode") or ""
+                    raise RuntimeError(f"任务失败：[{error_code}] {error_msg}")
+
+            raise RuntimeError(f"任务超过 {max_seconds} 秒仍未完成，请稍后查询任务ID：{task_id}")
+        finally:
+            wait_timer.finish()
 
     @staticmethod
     def _tensor_batch_to_png_bytes(image_tensor):
         image_bytes = []
-        for index in range(image_tensor.shape[0]):
-            image_np = np.clip(image_tensor[index].cpu().numpy() * 255.0, 0, 255).astype(np.uint8)
-            image = Image.fromarray(image_np).convert("RGB")
-            buffer = io.BytesIO()
-            image.save(buffer, format="PNG")
-            image_bytes.append(buffer.getvalue())
+        with span("encode", images=image_tensor.shape[0]):
+            for index in range(image_tensor.shape[0]):
+                image_np = np.clip(image_tensor[index].cpu().numpy() * 255.0, 0, 255).astype(np.uint8)
+                image = Image.fromarray(image_np).convert("RGB")
+                buffer = io.BytesIO()
+                image.save(buffer, format="PNG")
+                image_bytes.append(buffer.getvalue())
         return image_bytes
 
     def _upload_image_bytes(
@@ -512,23 +519,22 @@ class DapaoRHAllImageNode:
         upload_url = upload_url or self._current_api_urls()["upload"]
         files = {"file": (filename, content, "image/png")}
         headers = {"Authorization": f"Bearer {api_key}"}
-        response = None
-        for attempt in range(3):
-            try:
-                response = requests.post(
+        retry = RETRY_POLICY.start(retry_on=(RETRY_CONNECTION, RETRY_RATE_LIMIT))
+        try:
+            with span("upload", bytes=len(content)):
+                response = request_with_retry(
+                    "POST",
                     upload_url,
+                    retry,
                     headers=headers,
                     files=files,
                     timeout=max(timeout, 120),
                 )
-                break
-            except (requests.ConnectionError, requests.Timeout) as error:
-                if attempt >= 2:
-                    raise RuntimeError(
-                        f"RunningHub {api_channel}图片上传连接失败，已尝试 3 次：{error}\n"
-                        "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
-                    ) from error
-                time.sleep(attempt + 1)
+        except (requests.ConnectionError, requests.Timeout) as error:
+            raise RuntimeError(
+                f"RunningHub {api_channel}图片上传连接失败，已尝试 {retry.attempts} 次：{error}\n"
+                "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
+            ) from error
         if response.status_code >= 400:
             message = self._error_message(response)
             if self._is_authentication_error(response.status_code, message):
@@ -600,10 +606,16 @@ class DapaoRHAllImageNode:
 
     @staticmethod
     def _download_image(url, timeout):
-        response = requests.get(url, timeout=max(timeout, 120))
-        if response.status_code >= 400:
-            raise RuntimeError(f"图片下载失败，状态码：{response.status_code}，URL：{url}")
-        return Image.open(io.BytesIO(response.content)).convert("RGB")
+        content = download_cache.read_bytes(url)
+        if content is None:
+            with span("download"):
+                response = requests.get(url, timeout=max(timeout, 120))
+            if response.status_code >= 400:
+                raise RuntimeError(f"图片下载失败，状态码：{response.status_code}，URL：{url}")
+            content = response.content
+            download_cache.store_bytes(url, content, response.headers)
+        with span("decode", bytes=len(content)):
+            return Image.open(io.BytesIO(content)).convert("RGB")
 
     def _build_payload(self, config, prompt, ratio, resolution, quality, image_urls, extra_params):
         payload = {"prompt": prompt}
@@ -633,6 +645,7 @@ class DapaoRHAllImageNode:
         payload.update(extra_params)
         return payload, final_ratio, final_resolution, final_quality
 
+    @timed_execution
     def generate(self, **kwargs):
         api_channel = kwargs.get("🌐 API渠道", "国内版")
         api_key = kwargs.get("🔑 API密钥", "").strip()
@@ -668,6 +681,7 @@ class DapaoRHAllImageNode:
         start_time = time.time()
         submit_response = {}
         final_response = {}
+        usage = UsageRecord("runninghub", NODE_NAME, model, channel, api_channel)
 
         try:
             api_urls = self._activate_api_channel(api_channel)
@@ -698,17 +712,19 @@ class DapaoRHAllImageNode:
             _log_info(f"开始请求 RH：{api_channel} / {endpoint}")
             _log_info(f"端点：{config['display_name']}，参考图：{len(image_urls)}，比例：{final_ratio}，分辨率：{final_resolution}")
 
-            submit_response = self._post_json(
-                f"{api_urls['base']}/{endpoint}",
-                api_key,
-                payload,
-                timeout,
-                api_channel,
-                connection_retries=2,
-            )
+            with span("submit"):
+                submit_response = self._post_json(
+                    f"{api_urls['base']}/{endpoint}",
+                    api_key,
+                    payload,
+                    timeout,
+                    api_channel,
+                    connection_retries=2,
+                )
             task_id = self._extract_task_id(submit_response)
             if not task_id:
                 raise RuntimeError(f"提交成功但响应中没有 taskId：{json.dumps(submit_response, ensure_ascii=False)[:1000]}")
+            usage.submitted(task_id)
 
             submit_data = self._payload_data(submit_response)
             if submit_data.get("status") == "SUCCESS" and submit_data.get("results"):
@@ -733,6 +749,7 @@ class DapaoRHAllImageNode:
 
             elapsed_time = time.time() - start_time
             cost, duration = self._extract_usage(final_response)
+            usage.succeeded(cost, duration)
             first_url = urls[0] if urls else ""
 
             info_lines = [
@@ -749,6 +766,7 @@ class DapaoRHAllImageNode:
                 f"🧷 参考图数量：{len(image_urls)}",
                 f"🎲 随机种：{cache_seed}（仅用于 ComfyUI 缓存控制）",
                 f"⏱️ 总耗时：{elapsed_time:.2f} 秒",
+                execution_summary(),
                 f"🆔 任务ID：{task_id}",
             ]
             if cost is not None:
@@ -762,6 +780,7 @@ class DapaoRHAllImageNode:
             return (final_tensor, first_url, "\n".join(info_lines) + "\n\n" + raw_json)
 
         except Exception as e:
+            usage.failed(e)
             error_msg = f"❌ 错误：RH 全能图片生成失败\n\n详情：{e}"
             _log_error(error_msg)
             _log_error(traceback.format_exc())
@@ -10,10 +10,11 @@ import io
 import json
 import os
 import re
-import tempfile
 import time
 import traceback
 import wave
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 import numpy as np
 import requests
@@ -34,9 +35,18 @@ from .rh_all_image_node import (
     create_blank_tensor,
     pil2tensor,
 )
+from .asset_cache_utils import asset_cache, metadata_from_response
+from .download_cache_utils import save_url_to
+from .metrics_utils import TaskWaitTimer, execution_summary, propagate, span, timed_execution
+from .relay_policy_utils import RETRY_CONNECTION, RETRY_POLICY, RETRY_RATE_LIMIT, request_with_retry
+from .stream_body_utils import MultipartFileBody
+from .usage_ledger_utils import UsageRecord
+from .video_source_utils import open_video_source
 
 
 NODE_NAME = "DapaoRHAllVideoSeedanceNode"
+# 参考素材编码、上传与素材类型查询的并发上限
+MAX_PARALLEL_INGEST = 4
 
 MODEL_CHOICES = ["SEEDANCE2.0", "SEEDANCE2.0-FAST"]
 FUNCTION_CHOICES = ["文生视频", "图生视频", "多模态视频"]
@@ -126,13 +136,7 @@ class RHSeedanceVideoAdapter:
         if not self.video_url:
             return False
         try:
-            response = requests.get(self.video_url, stream=True, timeout=300, allow_redirects=True)
-            response.raise_for_status()
-            with open(output_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=1024 * 1024):
-                    if chunk:
-                        f.write(chunk)
-            return True
+            return save_url_to(self.video_url, output_path)
         except Exception as e:
             _log_error(f"视频保存失败：{e}")
             return False
@@ -300,26 +304,37 @@ class DapaoRHAllVideoSeedanceNode(DapaoRHAllImageNode):
         return buffer.getvalue()
 
     def _upload_bytes(self, api_key, content, filename, mime_type, timeout):
-        files = {"file": (filename, content, mime_type)}
-        headers = {"Authorization": f"Bearer {api_key}"}
+        return self._post_upload(
+            api_key,
+            {"Authorization": f"Bearer {api_key}"},
+            timeout,
+            files={"file": (filename, content, mime_type)},
+        )
+
+    def _upload_stream(self, api_key, source, filename, mime_type, timeout):
+        # 视频按块从磁盘或内存流直接发出，不再整体读入内存拼装 multipart
+        body = MultipartFileBody("file", filename, source.open(), source.size, mime_type)
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": body.content_type}
+        return self._post_upload(api_key, headers, timeout, data=body)
+
+    def _post_upload(self, api_key, headers, timeout, **body):
         upload_url = self._current_api_urls()["upload"]
-        response = None
-        for attempt in range(3):
-            try:
-                response = requests.post(
+        retry = RETRY_POLICY.start(retry_on=(RETRY_CONNECTION, RETRY_RATE_LIMIT))
+        try:
+            with span("upload"):
+                response = request_with_retry(
+                    "POST",
                     upload_url,
+                    retry,
                     headers=headers,
-                    files=files,
                     timeout=max(timeout, 120),
+                    **body,
                 )
-                break
-            except (requests.ConnectionError, requests.Timeout) as error:
-                if attempt >= 2:
-                    raise RuntimeError(
-                        f"RunningHub {self._current_api_channel()}媒体上传连接失败，已尝试 3 次：{error}\n"
-                        "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
-                    ) from error
-                time.sleep(attempt + 1)
+        except (requests.ConnectionError, requests.Timeout) as error:
+            raise RuntimeError(
+                f"RunningHub {self._current_api_channel()}媒体上传连接失败，已尝试 {retry.attempts} 次：{error}\n"
+                "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
+            ) from error
         if response.status_code >= 400:
             message = self._error_message(response)
             if self._is_authentication_error(response.status_code, message):
@@ -343,7 +358,8 @@ class DapaoRHAllVideoSeedanceNode(DapaoRHAllImageNode):
     def _image_to_url(self, image_tensor, api_key, name, timeout):
         if image_tensor is None:
             return ""
-        content = self._tensor_to_png_bytes(image_tensor)
+        with span("encode"):
+            content = self._tensor_to_png_bytes(image_tensor)
         return self._upload_bytes(api_key, content, f"{name}.png", "image/png", timeout)
 
     def _video_to_url(self, video_input, api_key, name, timeout):
@@ -353,23 +369,13 @@ class DapaoRHAllVideoSeedanceNode(DapaoRHAllImageNode):
             value = video_input.strip()
             if value.startswith("http://") or value.startswith("https://"):
                 return value
-            if os.path.exists(value):
-                with open(value, "rb") as f:
-                    return self._upload_bytes(api_key, f.read(), f"{name}.mp4", "video/mp4", timeout)
+            if not os.path.exists(value):
+                return ""
+        source = open_video_source(video_input)
+        if source is None:
             return ""
-        temp_path = os.path.join(tempfile.gettempdir(), f"dapao_rh_seedance_{name}_{int(time.time() * 1000)}.mp4")
-        try:
-            if hasattr(video_input, "save_to"):
-                video_input.save_to(temp_path)
-                with open(temp_path, "rb") as f:
-                    return self._upload_bytes(api_key, f.read(), f"{name}.mp4", "video/mp4", timeout)
-        finally:
-            try:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-            except Exception:
-                pass
-        return ""
+        with source:
+            return self._upload_stream(api_key, source, f"{name}.mp4", "video/mp4", timeout)
 
     def _audio_to_url(self, audio_input, api_key, name, timeout):
         if not audio_input:
@@ -382,24 +388,56 @@ class DapaoRHAllVideoSeedanceNode(DapaoRHAllImageNode):
                 with open(value, "rb") as f:
                     return self._upload_bytes(api_key, f.read(), f"{name}.wav", "audio/wav", timeout)
             return ""
-        content = self._audio_to_wav_bytes(audio_input)
+        with span("encode"):
+            content = self._audio_to_wav_bytes(audio_input)
         if content:
             return self._upload_bytes(api_key, content, f"{name}.wav", "audio/wav", timeout)
         return ""
 
-    def _query_asset_type(self, api_key, asset_id, timeout):
+    def _query_asset_metadata(self, api_key, asset_id, timeout):
         response = self._post_json(
             f"{self._current_api_urls()['base']}/assets/query",
             api_key,
             {"assetId": asset_id},
             timeout,
         )
-        data = response.get("data") or {}
-        asset_type = str(data.get("assetType") or "").strip().lower()
+        return metadata_from_response(asset_id, response)
+
+    @staticmethod
+    def _metadata_asset_type(asset_id, metadata):
+        asset_type = metadata.get("asset_type") or ""
         if not asset_type:
             raise ValueError(f"素材 {asset_id} 没有返回 assetType，无法判断应接入图片、视频还是音频槽位。")
         return asset_type
 
+    def _query_asset_type(self, api_key, asset_id, timeout):
+        metadata = asset_cache.lookup(
+            self._current_api_channel(),
+            asset_id,
+            partial(self._query_asset_metadata, api_key, asset_id, timeout),
+        )
+        return self._metadata_asset_type(asset_id, metadata)
+
+    @staticmethod
+    def _resolve_ordered(slots, workers=MAX_PARALLEL_INGEST):
+        """Resolve slots (ready values or zero-argument callables) concurrently, keeping order.
+
+        The first failing slot, in slot order, raises; slots not yet started
+        are cancelled.
+        """
+        jobs = [index for index, slot in enumerate(slots) if callable(slot)]
+        if len(jobs) <= 1:
+            return [slot() if callable(slot) else slot for slot in slots]
+        resolved = list(slots)
+        executor = ThreadPoolExecutor(max_workers=min(workers, len(jobs)))
+        try:
+            futures = {index: executor.submit(propagate(slots[index])) for index in jobs}
+            for index in jobs:
+                resolved[index] = futures[index].result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        return resolved
+
     def _asset_urls_by_type(self, kwargs, api_key, timeout):
         asset_ids = self._parse_asset_ids(kwargs.get("asset_ids"))
         image_urls = []
@@ -413,8 +451,15 @@ class DapaoRHAllVideoSeedanceNode(DapaoRHAllImageNode):
             "video": video_urls,
             "audio": audio_urls,
         }
-        for asset_id in asset_ids:
-            asset_type = self._query_asset_type(api_key, asset_id, timeout)
+        # 已是终态的素材类型不会再变，命中缓存的直接使用，其余并发查询
+        metadata_list = asset_cache.lookup_many(
+            self._current_api_channel(),
+            asset_ids,
+            lambda asset_id: self._query_asset_metadata(api_key, asset_id, timeout),
+            workers=MAX_PARALLEL_INGEST,
+        )
+        for asset_id, metadata in zip(asset_ids, metadata_list):
+            asset_type = self._metadata_asset_type(asset_id, metadata)
             bucket = type_to_bucket.get(asset_type)
             if bucket is None:
                 raise ValueError(f"素材 {asset_id} 的 assetType 不支持：{asset_type or 'unknown'}。")
@@ -422,45 +467,47 @@ class DapaoRHAllVideoSeedanceNode(DapaoRHAllImageNode):
         return image_urls, video_urls, audio_urls
 
     def _collect_reference_urls(self, kwargs, api_key, timeout):
-        image_urls = []
-        video_urls = []
-        audio_urls = []
-
+        # 各槽位的编码与上传并发进行，结果仍按槽位顺序排列，请求体与串行时一致
+        image_slots = []
         first_url = (kwargs.get("🌐 首帧公网URL", "") or "").strip()
         if first_url:
-            image_urls.append(first_url)
+            image_slots.append(first_url)
         first_image = kwargs.get("🎬 首帧图")
         if first_image is not None and not first_url:
-            image_urls.append(self._image_to_url(first_image, api_key, "rh_seedance_multimodal_first", timeout))
-
+            image_slots.append(partial(self._image_to_url, first_image, api_key, "rh_seedance_multimodal_first", timeout))
         for i in range(1, 10):
             image = kwargs.get(f"🖼️ 参考图{i}")
             if image is not None:
-                image_urls.append(self._image_to_url(image, api_key, f"rh_seedance_image_{i}", timeout))
+                image_slots.append(partial(self._image_to_url, image, api_key, f"rh_seedance_image_{i}", timeout))
+        video_slots = [
+            partial(self._video_to_url, kwargs.get(f"🎞️ 参考视频{i}"), api_key, f"rh_seedance_video_{i}", timeout)
+            for i in range(1, 4)
+        ]
+        audio_slots = [
+            partial(self._audio_to_url, kwargs.get(f"🎵 参考音频{i}"), api_key, f"rh_seedance_audio_{i}", timeout)
+            for i in range(1, 4)
+        ]
+
+        resolved = self._resolve_ordered(image_slots + video_slots + audio_slots)
+        image_urls = resolved[:len(image_slots)]
+        video_urls = resolved[len(image_slots):len(image_slots) + len(video_slots)]
+        audio_urls = resolved[len(image_slots) + len(video_slots):]
+
         image_urls.extend(self._split_lines(kwargs.get("🖼️ 参考图URL列表", "")))
         image_urls = [url for url in image_urls if url][:9]
-
-        for i in range(1, 4):
-            video = kwargs.get(f"🎞️ 参考视频{i}")
-            url = self._video_to_url(video, api_key, f"rh_seedance_video_{i}", timeout)
-            if url:
-                video_urls.append(url)
         video_urls.extend(self._split_lines(kwargs.get("🎞️ 参考视频URL列表", "")))
         video_urls = [url for url in video_urls if url][:3]
-
-        for i in range(1, 4):
-            audio = kwargs.get(f"🎵 参考音频{i}")
-            url = self._audio_to_url(audio, api_key, f"rh_seedance_audio_{i}", timeout)
-            if url:
-                audio_urls.append(url)
         audio_urls.extend(self._split_lines(kwargs.get("🎵 参考音频URL列表", "")))
         audio_urls = [url for url in audio_urls if url][:3]
 
         return image_urls, video_urls, audio_urls
 
     def _collect_multimodal_urls(self, kwargs, api_key, timeout):
-        image_urls, video_urls, audio_urls = self._collect_reference_urls(kwargs, api_key, timeout)
-        asset_image_urls, asset_video_urls, asset_audio_urls = self._asset_urls_by_type(kwargs, api_key, timeout)
+        # 素材ID类型查询与本地素材上传同时进行
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assets = executor.submit(propagate(self._asset_urls_by_type), kwargs, api_key, timeout)
+            image_urls, video_urls, audio_urls = self._collect_reference_urls(kwargs, api_key, timeout)
+            asset_image_urls, asset_video_urls, asset_audio_urls = assets.result()
 
         image_urls = (image_urls + asset_image_urls)[:9]
         video_urls = (video_urls + asset_video_urls)[:3]
@@ -494,37 +541,42 @@ class DapaoRHAllVideoSeedanceNode(DapaoRHAllImageNode):
         if pbar:
             pbar.update_absolute(5)
 
-        while elapsed < max_seconds:
-            time.sleep(interval)
-            elapsed += interval
-            try:
-                result = self._post_json(
-                    self._current_api_urls()["poll"],
-                    api_key,
-                    {"taskId": task_id},
-                    timeout,
-                )
-                consecutive_failures = 0
-            except Exception as e:
-                consecutive_failures += 1
-                if consecutive_failures >= 5:
-                    raise RuntimeError(f"连续多次轮询失败，任务状态未知。最后错误：{e}")
-                continue
-
-            result_data = self._payload_data(result)
-            status = result_data.get("status") or result.get("status", "UNKNOWN")
-            if pbar:
-                pbar.update_absolute(min(95, max(5, int(elapsed / max_seconds * 95))))
-            if status == "SUCCESS":
+        wait_timer = TaskWaitTimer(task_id=task_id)
+        try:
+            while elapsed < max_seconds:
+                time.sleep(interval)
+                elapsed += interval
+                try:
+                    result = self._post_json(
+                        self._current_api_urls()["poll"],
+                        api_key,
+                        {"taskId": task_id},
+                        timeout,
+                    )
+                    consecutive_failures = 0
+                except Exception as e:
+                    consecutive_failures += 1
+                    if consecutive_failures >= 5:
+                        raise RuntimeError(f"连续多次轮询失败，任务状态未知。最后错误：{e}")
+                    continue
+
+                result_data = self._payload_data(result)
+                status = result_data.get("status") or result.get("status", "UNKNOWN")
+                wait_timer.observe(status)
                 if pbar:
-                    pbar.update_absolute(100)
-                return result_data or result
-            if status == "FAILED":
-                error_code = result_data.get("errorCode") or result.get("errorCode") or ""
-                error_msg = result_data.get("errorMessage") or result.get("errorMessage") or result.get("msg") or "Unknown error"
-                raise RuntimeError(f"任务失败：[{error_code}] {error_msg}")
-
-        raise RuntimeError(f"任务超过 {max_seconds} 秒仍未完成，请稍后查询任务ID：{task_id}")
+                    pbar.update_absolute(min(95, max(5, int(elapsed / max_seconds * 95))))
+                if status == "SUCCESS":
+                    if pbar:
+                        pbar.update_absolute(100)
+                    return result_data or result
+                if status == "FAILED":
+                    error_code = result_data.get("errorCode") or result.get("errorCode") or ""
+                    error_msg = result_data.get("errorMessage") or result.get("errorMessage") or result.get("msg") or "Unknown error"
+                    raise RuntimeError(f"任务失败：[{error_code}] {error_msg}")
+
+            raise RuntimeError(f"任务超过 {max_seconds} 秒仍未完成，请稍后查询任务ID：{task_id}")
+        finally:
+            wait_timer.finish()
 
     @staticmethod
     def _extract_result_urls(final):
@@ -646,6 +698,7 @@ class DapaoRHAllVideoSeedanceNode(DapaoRHAllImageNode):
         payload.update(extra_params)
         return payload
 
+    @timed_execution
     def generate_video(self, **kwargs):
         api_channel = kwargs.get("🌐 API渠道", "国内版")
         self._activate_api_channel(api_channel)
@@ -666,21 +719,24 @@ class DapaoRHAllVideoSeedanceNode(DapaoRHAllImageNode):
         start_time = time.time()
         submit_response = {}
         final_response = {}
+        usage = UsageRecord("runninghub", NODE_NAME, model, function, api_channel)
         try:
             payload = self._build_payload(kwargs, config, api_key, timeout)
             endpoint = config["endpoint"]
             _log_info(f"开始请求 RH Seedance2.0：{api_channel} / {endpoint}")
-            submit_response = self._post_json(
-                f"{self._current_api_urls()['base']}/{endpoint}",
-                api_key,
-                payload,
-                timeout,
-            )
+            with span("submit"):
+                submit_response = self._post_json(
+                    f"{self._current_api_urls()['base']}/{endpoint}",
+                    api_key,
+                    payload,
+                    timeout,
+                )
             if submit_response.get("errorCode") or submit_response.get("errorMessage"):
                 raise RuntimeError(f"RunningHub 提交失败：[{submit_response.get('errorCode') or ''}] {submit_response.get('errorMessage') or submit_response}")
             task_id = self._extract_task_id(submit_response)
             if not task_id:
                 raise RuntimeError(f"提交成功但响应中没有 taskId：{json.dumps(submit_response, ensure_ascii=False)[:1000]}")
+            usage.submitted(task_id)
 
             submit_data = self._payload_data(submit_response)
             if submit_data.get("status") == "SUCCESS" and submit_data.get("results"):
@@ -697,6 +753,7 @@ class DapaoRHAllVideoSeedanceNode(DapaoRHAllImageNode):
 
             elapsed_time = time.time() - start_time
             cost, duration = self._extract_usage(final_response)
+            usage.succeeded(cost, duration)
             info_lines = [
                 "✅ RH 全能视频 Seedance2.0 任务完成",
                 f"🌐 API渠道：{api_channel}",
@@ -715,6 +772,7 @@ class DapaoRHAllVideoSeedanceNode(DapaoRHAllImageNode):
                 f"🆔 任务ID：{task_id}",
                 f"🔗 视频URL：{video_url}",
                 f"⏱️ 总耗时：{elapsed_time:.2f} 秒",
+                execution_summary(),
             ]
             if cost is not None:
                 info_lines.append(f"💰 实际消耗：¥{cost}")
@@ -726,6 +784,7 @@ class DapaoRHAllVideoSeedanceNode(DapaoRHAllImageNode):
             raw_json = json.dumps({"payload": payload, "submit": submit_response, "final": final_response}, ensure_ascii=False, indent=2)
             return (RHSeedanceVideoAdapter(video_url), task_id, "\n".join(info_lines) + "\n\n" + raw_json, video_url, last_frame)
         except Exception as e:
+            usage.failed(e)
             error_msg = f"❌ 错误：RH 全能视频 Seedance2.0 生成失败\n\n详情：{e}"
             _log_error(error_msg)
             _log_error(traceback.format_exc())
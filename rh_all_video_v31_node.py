@@ -6,12 +6,14 @@ import json
 import time
 import traceback
 
+from .metrics_utils import execution_summary, span, timed_execution
 from .rh_all_image_node import API_CHANNEL_CHOICES
 from .rh_all_video_seedance_node import (
     DapaoRHAllVideoSeedanceNode,
     IO,
     RHSeedanceVideoAdapter,
 )
+from .usage_ledger_utils import UsageRecord
 
 
 NODE_NAME = "DapaoRHAllVideoV31Node"
@@ -397,6 +399,7 @@ class DapaoRHAllVideoV31Node(DapaoRHAllVideoSeedanceNode):
         payload.update(self._parse_extra_params(kwargs.get("📋 额外参数JSON", "{}")))
         return payload
 
+    @timed_execution
     def generate_video(self, **kwargs):
         api_channel = kwargs.get("🌐 API渠道", "国内版")
         api_urls = self._activate_api_channel(api_channel)
@@ -418,18 +421,21 @@ class DapaoRHAllVideoV31Node(DapaoRHAllVideoSeedanceNode):
         start_time = time.time()
         submit_response = {}
         final_response = {}
+        usage = UsageRecord("runninghub", NODE_NAME, model, f"{channel}/{function}", api_channel)
         payload = {}
         try:
             payload = self._build_payload(kwargs, config, api_key, timeout)
             endpoint = config["endpoint"]
             _log_info(f"开始请求 RH 全能视频V3.1：{api_channel} / {endpoint}")
-            submit_response = self._post_json(f"{api_urls['base']}/{endpoint}", api_key, payload, timeout)
+            with span("submit"):
+                submit_response = self._post_json(f"{api_urls['base']}/{endpoint}", api_key, payload, timeout)
             if submit_response.get("errorCode") or submit_response.get("errorMessage"):
                 raise RuntimeError(f"RunningHub 提交失败：[{submit_response.get('errorCode') or ''}] {submit_response.get('errorMessage') or submit_response}")
 
             task_id = self._extract_task_id(submit_response)
             if not task_id:
                 raise RuntimeError(f"提交成功但响应中没有 taskId：{json.dumps(submit_response, ensure_ascii=False)[:1000]}")
+            usage.submitted(task_id)
 
             submit_data = self._payload_data(submit_response)
             if submit_data.get("status") == "SUCCESS" and submit_data.get("results"):
@@ -444,6 +450,7 @@ class DapaoRHAllVideoV31Node(DapaoRHAllVideoSeedanceNode):
 
             elapsed_time = time.time() - start_time
             cost, duration_cost = self._extract_usage(final_response)
+            usage.succeeded(cost, duration_cost)
             info_lines = [
                 "✅ RH 全能视频 V3.1 任务完成",
                 f"🌐 API渠道：{api_channel}",
@@ -460,6 +467,7 @@ class DapaoRHAllVideoV31Node(DapaoRHAllVideoSeedanceNode):
                 f"🆔 任务ID：{task_id}",
                 f"🔗 视频URL：{video_url}",
                 f"⏱️ 总耗时：{elapsed_time:.2f} 秒",
+                execution_summary(),
             ]
             if cost is not None:
                 info_lines.append(f"💰 实际消耗：¥{cost}")
@@ -469,6 +477,7 @@ class DapaoRHAllVideoV31Node(DapaoRHAllVideoSeedanceNode):
             raw_json = json.dumps({"payload": payload, "submit": submit_response, "final": final_response}, ensure_ascii=False, indent=2)
             return (RHSeedanceVideoAdapter(video_url), task_id, "\n".join(info_lines) + "\n\n" + raw_json, video_url)
         except Exception as e:
+            usage.failed(e)
             error_msg = f"❌ 错误：RH 全能视频 V3.1 生成失败\n\n详情：{e}"
             _log_error(error_msg)
             _log_error(traceback.format_exc())
@@ -5,15 +5,19 @@ Loads an application's exposed parameters, uploads connected media to the
 legacy AI-app API, submits an asynchronous task, and returns image/video URLs.
 """
 
+import concurrent.futures
+import hashlib
 import io
 import json
 import mimetypes
 import os
 import tempfile
+import threading
 import time
 import traceback
 from urllib.parse import urlparse
 
+import aiohttp
 import requests
 import torch
 import torch.nn.functional as F
@@ -21,6 +25,25 @@ from PIL import Image
 
 from .rh_all_image_node import API_CHANNEL_CHOICES, create_blank_tensor, pil2tensor
 from .rh_all_video_seedance_node import DapaoRHAllVideoSeedanceNode, IO, RHSeedanceVideoAdapter
+from .async_http_utils import (
+    BREAKER_FAILURES,
+    NETWORK_ERRORS,
+    AsyncResponse,
+    SessionScope,
+    StreamingFilePayload,
+    client_timeout,
+)
+from .relay_policy_utils import (
+    RETRY_CONNECTION,
+    RETRY_POLICY,
+    RETRY_RATE_LIMIT,
+    async_slot,
+    circuit,
+    request_with_retry,
+)
+from .download_cache_utils import download_cache
+from .metrics_utils import TaskWaitTimer, execution_summary, span, timed_execution
+from .usage_ledger_utils import UsageRecord
 
 
 NODE_NAME = "DapaoRHAppNode"
@@ -31,8 +54,18 @@ APP_BASE_URLS = {
     "国外版": "https://www.runninghub.ai",
 }
 
+# 应用参数缓存：同一渠道、应用ID和密钥在有效期内复用上次读取的结果
+SCHEMA_CACHE_TTL_SECONDS = 300
+SCHEMA_CACHE_MAX_ENTRIES = 256
+
+# 浏览器上传素材时的流式转发：每次读写的块大小与进度事件的最小间隔
+UPLOAD_CHUNK_SIZE = 256 * 1024
+UPLOAD_PROGRESS_INTERVAL = 0.25
+
 AUTH_ERROR_CODES = {"401", "403", "433"}
 RUNNING_CODES = {"804", "813"}
+# 813 表示任务仍在排队，804 表示已开始运行
+QUEUED_CODE = "813"
 FAILED_CODES = {"805"}
 
 URL_KEYS = (
@@ -123,46 +156,36 @@ def _raise_api_error(code, message, api_channel):
 
 
 def _request_json(method, url, api_key, api_channel, timeout=60, params=None, payload=None):
-    last_error = None
-    for attempt in range(3):
-        try:
-            response = requests.request(
-                method,
-                url,
-                headers=_headers(api_key, api_channel),
-                params=params,
-                json=payload,
-                timeout=timeout,
-            )
-        except (requests.ConnectionError, requests.Timeout) as error:
-            last_error = error
-            if attempt >= 2:
-                raise RuntimeError(
-                    f"RunningHub 应用{api_channel}连接失败，已尝试 3 次：{error}\n"
-                    "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
-                ) from error
-            time.sleep(attempt + 1)
-            continue
-
-        message = _response_message(response)
-        if response.status_code in (401, 403):
-            raise _authentication_error(api_channel, response.status_code, message)
-        if response.status_code >= 500 and attempt < 2:
-            last_error = RuntimeError(f"HTTP {response.status_code}: {message}")
-            time.sleep(attempt + 1)
-            continue
-        if response.status_code >= 400:
-            raise RuntimeError(f"RunningHub 应用请求失败 HTTP {response.status_code}：{message}")
+    retry = RETRY_POLICY.start()
+    try:
+        response = request_with_retry(
+            method,
+            url,
+            retry,
+            headers=_headers(api_key, api_channel),
+            params=params,
+            json=payload,
+            timeout=timeout,
+        )
+    except (requests.ConnectionError, requests.Timeout) as error:
+        raise RuntimeError(
+            f"RunningHub 应用{api_channel}连接失败，已尝试 {retry.attempts} 次：{error}\n"
+            "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
+        ) from error
 
-        try:
-            data = response.json() if response.text else {}
-        except Exception as error:
-            raise RuntimeError(f"RunningHub 应用返回内容不是 JSON：{error}，响应：{response.text[:500]}") from error
-        if not isinstance(data, dict):
-            raise RuntimeError(f"RunningHub 应用返回格式错误：{str(data)[:500]}")
-        return data
+    message = _response_message(response)
+    if response.status_code in (401, 403):
+        raise _authentication_error(api_channel, response.status_code, message)
+    if response.status_code >= 400:
+        raise RuntimeError(f"RunningHub 应用请求失败 HTTP {response.status_code}：{message}")
 
-    raise RuntimeError(f"RunningHub 应用请求失败：{last_error}")
+    try:
+        data = response.json() if response.text else {}
+    except Exception as error:
+        raise RuntimeError(f"RunningHub 应用返回内容不是 JSON：{error}，响应：{response.text[:500]}") from error
+    if not isinstance(data, dict):
+        raise RuntimeError(f"RunningHub 应用返回格式错误：{str(data)[:500]}")
+    return data
 
 
 def _extract_options(field):
@@ -309,6 +332,87 @@ def fetch_rh_app_schema(api_channel, api_key, webapp_id, timeout=30):
     return _normalize_schema(data, api_channel, webapp_id)
 
 
+def schema_etag(schema):
+    """Content hash of a normalized schema, used by the UI to skip identical refreshes."""
+    body = {key: value for key, value in schema.items() if key != "etag"}
+    encoded = json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:20]
+
+
+class _SchemaCache:
+    """TTL cache of app schemas; concurrent misses for one key share a single fetch."""
+
+    def __init__(self, ttl=SCHEMA_CACHE_TTL_SECONDS, max_entries=SCHEMA_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._pending = {}
+
+    def get(self, key, loader, refresh=False):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not refresh and entry[0] > time.monotonic():
+                return entry[1]
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = concurrent.futures.Future()
+        if not owner:
+            # 相同请求正在进行中，等待它的结果而不是再请求一次
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as error:
+            with self._lock:
+                self._pending.pop(key, None)
+            future.set_exception(error)
+            raise
+        with self._lock:
+            self._pending.pop(key, None)
+            self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def _store(self, key, value):
+        now = time.monotonic()
+        if len(self._entries) >= self.max_entries:
+            for stale in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                del self._entries[stale]
+            while len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+        self._entries[key] = (now + self.ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_schema_cache = _SchemaCache()
+
+
+def get_rh_app_schema(api_channel, api_key, webapp_id, timeout=30, refresh=False):
+    """Cached ``fetch_rh_app_schema``; the result carries an ``etag`` of its content.
+
+    Entries are keyed by channel, app ID and a hash of the API key (different
+    accounts may see different apps); ``refresh=True`` bypasses the TTL but
+    still joins a fetch that is already in flight.
+    """
+    api_channel = str(api_channel or "国内版").strip()
+    api_key = str(api_key or "").strip()
+    webapp_id = str(webapp_id or "").strip()
+    key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+    def _load():
+        schema = fetch_rh_app_schema(api_channel, api_key, webapp_id, timeout)
+        schema["etag"] = schema_etag(schema)
+        return schema
+
+    schema = _schema_cache.get((api_channel, webapp_id, key_hash), _load, refresh=refresh)
+    return dict(schema)
+
+
 def upload_rh_app_file(api_channel, api_key, content, filename, mime_type, timeout=120):
     api_channel = str(api_channel or "国内版").strip()
     api_key = str(api_key or "").strip()
@@ -318,22 +422,23 @@ def upload_rh_app_file(api_channel, api_key, content, filename, mime_type, timeo
         raise ValueError("上传素材内容为空。")
 
     url = f"{_base_url(api_channel)}/task/openapi/upload"
-    response = None
-    for attempt in range(3):
-        try:
-            response = requests.post(
-                url,
-                headers=_headers(api_key, api_channel, json_content=False),
-                data={"apiKey": api_key, "fileType": "input"},
-                files={"file": (filename, content, mime_type)},
-                timeout=max(timeout, 120),
-            )
-            break
-        except (requests.ConnectionError, requests.Timeout) as error:
-            if attempt >= 2:
-                raise RuntimeError(f"RunningHub 应用素材上传失败，已尝试 3 次：{error}") from error
-            time.sleep(attempt + 1)
-
+    retry = RETRY_POLICY.start(retry_on=(RETRY_CONNECTION, RETRY_RATE_LIMIT))
+    try:
+        response = request_with_retry(
+            "POST",
+            url,
+            retry,
+            headers=_headers(api_key, api_channel, json_content=False),
+            data={"apiKey": api_key, "fileType": "input"},
+            files={"file": (filename, content, mime_type)},
+            timeout=max(timeout, 120),
+        )
+    except (requests.ConnectionError, requests.Timeout) as error:
+        raise RuntimeError(f"RunningHub 应用素材上传失败，已尝试 {retry.attempts} 次：{error}") from error
+    return _upload_file_name(response, api_channel)
+
+
+def _upload_file_name(response, api_channel):
     message = _response_message(response)
     if response.status_code in (401, 403):
         raise _authentication_error(api_channel, response.status_code, message)
@@ -349,6 +454,93 @@ def upload_rh_app_file(api_channel, api_key, content, filename, mime_type, timeo
     return file_name
 
 
+async def iter_multipart_field(field, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Yield the raw bytes of an incoming multipart field one chunk at a time."""
+    while True:
+        chunk = await field.read_chunk(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def stream_rh_app_upload(api_channel, api_key, chunks, filename, mime_type, size=None, progress=None, timeout=180):
+    """Pipe an async iterable of file chunks to the RunningHub upload endpoint.
+
+    Nothing is buffered: a chunk is only read after the previous one has been
+    written upstream, so the browser is throttled to RunningHub's pace and each
+    upload holds one chunk in memory.  ``progress(sent, total)`` is called as
+    bytes go out.  A consumed stream cannot be replayed, so unlike
+    ``upload_rh_app_file`` a failed transfer is not retried.
+    """
+    api_channel = str(api_channel or "国内版").strip()
+    api_key = str(api_key or "").strip()
+    if not api_key:
+        raise ValueError("请填写 RunningHub API密钥后再上传素材。")
+    if size is not None and size <= 0:
+        raise ValueError("上传素材内容为空。")
+
+    url = f"{_base_url(api_channel)}/task/openapi/upload"
+    headers = _headers(api_key, api_channel, json_content=False)
+    sent = 0
+    reported_at = 0.0
+    source_error = None
+
+    async def _counted_chunks():
+        nonlocal sent, reported_at, source_error
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                sent += len(chunk)
+                if size is not None and sent > size:
+                    raise ValueError(f"上传素材大小超过声明的 {size} 字节。")
+                now = time.monotonic()
+                if progress and now - reported_at >= UPLOAD_PROGRESS_INTERVAL:
+                    reported_at = now
+                    progress(sent, size)
+                yield chunk
+            if size is not None and sent != size:
+                raise ValueError(f"上传素材不完整：收到 {sent} / {size} 字节。")
+        except Exception as error:
+            source_error = error
+            raise
+
+    writer = aiohttp.MultipartWriter("form-data")
+    for name, value in (("apiKey", api_key), ("fileType", "input")):
+        writer.append(value).set_content_disposition("form-data", name=name)
+    file_part = writer.append_payload(StreamingFilePayload(_counted_chunks(), size=size, content_type=mime_type))
+    file_part.set_content_disposition("form-data", name="file", filename=filename)
+
+    try:
+        with circuit(url, BREAKER_FAILURES):
+            async with async_slot(url, headers) as slot:
+                try:
+                    async with SessionScope() as session:
+                        async with session.post(
+                            url,
+                            data=writer,
+                            headers=headers,
+                            timeout=client_timeout(max(timeout, 120)),
+                        ) as response:
+                            content = await response.read()
+                            result = slot.record(AsyncResponse(
+                                response.status, response.headers, content, str(response.url), response.reason
+                            ))
+                except NETWORK_ERRORS as error:
+                    # 浏览器端中断或大小不符时 aiohttp 会包装成连接错误，不应计入 RunningHub 的熔断
+                    if source_error is not None:
+                        raise source_error from error
+                    raise
+    except NETWORK_ERRORS as error:
+        raise RuntimeError(f"RunningHub 应用素材上传失败（已发送 {sent} 字节）：{error}") from error
+    if sent == 0:
+        raise ValueError("上传素材内容为空。")
+    if progress:
+        progress(sent, size)
+    _log_info(f"素材 {filename} 已流式上传 {sent / 1024 / 1024:.1f} MB")
+    return _upload_file_name(result, api_channel)
+
+
 class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
     @classmethod
     def INPUT_TYPES(cls):
@@ -437,14 +629,16 @@ class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
 
     @staticmethod
     def _tensor_to_png_bytes(image_tensor):
-        image = image_tensor[0]
-        image_np = (image.cpu().numpy().clip(0, 1) * 255).astype("uint8")
-        buffer = io.BytesIO()
-        Image.fromarray(image_np).convert("RGB").save(buffer, format="PNG")
-        return buffer.getvalue()
+        with span("encode"):
+            image = image_tensor[0]
+            image_np = (image.cpu().numpy().clip(0, 1) * 255).astype("uint8")
+            buffer = io.BytesIO()
+            Image.fromarray(image_np).convert("RGB").save(buffer, format="PNG")
+            return buffer.getvalue()
 
     def _upload_app_bytes(self, api_channel, api_key, content, filename, mime_type, timeout):
-        return upload_rh_app_file(api_channel, api_key, content, filename, mime_type, timeout)
+        with span("upload", bytes=len(content)):
+            return upload_rh_app_file(api_channel, api_key, content, filename, mime_type, timeout)
 
     def _video_bytes(self, video_input):
         if isinstance(video_input, str) and os.path.isfile(video_input):
@@ -483,10 +677,12 @@ class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
             media = kwargs.get(f"🎞️ 视频{media_index}")
             if media is None:
                 return ""
+            with span("encode"):
+                content = self._video_bytes(media)
             return self._upload_app_bytes(
                 api_channel,
                 api_key,
-                self._video_bytes(media),
+                content,
                 f"rh_app_video_{media_index}.mp4",
                 "video/mp4",
                 timeout,
@@ -495,7 +691,8 @@ class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
             media = kwargs.get(f"🎵 音频{media_index}")
             if media is None:
                 return ""
-            content = self._audio_to_wav_bytes(media)
+            with span("encode"):
+                content = self._audio_to_wav_bytes(media)
             if not content:
                 raise ValueError(f"无法读取音频输入 {media_index}。")
             return self._upload_app_bytes(
@@ -532,7 +729,8 @@ class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
             with open(value, "rb") as file:
                 content = file.read()
         else:
-            response = requests.get(value, timeout=max(timeout, 120))
+            with span("download"):
+                response = requests.get(value, timeout=max(timeout, 120))
             response.raise_for_status()
             filename = os.path.basename(urlparse(value).path) or f"rh_app_{value_type}"
             mime_type = response.headers.get("Content-Type") or mimetypes.guess_type(filename)[0] or "application/octet-stream"
@@ -660,9 +858,15 @@ class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
 
     @staticmethod
     def _download_image(url, timeout):
-        response = requests.get(url, timeout=max(timeout, 120))
-        response.raise_for_status()
-        return Image.open(io.BytesIO(response.content)).convert("RGB")
+        content = download_cache.read_bytes(url)
+        if content is None:
+            with span("download"):
+                response = requests.get(url, timeout=max(timeout, 120))
+            response.raise_for_status()
+            content = response.content
+            download_cache.store_bytes(url, content, response.headers)
+        with span("decode", bytes=len(content)):
+            return Image.open(io.BytesIO(content)).convert("RGB")
 
     @staticmethod
     def _combine_image_tensors(image_tensors):
@@ -698,28 +902,43 @@ class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
             normalized.append(canvas)
         return torch.cat(normalized, dim=0)
 
+    @staticmethod
+    def _output_usage(data):
+        # 应用任务的消耗写在每个输出项上，同一任务各项相同，取第一项即可
+        items = data.get("data") if isinstance(data, dict) else None
+        for item in items if isinstance(items, list) else []:
+            if isinstance(item, dict):
+                return item.get("consumeMoney") or item.get("thirdPartyConsumeMoney"), item.get("taskCostTime")
+        return None, None
+
     def _poll_outputs(self, api_channel, api_key, task_id, max_seconds, interval, timeout):
         started = time.time()
-        while time.time() - started < max_seconds:
-            time.sleep(interval)
-            data = _request_json(
-                "POST",
-                f"{_base_url(api_channel)}/task/openapi/outputs",
-                api_key,
-                api_channel,
-                timeout=timeout,
-                payload={"apiKey": api_key, "taskId": task_id},
-            )
-            code = str(data.get("code", ""))
-            if code == "0":
-                return data
-            if code in RUNNING_CODES:
-                continue
-            if code in FAILED_CODES:
-                raise RuntimeError(f"RunningHub 应用任务失败 805：{self._failed_reason(data)}")
-            _raise_api_error(code, data.get("msg") or data.get("message") or data, api_channel)
-        raise RuntimeError(f"RunningHub 应用任务超过 {max_seconds} 秒仍未完成，任务ID：{task_id}")
+        wait_timer = TaskWaitTimer(task_id=task_id)
+        try:
+            while time.time() - started < max_seconds:
+                time.sleep(interval)
+                data = _request_json(
+                    "POST",
+                    f"{_base_url(api_channel)}/task/openapi/outputs",
+                    api_key,
+                    api_channel,
+                    timeout=timeout,
+                    payload={"apiKey": api_key, "taskId": task_id},
+                )
+                code = str(data.get("code", ""))
+                wait_timer.observe("QUEUED" if code == QUEUED_CODE else "RUNNING")
+                if code == "0":
+                    return data
+                if code in RUNNING_CODES:
+                    continue
+                if code in FAILED_CODES:
+                    raise RuntimeError(f"RunningHub 应用任务失败 805：{self._failed_reason(data)}")
+                _raise_api_error(code, data.get("msg") or data.get("message") or data, api_channel)
+            raise RuntimeError(f"RunningHub 应用任务超过 {max_seconds} 秒仍未完成，任务ID：{task_id}")
+        finally:
+            wait_timer.finish()
 
+    @timed_execution
     def run_app(self, **kwargs):
         api_channel = str(kwargs.get("🌐 API渠道", "国内版") or "国内版").strip()
         api_key = str(kwargs.get("🔑 API密钥", "") or "").strip()
@@ -731,6 +950,7 @@ class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
         skip_error = bool(kwargs.get("🚫 出错时跳过", False))
         submit_response = {}
         final_response = {}
+        usage = UsageRecord("runninghub", NODE_NAME, webapp_id, instance_type, api_channel)
 
         try:
             if not api_key:
@@ -745,7 +965,7 @@ class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
                 or str(config.get("apiChannel") or "") != api_channel
                 or not isinstance(config.get("schema"), list)
             ):
-                schema = fetch_rh_app_schema(api_channel, api_key, webapp_id, timeout=min(timeout, 60))
+                schema = get_rh_app_schema(api_channel, api_key, webapp_id, timeout=min(timeout, 60))
                 config = {**schema, "values": {}}
 
             node_info = self._build_node_info(
@@ -766,14 +986,15 @@ class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
                 payload["instanceType"] = instance_type
 
             _log_info(f"开始运行：{api_channel} / {config.get('appName') or webapp_id} / 参数 {len(node_info)} 个")
-            submit_response = _request_json(
-                "POST",
-                f"{_base_url(api_channel)}/task/openapi/ai-app/run",
-                api_key,
-                api_channel,
-                timeout=timeout,
-                payload=payload,
-            )
+            with span("submit"):
+                submit_response = _request_json(
+                    "POST",
+                    f"{_base_url(api_channel)}/task/openapi/ai-app/run",
+                    api_key,
+                    api_channel,
+                    timeout=timeout,
+                    payload=payload,
+                )
             submit_code = str(submit_response.get("code", "0"))
             if submit_code != "0":
                 _raise_api_error(
@@ -784,6 +1005,7 @@ class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
             task_id = self._extract_task_id(submit_response)
             if not task_id:
                 raise RuntimeError(f"RunningHub 应用提交成功但没有返回 taskId：{json.dumps(submit_response, ensure_ascii=False)[:800]}")
+            usage.submitted(task_id)
 
             final_response = self._poll_outputs(
                 api_channel,
@@ -810,6 +1032,7 @@ class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
                     video_url = item["url"]
 
             images = self._combine_image_tensors(image_tensors)
+            usage.succeeded(*self._output_usage(final_response))
             urls = [item["url"] for item in output_items]
             info_lines = [
                 "✅ RH 应用任务完成",
@@ -820,6 +1043,7 @@ class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
                 f"🧩 提交参数：{len(node_info)} 个",
                 f"🆔 任务ID：{task_id}",
                 f"📦 输出数量：{len(urls)}",
+                execution_summary(),
             ]
             raw = json.dumps(
                 {
@@ -832,6 +1056,7 @@ class DapaoRHAppNode(DapaoRHAllVideoSeedanceNode):
             )
             return (images, RHSeedanceVideoAdapter(video_url), task_id, "\n".join(urls), "\n".join(info_lines) + "\n\n" + raw)
         except Exception as error:
+            usage.failed(error)
             message = f"❌ 错误：RH 应用运行失败\n\n详情：{error}"
             _log_error(message)
             _log_error(traceback.format_exc())
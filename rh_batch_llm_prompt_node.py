@@ -28,6 +28,8 @@ from .rh_llm_chat_node import (
     _default_model,
     _fetch_model_list,
 )
+from .metrics_utils import execution_summary, propagate, timed_execution
+from .relay_policy_utils import decorrelated_jitter, is_circuit_open
 
 
 NODE_NAME = "DapaoRHBatchLLMPromptNode"
@@ -756,6 +758,7 @@ class DapaoRHBatchLLMPromptNode(DapaoRHLLMChatNode):
         last_traceback = ""
         user_text = self._build_row_user_text(meta_instruction, row, total_count, roles)
         started_at = time.time()
+        retry_delay = 0
         for attempt in range(retry_count + 1):
             try:
                 prompt, raw, timing = self._call_llm_for_row(api_key, model, system_role, user_text, row, roles, params)
@@ -773,16 +776,19 @@ class DapaoRHBatchLLMPromptNode(DapaoRHLLMChatNode):
             except Exception as e:
                 last_error = e
                 last_traceback = traceback.format_exc()
+                if is_circuit_open(e):
+                    break
                 if attempt < retry_count:
-                    _log_info(f"第 {row['index']} 项第 {attempt + 1} 次失败，准备重试：{e}")
-                    time.sleep(min(8, 1 + attempt * 2))
+                    retry_delay = decorrelated_jitter(retry_delay, 1, 8)
+                    _log_info(f"第 {row['index']} 项第 {attempt + 1} 次失败，{retry_delay:.1f} 秒后重试：{e}")
+                    time.sleep(retry_delay)
 
         return {
             "index": row["index"],
             "ok": False,
             "prompt": "",
             "response": None,
-            "attempts": retry_count + 1,
+            "attempts": attempt + 1,
             "elapsed_seconds": round(time.time() - started_at, 3),
             "timing": {},
             "error": str(last_error),
@@ -845,9 +851,11 @@ class DapaoRHBatchLLMPromptNode(DapaoRHLLMChatNode):
             f"🧠 推理强度：{params['reasoning_effort']}",
             f"🎲 随机种：{cache_seed}（仅用于 ComfyUI 缓存控制）",
             f"⏱️ 总耗时：{elapsed_time:.2f} 秒",
+            execution_summary(),
         ])
         return prompts, json.dumps(full_response, ensure_ascii=False, indent=2), info
 
+    @timed_execution
     def generate_batch_prompts(self, **kwargs):
         api_channel = self._text_input_value(kwargs, "🌐 API渠道", "国内版")
         self._activate_api_channel(api_channel)
@@ -951,7 +959,7 @@ class DapaoRHBatchLLMPromptNode(DapaoRHLLMChatNode):
             with ThreadPoolExecutor(max_workers=concurrency) as executor:
                 future_map = {
                     executor.submit(
-                        self._run_image_row_task,
+                        propagate(self._run_image_row_task),
                         row,
                         total_count,
                         api_key,
@@ -1092,6 +1100,7 @@ class DapaoRHBatchLLMPromptNode(DapaoRHLLMChatNode):
             f"🧠 推理强度：{params['reasoning_effort']}",
             f"🎲 随机种：{cache_seed}（仅用于 ComfyUI 缓存控制）",
             f"⏱️ 总耗时：{elapsed_time:.2f} 秒",
+            execution_summary(),
         ]
         info_lines.append("📋 对齐明细：")
         for row in rows:
@@ -5,7 +5,6 @@ RH LLM 智能对话节点
 作者：@炮老师的小课堂
 """
 
-import base64
 import io
 import json
 import os
@@ -20,6 +19,11 @@ import numpy as np
 import requests
 from PIL import Image
 
+from .metrics_utils import execution_summary, span, timed_execution
+from .relay_policy_utils import RETRY_POLICY, request_with_retry
+from .stream_body_utils import InlineMedia, StreamingJSONBody
+from .video_source_utils import open_video_source
+
 
 NODE_NAME = "DapaoRHLLMChatNode"
 LLM_CHAT_URL = "https://llm.runninghub.cn/v1/chat/completions"
@@ -191,70 +195,10 @@ def _tensor_to_data_uris(image_tensor):
         pil_image = Image.fromarray(image_np).convert("RGB")
         buffer = io.BytesIO()
         pil_image.save(buffer, format="PNG")
-        encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
-        data_uris.append(f"data:image/png;base64,{encoded}")
+        data_uris.append(InlineMedia(buffer.getvalue(), "image/png"))
     return data_uris
 
 
-def _copy_file_like_to_temp(file_obj):
-    if not hasattr(file_obj, "read"):
-        return None
-    try:
-        if hasattr(file_obj, "seek"):
-            file_obj.seek(0)
-        handle = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-        with handle:
-            handle.write(file_obj.read())
-        return handle.name
-    except Exception:
-        return None
-
-
-def _extract_video_path(video):
-    cleanup_paths = []
-    if isinstance(video, str) and os.path.exists(video):
-        return video, cleanup_paths
-    if isinstance(video, dict):
-        for key in ("file_path", "path", "filename"):
-            value = video.get(key)
-            if isinstance(value, str) and os.path.exists(value):
-                return value, cleanup_paths
-
-    file_obj = getattr(video, "_VideoFromFile__file", None)
-    if isinstance(file_obj, str) and os.path.exists(file_obj):
-        return file_obj, cleanup_paths
-    copied = _copy_file_like_to_temp(file_obj)
-    if copied:
-        cleanup_paths.append(copied)
-        return copied, cleanup_paths
-
-    for attr in ("path", "file"):
-        value = getattr(video, attr, None)
-        if isinstance(value, str) and os.path.exists(value):
-            return value, cleanup_paths
-
-    if hasattr(video, "get_stream_source"):
-        try:
-            value = video.get_stream_source()
-            if isinstance(value, str) and os.path.exists(value):
-                return value, cleanup_paths
-        except Exception:
-            pass
-
-    if hasattr(video, "save_to"):
-        try:
-            handle = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-            handle.close()
-            video.save_to(handle.name)
-            if os.path.exists(handle.name):
-                cleanup_paths.append(handle.name)
-                return handle.name, cleanup_paths
-        except Exception:
-            pass
-
-    return None, cleanup_paths
-
-
 def _compress_video(input_path):
     ffmpeg = shutil.which("ffmpeg")
     if not ffmpeg:
@@ -295,29 +239,33 @@ def _compress_video(input_path):
 
 
 def _video_to_data_uri(video):
-    path, cleanup_paths = _extract_video_path(video)
-    if not path:
+    # 已在磁盘或内存中的视频直接读取；只有需要 ffmpeg 压缩时才落地为文件
+    try:
+        source = open_video_source(video)
+    except Exception:
+        source = None
+    if source is None:
         raise RuntimeError("无法从 VIDEO 输入解析到本地视频文件路径。")
 
+    compressed = None
     try:
-        use_path = path
-        if os.path.getsize(use_path) > MAX_VIDEO_BYTES:
-            compressed = _compress_video(use_path)
-            if not compressed:
-                raise RuntimeError("视频超过 10MB，且未找到 ffmpeg 或压缩失败，无法发送给 RH LLM。")
-            cleanup_paths.append(compressed)
-            use_path = compressed
-
-        if os.path.getsize(use_path) > MAX_VIDEO_BYTES:
-            raise RuntimeError("视频处理后仍超过 10MB，无法发送给 RH LLM。")
-
-        with open(use_path, "rb") as handle:
-            encoded = base64.b64encode(handle.read()).decode("ascii")
-        return f"data:video/mp4;base64,{encoded}"
+        with source:
+            if source.size > MAX_VIDEO_BYTES:
+                compressed = _compress_video(source.ensure_path())
+                if not compressed:
+                    raise RuntimeError("视频超过 10MB，且未找到 ffmpeg 或压缩失败，无法发送给 RH LLM。")
+                if os.path.getsize(compressed) > MAX_VIDEO_BYTES:
+                    raise RuntimeError("视频处理后仍超过 10MB，无法发送给 RH LLM。")
+                with open(compressed, "rb") as handle:
+                    content = handle.read()
+            else:
+                content = source.read_bytes()
+        # base64 在发送请求体时分块编码，不再生成完整的 data URI 字符串
+        return InlineMedia(content, "video/mp4")
     finally:
-        for cleanup_path in cleanup_paths:
+        if compressed:
             try:
-                os.remove(cleanup_path)
+                os.remove(compressed)
             except Exception:
                 pass
 
@@ -507,44 +455,34 @@ class DapaoRHLLMChatNode:
             raise RuntimeError(f"RH LLM 服务异常 {status}：服务器或上游暂时不可用。接口返回：{message}")
         raise RuntimeError(f"RH LLM 请求失败 {status}：{message}")
 
-    @staticmethod
-    def _should_retry(exc):
-        if isinstance(exc, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
-            return True
-        text = str(exc)
-        return "429" in text or "服务异常" in text or "暂时不可用" in text
-
     def _post_json_with_retry(self, payload, api_key, timeout):
-        last_error = None
         api_channel = self._current_api_channel()
         chat_url = self._current_api_urls()["chat"]
-        for attempt in range(3):
-            try:
-                response = requests.post(
+        retry = RETRY_POLICY.start()
+        try:
+            with span("submit"):
+                response = request_with_retry(
+                    "POST",
                     chat_url,
+                    retry,
                     headers=self._headers(api_key),
-                    json=payload,
+                    data=StreamingJSONBody(payload),
                     timeout=timeout,
                 )
-                self._raise_for_response(response, api_channel)
-                data = response.json()
-                auth_error = self._json_authentication_error(data)
-                if auth_error:
-                    raise self._authentication_error(api_channel, auth_error[0], auth_error[1])
-                return data
-            except json.JSONDecodeError as e:
-                raise RuntimeError(f"RH LLM 返回内容不是 JSON：{e}")
-            except Exception as e:
-                last_error = e
-                if attempt >= 2 or not self._should_retry(e):
-                    if isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
-                        raise RuntimeError(
-                            f"RH LLM {api_channel}连接失败，已尝试 {attempt + 1} 次：{e}\n"
-                            "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
-                        ) from e
-                    raise
-                time.sleep(min(2 ** attempt, 5))
-        raise last_error
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            raise RuntimeError(
+                f"RH LLM {api_channel}连接失败，已尝试 {retry.attempts} 次：{e}\n"
+                "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
+            ) from e
+        self._raise_for_response(response, api_channel)
+        try:
+            data = response.json()
+        except json.JSONDecodeError as e:
+            raise RuntimeError(f"RH LLM 返回内容不是 JSON：{e}")
+        auth_error = self._json_authentication_error(data)
+        if auth_error:
+            raise self._authentication_error(api_channel, auth_error[0], auth_error[1])
+        return data
 
     @staticmethod
     def _build_messages(system_role, user_input, image_urls, video_url=None):
@@ -623,6 +561,7 @@ class DapaoRHLLMChatNode:
             raise ValueError("➕ 额外参数JSON 必须是 JSON 对象，例如 {\"presence_penalty\":0}")
         return data
 
+    @timed_execution
     def chat(self, **kwargs):
         api_channel = kwargs.get("🌐 API渠道", "国内版")
         self._activate_api_channel(api_channel)
@@ -646,8 +585,9 @@ class DapaoRHLLMChatNode:
                 raise ValueError("模型ID为空，请填写有效模型ID。")
 
             start_time = time.time()
-            image_urls = self._collect_images(kwargs)
-            video_url = self._collect_video(kwargs, bool(image_urls))
+            with span("encode"):
+                image_urls = self._collect_images(kwargs)
+                video_url = self._collect_video(kwargs, bool(image_urls))
             payload = {
                 "model": model,
                 "messages": self._build_messages(system_role, user_input, image_urls, video_url),
@@ -678,7 +618,8 @@ class DapaoRHLLMChatNode:
                 f"🎲 Top_P：{top_p}\n"
                 f"🧠 推理强度：{reasoning_effort}\n"
                 f"🎲 随机种：{cache_seed}（仅用于 ComfyUI 缓存控制）\n"
-                f"⏱️ 总耗时：{elapsed_time:.2f} 秒"
+                f"⏱️ 总耗时：{elapsed_time:.2f} 秒\n"
+                f"{execution_summary()}"
             )
             return (response_text, json.dumps(result, ensure_ascii=False, indent=2), info)
 
@@ -10,11 +10,14 @@ import json
 import time
 import traceback
 
+from .asset_cache_utils import metadata_from_response
+from .metrics_utils import TaskWaitTimer, execution_summary, span, timed_execution
 from .rh_all_image_node import API_CHANNEL_CHOICES, BASE_URL
 from .rh_all_video_seedance_node import (
     DapaoRHAllVideoSeedanceNode,
     RHSeedanceVideoAdapter,
 )
+from .usage_ledger_utils import UsageRecord
 
 
 NODE_NAME = "DapaoRHSeedance20MiniNode"
@@ -191,18 +194,14 @@ class DapaoRHSeedance20MiniNode(DapaoRHAllVideoSeedanceNode):
     def _upload_bytes(self, api_key, content, filename, mime_type, timeout):
         return super()._upload_bytes(api_key, content, filename, mime_type, timeout)
 
-    def _query_asset_type(self, api_key, asset_id, timeout):
+    def _query_asset_metadata(self, api_key, asset_id, timeout):
         response = self._post_json(
             f"{getattr(self, '_active_base_url', BASE_URL).rstrip('/')}/assets/query",
             api_key,
             {"assetId": asset_id},
             timeout,
         )
-        data = response.get("data") or {}
-        asset_type = str(data.get("assetType") or "").strip().lower()
-        if not asset_type:
-            raise ValueError(f"素材 {asset_id} 没有返回 assetType，无法判断应接入图片、视频还是音频槽位。")
-        return asset_type
+        return metadata_from_response(asset_id, response)
 
     def _poll_task_video(self, task_id, api_key, max_seconds, interval, timeout):
         poll_url = f"{getattr(self, '_active_base_url', BASE_URL).rstrip('/')}/query"
@@ -216,33 +215,39 @@ class DapaoRHSeedance20MiniNode(DapaoRHAllVideoSeedanceNode):
         if pbar:
             pbar.update_absolute(5)
 
-        while elapsed < max_seconds:
-            time.sleep(interval)
-            elapsed += interval
-            try:
-                result = self._post_json(poll_url, api_key, {"taskId": task_id}, timeout)
-                consecutive_failures = 0
-            except Exception as e:
-                consecutive_failures += 1
-                if consecutive_failures >= 5:
-                    raise RuntimeError(f"连续多次轮询失败，任务状态未知。最后错误：{e}")
-                continue
-
-            result_data = self._payload_data(result)
-            status = result_data.get("status") or result.get("status", "UNKNOWN")
-            if pbar:
-                pbar.update_absolute(min(95, max(5, int(elapsed / max_seconds * 95))))
-            if status == "SUCCESS":
+        wait_timer = TaskWaitTimer(task_id=task_id)
+        try:
+            while elapsed < max_seconds:
+                time.sleep(interval)
+                elapsed += interval
+                try:
+                    result = self._post_json(poll_url, api_key, {"taskId": task_id}, timeout)
+                    consecutive_failures = 0
+                except Exception as e:
+                    consecutive_failures += 1
+                    if consecutive_failures >= 5:
+                        raise RuntimeError(f"连续多次轮询失败，任务状态未知。最后错误：{e}")
+                    continue
+
+                result_data = self._payload_data(result)
+                status = result_data.get("status") or result.get("status", "UNKNOWN")
+                wait_timer.observe(status)
                 if pbar:
-                    pbar.update_absolute(100)
-                return result_data or result
-            if status == "FAILED":
-                error_code = result_data.get("errorCode") or result.get("errorCode") or ""
-                error_msg = result_data.get("errorMessage") or result.get("errorMessage") or result.get("msg") or "Unknown error"
-                raise RuntimeError(f"任务失败：[{error_code}] {error_msg}")
-
-        raise RuntimeError(f"任务超过 {max_seconds} 秒仍未完成，请稍后查询任务ID：{task_id}")
-
+                    pbar.update_absolute(min(95, max(5, int(elapsed / max_seconds * 95))))
+                if status == "SUCCESS":
+                    if pbar:
+                        pbar.update_absolute(100)
+                    return result_data or result
+                if status == "FAILED":
+                    error_code = result_data.get("errorCode") or result.get("errorCode") or ""
+                    error_msg = result_data.get("errorMessage") or result.get("errorMessage") or result.get("msg") or "Unknown error"
+                    raise RuntimeError(f"任务失败：[{error_code}] {error_msg}")
+
+            raise RuntimeError(f"任务超过 {max_seconds} 秒仍未完成，请稍后查询任务ID：{task_id}")
+        finally:
+            wait_timer.finish()
+
+    @timed_execution
     def generate_video(self, **kwargs):
         api_channel = kwargs.get("🌐 API渠道", "国内版")
         api_urls = self._activate_api_channel(api_channel)
@@ -265,16 +270,19 @@ class DapaoRHSeedance20MiniNode(DapaoRHAllVideoSeedanceNode):
         start_time = time.time()
         submit_response = {}
         final_response = {}
+        usage = UsageRecord("runninghub", NODE_NAME, "SEEDANCE2.0 Mini", function, api_channel)
         try:
             payload = self._build_payload(kwargs, config, api_key, timeout)
             endpoint = config["endpoint"]
             _log_info(f"开始请求 RH Seedance2.0 Mini：{api_channel} / {endpoint}")
-            submit_response = self._post_json(f"{api_urls['base']}/{endpoint}", api_key, payload, timeout)
+            with span("submit"):
+                submit_response = self._post_json(f"{api_urls['base']}/{endpoint}", api_key, payload, timeout)
             if submit_response.get("errorCode") or submit_response.get("errorMessage"):
                 raise RuntimeError(f"RunningHub 提交失败：[{submit_response.get('errorCode') or ''}] {submit_response.get('errorMessage') or submit_response}")
             task_id = self._extract_task_id(submit_response)
             if not task_id:
                 raise RuntimeError(f"提交成功但响应中没有 taskId：{json.dumps(submit_response, ensure_ascii=False)[:1000]}")
+            usage.submitted(task_id)
 
             submit_data = self._payload_data(submit_response)
             if submit_data.get("status") == "SUCCESS" and submit_data.get("results"):
@@ -291,6 +299,7 @@ class DapaoRHSeedance20MiniNode(DapaoRHAllVideoSeedanceNode):
 
             elapsed_time = time.time() - start_time
             cost, duration_cost = self._extract_usage(final_response)
+            usage.succeeded(cost, duration_cost)
             price_text = self._price_text(
                 function,
                 payload.get("resolution"),
@@ -315,6 +324,7 @@ class DapaoRHSeedance20MiniNode(DapaoRHAllVideoSeedanceNode):
                 f"🆔 任务ID：{task_id}",
                 f"🔗 视频URL：{video_url}",
                 f"⏱️ 总耗时：{elapsed_time:.2f} 秒",
+                execution_summary(),
             ]
             if cost is not None:
                 info_lines.append(f"💰 实际消耗：¥{cost}")
@@ -326,6 +336,7 @@ class DapaoRHSeedance20MiniNode(DapaoRHAllVideoSeedanceNode):
             raw_json = json.dumps({"payload": payload, "submit": submit_response, "final": final_response}, ensure_ascii=False, indent=2)
             return (RHSeedanceVideoAdapter(video_url), task_id, "\n".join(info_lines) + "\n\n" + raw_json, video_url, last_frame)
         except Exception as e:
+            usage.failed(e)
             error_msg = f"❌ 错误：RH Seedance2.0 Mini 生成失败\n\n详情：{e}"
             _log_error(error_msg)
             _log_error(traceback.format_exc())
@@ -20,6 +20,10 @@ import requests
 import torch
 from PIL import Image
 
+from .asset_cache_utils import ASSET_FAILED_STATUSES, ASSET_READY_STATUSES, asset_cache, metadata_from_response
+from .relay_policy_utils import RETRY_CONNECTION, RETRY_POLICY, RETRY_RATE_LIMIT, RETRY_SERVER, request_with_retry
+from .video_source_utils import open_video_source
+
 
 API_CHANNEL_CHOICES = ["国内版", "国外版"]
 API_BASE_URLS = {
@@ -30,9 +34,6 @@ ASSET_GROUP_ID = "group-20260327004931-dvjbj"
 ASSET_NAME = "dapao_seedance_asset"
 CATEGORY = "🤖dapaoAPI/🦄RH功能专区🦄"
 
-ASSET_READY_STATUSES = {"ACTIVE", "SUCCESS", "SUCCEEDED", "COMPLETED", "DONE", "READY", "AVAILABLE"}
-ASSET_FAILED_STATUSES = {"FAILED", "ERROR", "CANCEL", "CANCELED"}
-
 VIDEO_MIN_DURATION = 2.0
 VIDEO_MAX_DURATION = 15.0
 VIDEO_MIN_RATIO = 0.4
@@ -131,66 +132,54 @@ def _api_base_url(api_channel):
 
 def _post_json(endpoint, api_key, payload, timeout=60, max_retries=2, api_channel="国内版"):
     url = f"{_api_base_url(api_channel)}/{endpoint.lstrip('/')}"
-    last_error = None
-    for attempt in range(max_retries + 1):
-        try:
-            if attempt:
-                time.sleep(min(2 ** attempt, 10))
-            response = requests.post(url, headers=_headers(api_key), json=payload, timeout=timeout)
-        except (requests.ConnectionError, requests.Timeout) as error:
-            last_error = error
-            if attempt >= max_retries:
-                raise RuntimeError(
-                    f"RunningHub {api_channel}连接失败，已尝试 {attempt + 1} 次：{error}\n"
-                    "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
-                ) from error
-            continue
+    retry = RETRY_POLICY.start(budgets={RETRY_CONNECTION: max_retries, RETRY_SERVER: max_retries})
+    try:
+        response = request_with_retry("POST", url, retry, headers=_headers(api_key), json=payload, timeout=timeout)
+    except (requests.ConnectionError, requests.Timeout) as error:
+        raise RuntimeError(
+            f"RunningHub {api_channel}连接失败，已尝试 {retry.attempts} 次：{error}\n"
+            "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
+        ) from error
+
+    message = _response_error(response)
+    if _is_authentication_error(response.status_code, message):
+        raise _authentication_error(api_channel, response.status_code, message)
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}: {message}")
 
-        message = _response_error(response)
-        if _is_authentication_error(response.status_code, message):
-            raise _authentication_error(api_channel, response.status_code, message)
-        if response.status_code >= 500 and attempt < max_retries:
-            last_error = RuntimeError(f"HTTP {response.status_code}: {message}")
-            continue
-        if response.status_code >= 400:
-            raise RuntimeError(f"HTTP {response.status_code}: {message}")
-
-        data = response.json() if response.text else {}
-        if not isinstance(data, dict):
-            raise RuntimeError(f"接口返回内容不是 JSON：{response.text[:300]}")
-        code = data.get("code")
-        if code in (None, 0, "0"):
-            error_code = data.get("errorCode")
-            if error_code not in (None, 0, "0", ""):
-                code = error_code
-        message = data.get("msg") or data.get("message") or data.get("errorMessage") or data
-        if code not in (None, 0, "0"):
-            if _is_authentication_error(code, message):
-                raise _authentication_error(api_channel, code, message)
-            raise RuntimeError(message)
-        return data
-    raise RuntimeError(f"请求失败：{last_error}")
+    data = response.json() if response.text else {}
+    if not isinstance(data, dict):
+        raise RuntimeError(f"接口返回内容不是 JSON：{response.text[:300]}")
+    code = data.get("code")
+    if code in (None, 0, "0"):
+        error_code = data.get("errorCode")
+        if error_code not in (None, 0, "0", ""):
+            code = error_code
+    message = data.get("msg") or data.get("message") or data.get("errorMessage") or data
+    if code not in (None, 0, "0"):
+        if _is_authentication_error(code, message):
+            raise _authentication_error(api_channel, code, message)
+        raise RuntimeError(message)
+    return data
 
 
 def _upload_file(api_key, content, filename, mime_type, timeout=120, api_channel="国内版"):
     upload_url = f"{_api_base_url(api_channel)}/media/upload/binary"
-    response = None
-    for attempt in range(3):
-        try:
-            response = requests.post(
-                upload_url,
-                headers={"Authorization": f"Bearer {api_key}"},
-                files={"file": (filename, content, mime_type)},
-                timeout=max(timeout, 120),
-            )
-            break
-        except (requests.ConnectionError, requests.Timeout) as error:
-            if attempt >= 2:
-                raise RuntimeError(
-                    f"RunningHub {api_channel}媒体上传连接失败，已尝试 3 次：{error}\n"
-                    "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
-                ) from error
-            time.sleep(attempt + 1)
+    retry = RETRY_POLICY.start(retry_on=(RETRY_CONNECTION, RETRY_RATE_LIMIT))
+    try:
+        response = request_with_retry(
+            "POST",
+            upload_url,
+            retry,
+            headers={"Authorization": f"Bearer {api_key}"},
+            files={"file": (filename, content, mime_type)},
+            timeout=max(timeout, 120),
+        )
+    except (requests.ConnectionError, requests.Timeout) as error:
+        raise RuntimeError(
+            f"RunningHub {api_channel}媒体上传连接失败，已尝试 {retry.attempts} 次：{error}\n"
+            "如果启用了代理软件，请检查代理是否稳定，或将当前 RunningHub 域名配置为直连。"
+        ) from error
     if response.status_code >= 400:
         message = _response_error(response)
         if _is_authentication_error(response.status_code, message):
@@ -345,41 +334,6 @@ def _prepare_audio(audio):
     return content, f"asset_{abs(hash(content)) % 10**10}.wav", "audio/wav"
 
 
-def _video_path(value):
-    if value is None:
-        return ""
-    if hasattr(value, "get_stream_source"):
-        source = value.get_stream_source()
-        if isinstance(source, str) and os.path.isfile(source):
-            return source
-    for attr in ("path", "file_path", "filename"):
-        path = getattr(value, attr, None)
-        if isinstance(path, str) and os.path.isfile(path):
-            return path
-    if isinstance(value, dict):
-        for key in ("file_path", "path", "filename", "file", "video_path"):
-            path = value.get(key)
-            if isinstance(path, str) and os.path.isfile(path):
-                return path
-    if isinstance(value, (list, tuple)) and value:
-        return _video_path(value[0])
-    if isinstance(value, str) and os.path.isfile(value):
-        return value
-    return ""
-
-
-def _video_bytes(value):
-    path = _video_path(value)
-    if path:
-        with open(path, "rb") as f:
-            return f.read()
-    if hasattr(value, "get_stream_source"):
-        source = value.get_stream_source()
-        if hasattr(source, "read"):
-            return source.read()
-    raise ValueError("请接入有效的视频素材。")
-
-
 def _tool(name):
     env_name = f"RH_{name.upper()}_PATH"
     configured = os.environ.get(env_name)
@@ -661,31 +615,26 @@ def _transcode_video(path, keep_audio=False):
 
 
 def _prepare_video(video, keep_audio=False):
-    path = _video_path(video)
-    temp_input = ""
+    # 已有文件直接交给 ffprobe/ffmpeg；内存流或需重新编码的 VIDEO 才写临时文件
+    source = open_video_source(video, need_path=True)
+    if source is None:
+        raise ValueError("请接入有效的视频素材。")
     temp_output = ""
     try:
-        if not path:
-            content = _video_bytes(video)
-            temp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-            temp.write(content)
-            temp.close()
-            temp_input = temp.name
-            path = temp.name
-        final_path, is_temp = _transcode_video(path, keep_audio=keep_audio)
-        temp_output = final_path if is_temp else ""
-        with open(final_path, "rb") as f:
-            content = f.read()
-        if len(content) > VIDEO_MAX_SIZE_BYTES:
-            raise RuntimeError("视频素材超过 50MB，请压缩后再提交。")
+        with source:
+            final_path, is_temp = _transcode_video(source.path, keep_audio=keep_audio)
+            temp_output = final_path if is_temp else ""
+            if os.path.getsize(final_path) > VIDEO_MAX_SIZE_BYTES:
+                raise RuntimeError("视频素材超过 50MB，请压缩后再提交。")
+            with open(final_path, "rb") as f:
+                content = f.read()
         return content, f"asset_{abs(hash(content)) % 10**10}.mp4", "video/mp4"
     finally:
-        for item in (temp_input, temp_output):
-            try:
-                if item and os.path.exists(item):
-                    os.remove(item)
-            except OSError:
-                pass
+        try:
+            if temp_output and os.path.exists(temp_output):
+                os.remove(temp_output)
+        except OSError:
+            pass
 
 
 def _media_inputs(image=None, video=None, audio=None):
@@ -736,7 +685,7 @@ def _create_one_asset(api_key, media_type, value, timeout, keep_video_audio=Fals
     }
 
 
-def _query_asset(api_key, asset_id, timeout, api_channel="国内版"):
+def _fetch_asset(api_key, asset_id, timeout, api_channel="国内版"):
     response = _post_json(
         "assets/query",
         api_key,
@@ -745,13 +694,24 @@ def _query_asset(api_key, asset_id, timeout, api_channel="国内版"):
         max_retries=1,
         api_channel=api_channel,
     )
-    data = response.get("data") or {}
-    return {
-        "asset_id": _clean(data.get("assetId")) or asset_id,
-        "status": _clean(data.get("status")),
-        "preview_url": _clean(data.get("previewUrl")),
-        "response": response,
-    }
+    return metadata_from_response(asset_id, response)
+
+
+def _query_asset(api_key, asset_id, timeout, api_channel="国内版"):
+    # 已进入终态的素材直接读缓存；处理中的素材不会入缓存，轮询仍会请求接口
+    return asset_cache.lookup(
+        api_channel,
+        asset_id,
+        lambda: _fetch_asset(api_key, asset_id, timeout, api_channel),
+    )
+
+
+def _query_assets(api_key, asset_ids, timeout, api_channel="国内版"):
+    return asset_cache.lookup_many(
+        api_channel,
+        asset_ids,
+        lambda asset_id: _fetch_asset(api_key, asset_id, timeout, api_channel),
+    )
 
 
 def _wait_for_asset(api_key, asset_id, media_type, timeout, api_channel="国内版"):
@@ -917,12 +877,20 @@ class DapaoRHSeedanceAssetQueryNode:
         try:
             if not api_key:
                 raise ValueError("请填写 RunningHub API密钥。")
-            if asset_id.startswith("asset://"):
-                asset_id = asset_id[8:]
-            if not asset_id:
+            asset_ids = _split_asset_ids(asset_id)
+            if not asset_ids:
                 raise ValueError("asset_id 不能为空。")
-            info = _query_asset(api_key, asset_id, timeout, api_channel)
-            return (info["asset_id"], info["status"], info["preview_url"], _json(info["response"]))
+            if len(asset_ids) == 1:
+                info = _query_asset(api_key, asset_ids[0], timeout, api_channel)
+                return (info["asset_id"], info["status"], info["preview_url"], _json(info["response"]))
+            # 合并节点输出的多个 asset_id 一次批量查询，各输出按输入顺序逐行对应
+            infos = _query_assets(api_key, asset_ids, timeout, api_channel)
+            return (
+                ", ".join(info["asset_id"] for info in infos),
+                "\n".join(info["status"] for info in infos),
+                "\n".join(info["preview_url"] for info in infos),
+                _json([info["response"] for info in infos]),
+            )
         except Exception as e:
             if skip_error:
                 return self._error_result(str(e))
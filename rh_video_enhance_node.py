@@ -6,12 +6,14 @@ import json
 import time
 import traceback
 
+from .metrics_utils import execution_summary, span, timed_execution
 from .rh_all_image_node import API_CHANNEL_CHOICES
 from .rh_all_video_seedance_node import (
     DapaoRHAllVideoSeedanceNode,
     IO,
     RHSeedanceVideoAdapter,
 )
+from .usage_ledger_utils import UsageRecord
 
 
 NODE_NAME = "DapaoRHVideoEnhanceNode"
@@ -133,18 +135,28 @@ class DapaoRHVideoEnhanceNode(DapaoRHAllVideoSeedanceNode):
         return url
 
     def _run_stage(self, api_key, endpoint, payload, max_seconds, interval, timeout):
-        submit_response = self._post_json(
-            f"{self._current_api_urls()['base']}/{endpoint}",
-            api_key,
-            payload,
-            timeout,
-        )
+        usage = UsageRecord("runninghub", NODE_NAME, endpoint, "", self._current_api_channel())
+        try:
+            return self._run_stage_task(usage, api_key, endpoint, payload, max_seconds, interval, timeout)
+        except Exception as e:
+            usage.failed(e)
+            raise
+
+    def _run_stage_task(self, usage, api_key, endpoint, payload, max_seconds, interval, timeout):
+        with span("submit"):
+            submit_response = self._post_json(
+                f"{self._current_api_urls()['base']}/{endpoint}",
+                api_key,
+                payload,
+                timeout,
+            )
         if submit_response.get("errorCode") or submit_response.get("errorMessage"):
             raise RuntimeError(f"RunningHub 提交失败：[{submit_response.get('errorCode') or ''}] {submit_response.get('errorMessage') or submit_response}")
 
         task_id = self._extract_task_id(submit_response)
         if not task_id:
             raise RuntimeError(f"提交成功但响应中没有 taskId：{json.dumps(submit_response, ensure_ascii=False)[:1000]}")
+        usage.submitted(task_id)
 
         submit_data = self._payload_data(submit_response)
         if submit_data.get("status") == "SUCCESS" and submit_data.get("results"):
@@ -156,6 +168,7 @@ class DapaoRHVideoEnhanceNode(DapaoRHAllVideoSeedanceNode):
         video_url = self._pick_video_url(result_urls)
         if not video_url:
             raise RuntimeError(f"任务完成但没有返回视频 URL：{json.dumps(final_response, ensure_ascii=False)[:1000]}")
+        usage.succeeded(*self._extract_usage(final_response))
 
         return {
             "task_id": task_id,
@@ -165,6 +178,7 @@ class DapaoRHVideoEnhanceNode(DapaoRHAllVideoSeedanceNode):
             "payload": payload,
         }
 
+    @timed_execution
     def enhance_video(self, **kwargs):
         api_channel = kwargs.get("🌐 API渠道", "国内版")
         self._activate_api_channel(api_channel)
@@ -226,6 +240,7 @@ class DapaoRHVideoEnhanceNode(DapaoRHAllVideoSeedanceNode):
                 f"🆔 任务ID：{', '.join(task_ids)}",
                 f"🔗 视频URL：{current_url}",
                 f"⏱️ 总耗时：{elapsed_time:.2f} 秒",
+                execution_summary(),
                 f"🎲 随机种：{int(kwargs.get('🎲 随机种', 0))}（仅用于 ComfyUI 缓存控制）",
             ]
             if cost is not None:
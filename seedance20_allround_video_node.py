@@ -7,19 +7,28 @@ request parameter and is not encoded into the model name.
 import asyncio
 import io
 import json
-import os
 import sys
-import tempfile
 import time
 import traceback
 import wave
 
 import numpy as np
-import requests
 from PIL import Image
 
+from .async_http_utils import (
+    CONNECTION_ERRORS,
+    StreamingFilePayload,
+    iter_file_chunks,
+    request as http_request,
+    request_with_retry,
+)
+from .download_cache_utils import save_url_to
+from .metrics_utils import QUEUE_STATUSES, TaskWaitTimer, execution_summary, span, timed_execution
 from .network_error_utils import friendly_443_status, friendly_network_error
+from .relay_policy_utils import ALL_RETRY_CLASSES, RETRY_POLICY, RETRY_RATE_LIMIT
 from .image_input_utils import IMAGE_429_HINT, tensor_to_png_bytes
+from .usage_ledger_utils import UsageRecord
+from .video_source_utils import VideoSource, open_video_source
 
 try:
     import comfy.model_management
@@ -188,33 +197,6 @@ def _audio_to_wav_bytes(audio_input):
     return buffer.getvalue()
 
 
-def _video_to_bytes(video_input):
-    if isinstance(video_input, str) and os.path.isfile(video_input):
-        with open(video_input, "rb") as handle:
-            return handle.read()
-    if isinstance(video_input, dict):
-        for key in ("file_path", "path", "filename"):
-            path = video_input.get(key)
-            if isinstance(path, str) and os.path.isfile(path):
-                with open(path, "rb") as handle:
-                    return handle.read()
-    if not hasattr(video_input, "save_to"):
-        raise ValueError("无法读取 VIDEO 输入，请使用可保存的 ComfyUI VIDEO。")
-    handle = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-    handle.close()
-    try:
-        saved = video_input.save_to(handle.name)
-        if saved is False or not os.path.isfile(handle.name):
-            raise ValueError("VIDEO 输入保存失败。")
-        with open(handle.name, "rb") as file_handle:
-            return file_handle.read()
-    finally:
-        try:
-            os.remove(handle.name)
-        except OSError:
-            pass
-
-
 def _validate_public_url(value, label):
     value = str(value or "").strip()
     if not value.startswith(("http://", "https://")):
@@ -311,6 +293,13 @@ def _task_state(result):
     return (statuses[0] if statuses else ""), progress, message
 
 
+def _raw_status(result):
+    # _task_state 把排队与生成中合并为 processing，耗时统计需要区分两者
+    statuses = [str(layer["status"]).strip() for layer in _response_layers(result) if layer.get("status") is not None]
+    queued = [status for status in statuses if status.upper() in QUEUE_STATUSES]
+    return queued[0] if queued else (statuses[0] if statuses else "")
+
+
 def _extract_video_url(result):
     seen = set()
 
@@ -363,13 +352,8 @@ class DapaoVideoAdapter:
         # 远端视频已经编码完成，这些参数只需兼容接收，不应改变下载内容。
         if not self.video_url:
             return False
-        response = requests.get(self.video_url, stream=True, timeout=300, allow_redirects=True)
-        response.raise_for_status()
-        with open(output_path, "wb") as handle:
-            for chunk in response.iter_content(chunk_size=1024 * 1024):
-                if chunk:
-                    handle.write(chunk)
-        return True
+        # 同一视频再次保存时从下载缓存硬链接或复制，不再重新下载
+        return save_url_to(self.video_url, output_path)
 
 
 class DapaoSeedanceRelayClient:
@@ -385,11 +369,13 @@ class DapaoSeedanceRelayClient:
             "User-Agent": "ComfyUI-dapaoAPI/Seedance20Allround",
         }
 
-    def _request_json(self, method, path, **kwargs):
+    async def _request_json(self, method, path, **kwargs):
         url = f"{self.base_url}/{path.lstrip('/')}"
+        # 查询可以放心重试；视频提交只在 429（上游未受理）时重试，以免重复扣费
+        retry = RETRY_POLICY.start(retry_on=(RETRY_RATE_LIMIT,) if method.upper() == "POST" else ALL_RETRY_CLASSES)
         try:
-            response = requests.request(method, url, headers=self._headers(), timeout=self.timeout, **kwargs)
-        except (requests.ConnectionError, requests.Timeout) as error:
+            response = await request_with_retry(method, url, retry, headers=self._headers(), timeout=self.timeout, **kwargs)
+        except CONNECTION_ERRORS as error:
             if method.upper() == "POST":
                 raise RuntimeError(f"{friendly_network_error(error, '提交视频任务')} 视频提交不会自动重试，以免重复扣费。") from error
             raise RuntimeError(friendly_network_error(error, '查询视频任务')) from error
@@ -402,7 +388,7 @@ class DapaoSeedanceRelayClient:
         except json.JSONDecodeError as error:
             raise RuntimeError(f"中转站返回内容不是 JSON：{response.text[:500]}") from error
 
-    def upload_file(self, content, filename, mime_type, model_name):
+    async def upload_file(self, content, filename, mime_type, model_name):
         """Upload a reference and require a public URL for Seedance to fetch.
 
         Seedance's upstream worker runs outside the user's ComfyUI machine, so
@@ -410,15 +396,24 @@ class DapaoSeedanceRelayClient:
         deployments using the asset upload route return a public URL in the
         response envelope; deployments returning only a
         private file id are rejected with an actionable message.
+        ``content`` is bytes or an open ``VideoSource``, which is streamed.
         """
-        if not isinstance(content, (bytes, bytearray)) or not content:
+        if isinstance(content, VideoSource):
+            size = content.size
+            body = StreamingFilePayload(iter_file_chunks(content.open()), size=size, content_type=mime_type)
+        elif isinstance(content, (bytes, bytearray)):
+            size = len(content)
+            body = bytes(content)
+        else:
+            size = 0
+        if not size:
             raise ValueError(f"{filename}内容为空，无法上传。")
         media_limit = {
             "image": (MAX_IMAGE_BYTES, "图片"),
             "video": (MAX_VIDEO_BYTES, "视频"),
             "audio": (MAX_AUDIO_BYTES, "音频"),
         }.get(str(mime_type).split("/", 1)[0])
-        if media_limit and len(content) > media_limit[0]:
+        if media_limit and size > media_limit[0]:
             raise ValueError(f"{media_limit[1]}素材超过上传上限 {media_limit[0] // 1024 // 1024}MB，请压缩后重试。")
         model_name = str(model_name or "").strip()
         if not model_name:
@@ -432,15 +427,17 @@ class DapaoSeedanceRelayClient:
             "User-Agent": "ComfyUI-dapaoAPI/Seedance20Allround",
         }
         try:
-            response = requests.post(
-                url,
-                headers=headers,
-                params={"model": model_name},
-                files={"file": (filename, bytes(content), mime_type)},
-                data={"model": model_name, "purpose": "user_data"},
-                timeout=max(self.timeout, 120),
-            )
-        except (requests.ConnectionError, requests.Timeout) as error:
+            with span("upload", bytes=size):
+                response = await http_request(
+                    "POST",
+                    url,
+                    headers=headers,
+                    params={"model": model_name},
+                    files={"file": (filename, body, mime_type)},
+                    data={"model": model_name, "purpose": "user_data"},
+                    timeout=max(self.timeout, 120),
+                )
+        except CONNECTION_ERRORS as error:
             raise RuntimeError(friendly_network_error(error, "上传视频参考素材")) from error
         if response.status_code >= 400:
             if response.status_code == 443:
@@ -462,30 +459,36 @@ class DapaoSeedanceRelayClient:
             )
         return public_url
 
-    def submit(self, payload):
+    async def submit(self, payload):
         # dapaoAI 视频接口使用单数 video 路由；上游土豆文档的 videos 路由不能直接照搬。
-        return self._request_json("POST", "/v1/video/generations", json=payload)
+        with span("submit"):
+            return await self._request_json("POST", "/v1/video/generations", json=payload)
 
-    def poll(self, task_id, max_seconds, interval):
+    async def poll(self, task_id, max_seconds, interval):
         started = time.monotonic()
         progress_bar = comfy.utils.ProgressBar(100) if comfy is not None else None
-        while time.monotonic() - started < max_seconds:
-            if comfy is not None:
-                comfy.model_management.throw_exception_if_processing_interrupted()
-            result = self._request_json("GET", f"/v1/video/generations/{task_id}")
-            status, progress, message = _task_state(result)
-            if status == "completed":
+        wait_timer = TaskWaitTimer(task_id=task_id)
+        try:
+            while time.monotonic() - started < max_seconds:
+                if comfy is not None:
+                    comfy.model_management.throw_exception_if_processing_interrupted()
+                result = await self._request_json("GET", f"/v1/video/generations/{task_id}")
+                status, progress, message = _task_state(result)
+                wait_timer.observe(_raw_status(result))
+                if status == "completed":
+                    if progress_bar:
+                        progress_bar.update_absolute(100)
+                    return result
+                if status == "failed":
+                    raise RuntimeError(f"视频任务失败：{message or json.dumps(_sanitized_result(result), ensure_ascii=False)[:1000]}")
                 if progress_bar:
-                    progress_bar.update_absolute(100)
-                return result
-            if status == "failed":
-                raise RuntimeError(f"视频任务失败：{message or json.dumps(_sanitized_result(result), ensure_ascii=False)[:1000]}")
-            if progress_bar:
-                elapsed = time.monotonic() - started
-                current = min(95, int(progress)) if progress is not None else min(95, int(elapsed / max_seconds * 95))
-                progress_bar.update_absolute(current)
-            time.sleep(interval)
-        raise RuntimeError(f"视频任务超过 {max_seconds} 秒仍未完成。")
+                    elapsed = time.monotonic() - started
+                    current = min(95, int(progress)) if progress is not None else min(95, int(elapsed / max_seconds * 95))
+                    progress_bar.update_absolute(current)
+                await asyncio.sleep(interval)
+            raise RuntimeError(f"视频任务超过 {max_seconds} 秒仍未完成。")
+        finally:
+            wait_timer.finish()
 
 
 class DapaoSeedance20AllroundVideoNode:
@@ -570,7 +573,9 @@ class DapaoSeedance20AllroundVideoNode:
             image = kwargs.get(f"🖼️ 参考图{index}")
             if image is None:
                 continue
-            for content in _tensor_to_png_bytes(image):
+            with span("encode"):
+                contents = _tensor_to_png_bytes(image)
+            for content in contents:
                 if len(image_parts) >= limit:
                     return image_parts
                 image_parts.append((content, f"seedance_reference_{index}_{len(image_parts) + 1}.png", "image/png"))
@@ -578,14 +583,23 @@ class DapaoSeedance20AllroundVideoNode:
 
     @staticmethod
     def _collect_video_parts(kwargs):
+        # 返回打开的 VideoSource，上传时按块读取；调用方负责关闭
         parts = []
-        for index in range(1, MAX_VIDEO_REFERENCES + 1):
-            video = kwargs.get(f"🎞️ 参考视频{index}")
-            if video is not None:
-                content = _video_to_bytes(video)
-                if len(content) > MAX_VIDEO_BYTES:
+        try:
+            for index in range(1, MAX_VIDEO_REFERENCES + 1):
+                video = kwargs.get(f"🎞️ 参考视频{index}")
+                if video is None:
+                    continue
+                source = open_video_source(video)
+                if source is None:
+                    raise ValueError("无法读取 VIDEO 输入，请使用可保存的 ComfyUI VIDEO。")
+                parts.append((source, f"seedance_reference_video_{index}.mp4", "video/mp4"))
+                if source.size > MAX_VIDEO_BYTES:
                     raise ValueError(f"参考视频{index}超过本节点 {MAX_VIDEO_BYTES // 1024 // 1024}MB 的安全上限，请先压缩。")
-                parts.append((content, f"seedance_reference_video_{index}.mp4", "video/mp4"))
+        except Exception:
+            for source, _, _ in parts:
+                source.close()
+            raise
         return parts
 
     @staticmethod
@@ -594,7 +608,8 @@ class DapaoSeedance20AllroundVideoNode:
         for index in range(1, MAX_AUDIO_REFERENCES + 1):
             audio = kwargs.get(f"🎵 参考音频{index}")
             if audio is not None:
-                content = _audio_to_wav_bytes(audio)
+                with span("encode"):
+                    content = _audio_to_wav_bytes(audio)
                 if len(content) > MAX_AUDIO_BYTES:
                     raise ValueError(f"参考音频{index}超过本节点 {MAX_AUDIO_BYTES // 1024 // 1024}MB 的安全上限，请先压缩。")
                 parts.append((content, f"seedance_reference_audio_{index}.wav", "audio/wav"))
@@ -605,10 +620,11 @@ class DapaoSeedance20AllroundVideoNode:
         first = kwargs.get("🎬 首帧图")
         last = kwargs.get("🏁 尾帧图")
         result = []
-        if first is not None:
-            result.extend((content, "seedance_first_frame.png", "image/png") for content in _tensor_to_png_bytes(first))
-        if last is not None:
-            result.extend((content, "seedance_last_frame.png", "image/png") for content in _tensor_to_png_bytes(last))
+        with span("encode"):
+            if first is not None:
+                result.extend((content, "seedance_first_frame.png", "image/png") for content in _tensor_to_png_bytes(first))
+            if last is not None:
+                result.extend((content, "seedance_last_frame.png", "image/png") for content in _tensor_to_png_bytes(last))
         return result[:MAX_IMAGE_REFERENCES]
 
     @staticmethod
@@ -649,10 +665,8 @@ class DapaoSeedance20AllroundVideoNode:
             return round(long_side * 9 / 16), long_side
         return long_side, round(long_side * 9 / 16)
 
+    @timed_execution
     async def generate(self, **kwargs):
-        return await asyncio.to_thread(self._generate_sync, **kwargs)
-
-    def _generate_sync(self, **kwargs):
         api_key = (kwargs.get("🔑 API密钥") or "").strip()
         model_id = str(kwargs.get("🤖 模型") or "").strip()
         mode = kwargs.get("🎛️ 生成模式", "文生视频")
@@ -672,7 +686,9 @@ class DapaoSeedance20AllroundVideoNode:
         final = {}
         request_model = ""
         payload = {}
+        video_parts = []
         stage = "validate"
+        usage = UsageRecord("dapaoai", NODE_NAME, model_id, resolution_label)
 
         try:
             if not api_key:
@@ -700,20 +716,19 @@ class DapaoSeedance20AllroundVideoNode:
             overrides = self._public_url_overrides(kwargs.get("🌐 公网素材URL(JSON)", "{}"))
 
             image_parts = []
-            video_parts = []
             audio_parts = []
             if mode == "图生视频":
-                image_parts = self._collect_image_parts(kwargs)
+                image_parts = await asyncio.to_thread(self._collect_image_parts, kwargs)
                 if not image_parts and not overrides["images"]:
                     raise ValueError("图生视频至少需要接入一张参考图。")
             elif mode == "首尾帧生视频":
-                image_parts = self._frame_parts(kwargs)
+                image_parts = await asyncio.to_thread(self._frame_parts, kwargs)
                 if not image_parts and not overrides["images"]:
                     raise ValueError("首尾帧生视频至少需要接入首帧图。")
             elif mode == "多模态参考":
-                image_parts = self._collect_image_parts(kwargs)
-                video_parts = self._collect_video_parts(kwargs)
-                audio_parts = self._collect_audio_parts(kwargs)
+                image_parts = await asyncio.to_thread(self._collect_image_parts, kwargs)
+                video_parts = await asyncio.to_thread(self._collect_video_parts, kwargs)
+                audio_parts = await asyncio.to_thread(self._collect_audio_parts, kwargs)
                 if not image_parts and not video_parts and not overrides["images"] and not overrides["videos"]:
                     raise ValueError("多模态参考至少需要一张参考图或一个参考视频。")
                 if audio_parts and not image_parts and not video_parts and not overrides["images"] and not overrides["videos"]:
@@ -727,11 +742,11 @@ class DapaoSeedance20AllroundVideoNode:
             video_uris = list(overrides["videos"])
             audio_uris = list(overrides["audios"])
             if not image_uris and image_parts:
-                image_uris = [client.upload_file(content, filename, mime_type, request_model) for content, filename, mime_type in image_parts]
+                image_uris = [await client.upload_file(content, filename, mime_type, request_model) for content, filename, mime_type in image_parts]
             if not video_uris and video_parts:
-                video_uris = [client.upload_file(content, filename, mime_type, request_model) for content, filename, mime_type in video_parts]
+                video_uris = [await client.upload_file(content, filename, mime_type, request_model) for content, filename, mime_type in video_parts]
             if not audio_uris and audio_parts:
-                audio_uris = [client.upload_file(content, filename, mime_type, request_model) for content, filename, mime_type in audio_parts]
+                audio_uris = [await client.upload_file(content, filename, mime_type, request_model) for content, filename, mime_type in audio_parts]
             if mode == "图生视频" and not image_uris:
                 raise ValueError("图生视频至少需要一张公网参考图。")
             if mode == "首尾帧生视频" and not image_uris:
@@ -780,14 +795,16 @@ class DapaoSeedance20AllroundVideoNode:
             )
             started = time.time()
             stage = "video_submit"
-            submitted = client.submit(payload)
+            submitted = await client.submit(payload)
             task_identifier = _task_id(submitted)
             if not task_identifier:
                 raise RuntimeError(f"提交成功但没有返回任务ID：{json.dumps(_sanitized_result(submitted), ensure_ascii=False)[:1200]}")
-            final = client.poll(task_identifier, max_seconds, interval)
+            usage.submitted(task_identifier)
+            final = await client.poll(task_identifier, max_seconds, interval)
             video_url = _extract_video_url(final)
             if not video_url:
                 raise RuntimeError(f"任务完成但没有找到视频URL：{json.dumps(_sanitized_result(final), ensure_ascii=False)[:1600]}")
+            usage.succeeded(duration * 0.48)
             if resolution_label == "1080P":
                 parameter_profile = "SD2（1080P标准版）"
             elif face_mode:
@@ -812,12 +829,14 @@ class DapaoSeedance20AllroundVideoNode:
                 f"🎵 参考音频：{len(audio_uris)} 个\n"
                 f"🆔 任务ID：{task_identifier}\n"
                 f"🔗 视频URL：{video_url}\n"
-                f"⏱️ 耗时：{time.time() - started:.2f} 秒\n\n"
+                f"⏱️ 耗时：{time.time() - started:.2f} 秒\n"
+                f"{execution_summary()}\n\n"
                 + json.dumps({"submit": _sanitized_result(submitted), "final": _sanitized_result(final)}, ensure_ascii=False, indent=2)
             )
             width, height = self._expected_dimensions(resolution_label, aspect_ratio)
             return DapaoVideoAdapter(video_url, width, height), task_identifier, info, video_url
         except Exception as error:
+            usage.failed(error)
             message = f"❌ Seedance2.0 全能视频生成失败：{error}"
             if request_model:
                 message += f"\n（节点实际发送 model={request_model}）"
@@ -835,6 +854,9 @@ class DapaoSeedance20AllroundVideoNode:
                 indent=2,
             )
             raise RuntimeError(f"{message}\n\n{details}") from error
+        finally:
+            for source, _, _ in video_parts:
+                source.close()
 
 
 NODE_CLASS_MAPPINGS = {NODE_NAME: DapaoSeedance20AllroundVideoNode}
@@ -20,8 +20,11 @@ import numpy as np
 import requests
 from PIL import Image
 
+from .async_http_utils import CONNECTION_ERRORS, request as http_request
 from .network_error_utils import friendly_443_status, friendly_network_error
 from .image_input_utils import IMAGE_429_HINT
+from .stream_body_utils import InlineMedia, StreamingJSONBody
+from .video_source_utils import open_video_source
 
 
 API_BASE_URL = "https://api.dapaoai.com"
@@ -114,23 +117,14 @@ def _temporary_video_path(video_input, index):
             return handle.name, True
         if os.path.isfile(video_input):
             return video_input, False
-    if isinstance(video_input, dict):
-        for key in ("file_path", "path", "filename"):
-            path = video_input.get(key)
-            if isinstance(path, str) and os.path.isfile(path):
-                return path, False
-    if not hasattr(video_input, "save_to"):
+    # 已有文件路径直接使用；只有需要重新编码的 VIDEO 才写临时文件
+    try:
+        source = open_video_source(video_input, need_path=True)
+    except ValueError as error:
+        raise ValueError(f"参考视频{index}保存失败。") from error
+    if source is None:
         raise ValueError(f"无法读取参考视频{index}，请连接ComfyUI原生VIDEO输出。")
-    handle = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-    handle.close()
-    saved = video_input.save_to(handle.name)
-    if saved is False or not os.path.isfile(handle.name) or os.path.getsize(handle.name) <= 0:
-        try:
-            os.remove(handle.name)
-        except OSError:
-            pass
-        raise ValueError(f"参考视频{index}保存失败。")
-    return handle.name, True
+    return source.path, source.temporary
 
 
 def _sample_video(video_input, index, sample_count):
@@ -202,7 +196,7 @@ def _audio_to_wav_base64(channels, sample_rate):
         output.setsampwidth(2)
         output.setframerate(int(sample_rate))
         output.writeframes(pcm.tobytes())
-    return base64.b64encode(buffer.getvalue()).decode("ascii")
+    return InlineMedia(buffer.getvalue(), "audio/wav", data_uri=False)
 
 
 def _audio_spectrogram_uri(channels, sample_rate):
@@ -368,11 +362,11 @@ class SeedanceDirectorLLMClient:
         self.api_key = api_key
         self.timeout = timeout
 
-    def chat(self, payload):
+    async def chat(self, payload):
         headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json", "User-Agent": "ComfyUI-dapaoAPI/Seedance2Director"}
         try:
-            response = requests.post(CHAT_ENDPOINT, headers=headers, json=payload, timeout=self.timeout)
-        except (requests.ConnectionError, requests.Timeout) as error:
+            response = await http_request("POST", CHAT_ENDPOINT, headers=headers, data=StreamingJSONBody(payload), timeout=self.timeout)
+        except CONNECTION_ERRORS as error:
             raise RuntimeError(f"{friendly_network_error(error, '提交LLM请求')} LLM请求不会自动重试，以免重复扣费。") from error
         if response.status_code >= 400:
             if response.status_code == 443:
@@ -502,9 +496,6 @@ class DapaoSeedance20DirectorNode:
         return content
 
     async def generate_prompt(self, **kwargs):
-        return await asyncio.to_thread(self._generate_prompt_sync, **kwargs)
-
-    def _generate_prompt_sync(self, **kwargs):
         result = {}
         resolved_mode = ""
         try:
@@ -521,8 +512,9 @@ class DapaoSeedance20DirectorNode:
                 raise ValueError("Seedance任务或创作类型不受支持。")
             if not brief:
                 raise ValueError("原始视频需求不能为空。")
-            images = self._collect_images(kwargs)
-            videos, audios = self._collect_media(kwargs)
+            # 图片编码与音视频采样是 CPU/磁盘密集步骤，交给线程执行以免阻塞事件循环。
+            images = await asyncio.to_thread(self._collect_images, kwargs)
+            videos, audios = await asyncio.to_thread(self._collect_media, kwargs)
             if len(images) + len(videos) + len(audios) > MAX_FILES:
                 raise ValueError(f"图片、视频、音频合计最多{MAX_FILES}个文件。")
             state = (kwargs.get("📦 上一个项目状态JSON") or "{}").strip() or "{}"
@@ -538,7 +530,7 @@ class DapaoSeedance20DirectorNode:
             messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": user_content}]
             payload = {"model": model, "messages": messages, "temperature": float(kwargs.get("🌡️ 温度", .4)), "max_tokens": int(kwargs.get("📝 最大输出令牌", 4096)), "top_p": float(kwargs.get("🎲 Top_P", 1.0)), "stream": False}
             started = time.time()
-            result = SeedanceDirectorLLMClient(api_key, int(kwargs.get("⌛ 请求超时", 300))).chat(payload)
+            result = await SeedanceDirectorLLMClient(api_key, int(kwargs.get("⌛ 请求超时", 300))).chat(payload)
             raw = _extract_text(result)
             if not raw:
                 raise RuntimeError("LLM返回内容为空。")
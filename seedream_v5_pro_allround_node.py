@@ -11,15 +11,18 @@ import json
 import sys
 import time
 import traceback
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import numpy as np
-import requests
 import torch
 from PIL import Image
 
+from .async_http_utils import CONNECTION_ERRORS, NETWORK_ERRORS, request as http_request, request_with_retry
+from .download_cache_utils import download_cache
 from .network_error_utils import friendly_443_status, friendly_network_error
+from .relay_policy_utils import ALL_RETRY_CLASSES, RETRY_POLICY, RETRY_RATE_LIMIT
 from .image_input_utils import IMAGE_429_HINT, tensor_to_pil_images
+from .metrics_utils import QUEUE_STATUSES, TaskWaitTimer, execution_summary, span, timed_execution
+from .usage_ledger_utils import UsageRecord
 
 try:
     import comfy.model_management
@@ -215,6 +218,13 @@ def _task_state(result):
     return (statuses[0] if statuses else ""), progress, message
 
 
+def _raw_status(result):
+    # 保留上游原始状态，排队时间与生成时间才能分开统计
+    statuses = [str(layer["status"]).strip() for layer in _response_layers(result) if layer.get("status") is not None]
+    queued = [status for status in statuses if status.upper() in QUEUE_STATUSES]
+    return queued[0] if queued else (statuses[0] if statuses else "")
+
+
 def _extract_image_records(result):
     records = []
     seen = set()
@@ -283,75 +293,86 @@ class DapaoSeedreamV5ProRelayClient:
             "User-Agent": "ComfyUI-dapaoAPI/SeedreamV5ProAllround",
         }
 
-    def _request_json(self, method, path, **kwargs):
+    async def _request_json(self, method, path, **kwargs):
         url = f"{self.base_url}/{path.lstrip('/')}"
-        attempts = 3 if method.upper() == "GET" else 1
-        for attempt in range(attempts):
-            try:
-                response = requests.request(
-                    method,
-                    url,
-                    headers=self._headers(),
-                    timeout=self.timeout,
-                    **kwargs,
-                )
-            except (requests.ConnectionError, requests.Timeout) as error:
-                if attempt < attempts - 1:
-                    time.sleep(attempt + 1)
-                    continue
-                if method.upper() == "GET":
-                    raise RuntimeError(f"{friendly_network_error(error, '查询任务')} 已尝试{attempts}次。") from error
-                raise RuntimeError(f"{friendly_network_error(error, '提交图像任务')} 付费提交不会自动重试，以免重复扣费。") from error
-            if response.status_code >= 400:
-                if response.status_code == 443:
-                    raise RuntimeError(friendly_443_status())
-                raise DapaoSeedreamV5ProAPIError(response.status_code, _response_error(response))
-            try:
-                return response.json()
-            except json.JSONDecodeError as error:
-                raise RuntimeError(f"中转站返回内容不是 JSON：{response.text[:600]}") from error
-        raise RuntimeError("中转站请求失败。")
+        is_query = method.upper() == "GET"
+        # 查询可以放心重试；付费提交只在 429（上游未受理）时重试，以免重复扣费
+        retry = RETRY_POLICY.start(retry_on=ALL_RETRY_CLASSES if is_query else (RETRY_RATE_LIMIT,))
+        try:
+            response = await request_with_retry(
+                method,
+                url,
+                retry,
+                headers=self._headers(),
+                timeout=self.timeout,
+                **kwargs,
+            )
+        except CONNECTION_ERRORS as error:
+            if is_query:
+                raise RuntimeError(f"{friendly_network_error(error, '查询任务')} 已尝试{retry.attempts}次。") from error
+            raise RuntimeError(f"{friendly_network_error(error, '提交图像任务')} 付费提交不会自动重试，以免重复扣费。") from error
+        if response.status_code >= 400:
+            if response.status_code == 443:
+                raise RuntimeError(friendly_443_status())
+            raise DapaoSeedreamV5ProAPIError(response.status_code, _response_error(response))
+        try:
+            return response.json()
+        except json.JSONDecodeError as error:
+            raise RuntimeError(f"中转站返回内容不是 JSON：{response.text[:600]}") from error
 
-    def generate(self, payload):
-        return self._request_json("POST", "/v1/images/generations", json=payload)
+    async def generate(self, payload):
+        with span("submit"):
+            return await self._request_json("POST", "/v1/images/generations", json=payload)
 
-    def poll(self, task_identifier, max_seconds, interval):
+    async def poll(self, task_identifier, max_seconds, interval):
         started = time.monotonic()
         progress_bar = comfy.utils.ProgressBar(100) if comfy is not None else None
         task_path = f"/v1/images/tasks/{task_identifier}"
-        while time.monotonic() - started < max_seconds:
-            if comfy is not None:
-                comfy.model_management.throw_exception_if_processing_interrupted()
-            result = self._request_json("GET", task_path)
-            status, progress, message = _task_state(result)
-            if status == "succeeded":
+        wait_timer = TaskWaitTimer(task_id=task_identifier)
+        try:
+            while time.monotonic() - started < max_seconds:
+                if comfy is not None:
+                    comfy.model_management.throw_exception_if_processing_interrupted()
+                result = await self._request_json("GET", task_path)
+                status, progress, message = _task_state(result)
+                wait_timer.observe(_raw_status(result))
+                if status == "succeeded":
+                    if progress_bar:
+                        progress_bar.update_absolute(100)
+                    return result
+                if status == "failed":
+                    raise RuntimeError(f"任务失败：{message or json.dumps(_sanitized_result(result), ensure_ascii=False)[:1200]}")
                 if progress_bar:
-                    progress_bar.update_absolute(100)
-                return result
-            if status == "failed":
-                raise RuntimeError(f"任务失败：{message or json.dumps(_sanitized_result(result), ensure_ascii=False)[:1200]}")
-            if progress_bar:
-                elapsed = time.monotonic() - started
-                current = min(95, int(progress)) if progress is not None else min(95, int(elapsed / max_seconds * 95))
-                progress_bar.update_absolute(current)
-            time.sleep(interval)
-        raise RuntimeError(f"任务超过{max_seconds}秒仍未完成。")
-
-    def download(self, url):
+                    elapsed = time.monotonic() - started
+                    current = min(95, int(progress)) if progress is not None else min(95, int(elapsed / max_seconds * 95))
+                    progress_bar.update_absolute(current)
+                await asyncio.sleep(interval)
+            raise RuntimeError(f"任务超过{max_seconds}秒仍未完成。")
+        finally:
+            wait_timer.finish()
+
+    async def download(self, url):
+        # 同一结果链接（重新执行、多个下游节点）直接读取本地下载缓存
+        content = await asyncio.to_thread(download_cache.read_bytes, url)
+        if content is not None:
+            return content
         try:
-            response = requests.get(
-                url,
-                headers={"User-Agent": "Mozilla/5.0", "Accept": "image/*,*/*;q=0.8"},
-                timeout=max(self.timeout, 300),
-                allow_redirects=True,
-            )
+            with span("download"):
+                response = await http_request(
+                    "GET",
+                    url,
+                    headers={"User-Agent": "Mozilla/5.0", "Accept": "image/*,*/*;q=0.8"},
+                    timeout=max(self.timeout, 300),
+                    allow_redirects=True,
+                )
             response.raise_for_status()
-            return response.content
-        except requests.RequestException as error:
+        except NETWORK_ERRORS as error:
             raise RuntimeError(friendly_network_error(error, "下载生成结果")) from error
+        await asyncio.to_thread(download_cache.store_bytes, url, response.content, response.headers)
+        return response.content
 
 
-def _record_to_image(client, record):
+async def _record_to_image(client, record):
     value = record["value"]
     if record["kind"] == "base64":
         encoded = value.split(",", 1)[1] if value.startswith("data:") and "," in value else value
@@ -359,12 +380,18 @@ def _record_to_image(client, record):
     elif value.startswith("data:image/"):
         content = base64.b64decode(value.split(",", 1)[1])
     else:
-        content = client.download(value)
-    return Image.open(io.BytesIO(content)).convert("RGBA")
+        content = await client.download(value)
+    with span("decode", bytes=len(content)):
+        return await asyncio.to_thread(lambda: Image.open(io.BytesIO(content)).convert("RGBA"))
 
 
-def _images_and_masks(client, records):
-    pil_images = [_record_to_image(client, record) for record in records]
+async def _images_and_masks(client, records):
+    pil_images = list(await asyncio.gather(*(_record_to_image(client, record) for record in records)))
+    with span("decode", images=len(pil_images)):
+        return await asyncio.to_thread(_stack_images_and_masks, pil_images)
+
+
+def _stack_images_and_masks(pil_images):
     target_size = pil_images[0].size
     normalized = []
     for image in pil_images:
@@ -473,42 +500,45 @@ class DapaoSeedreamV5ProAllroundNode:
         return items
 
     @staticmethod
-    def _submit_one(api_key, timeout, payload, max_poll_seconds, poll_interval):
+    async def _submit_one(api_key, timeout, payload, max_poll_seconds, poll_interval):
         client = DapaoSeedreamV5ProRelayClient(api_key, timeout)
-        submitted = client.generate(payload)
-        final = submitted
-        records = _extract_image_records(final)
-        task_identifier = _task_id(submitted)
-        state, _, _ = _task_state(submitted)
-        if not records and task_identifier and state in {"", "processing"}:
-            final = client.poll(task_identifier, max_poll_seconds, poll_interval)
+        usage = UsageRecord("dapaoai", NODE_NAME, MODEL_ID, payload.get("size", ""))
+        try:
+            submitted = await client.generate(payload)
+            final = submitted
             records = _extract_image_records(final)
-        if not records:
-            raise RuntimeError(
-                "任务完成但没有找到图片："
-                + json.dumps(_sanitized_result(final), ensure_ascii=False)[:1600]
-            )
+            task_identifier = _task_id(submitted)
+            usage.submitted(task_identifier)
+            state, _, _ = _task_state(submitted)
+            if not records and task_identifier and state in {"", "processing"}:
+                final = await client.poll(task_identifier, max_poll_seconds, poll_interval)
+                records = _extract_image_records(final)
+            if not records:
+                raise RuntimeError(
+                    "任务完成但没有找到图片："
+                    + json.dumps(_sanitized_result(final), ensure_ascii=False)[:1600]
+                )
+        except Exception as error:
+            usage.failed(error)
+            raise
+        usage.succeeded()
         return submitted, final, records
 
     @classmethod
-    def _submit_many(cls, api_key, timeout, payload, count, concurrent, max_poll_seconds, poll_interval):
+    async def _submit_many(cls, api_key, timeout, payload, count, concurrent, max_poll_seconds, poll_interval):
         arguments = (api_key, timeout, payload, max_poll_seconds, poll_interval)
         if count == 1 or not concurrent:
-            return [cls._submit_one(*arguments) for _ in range(count)]
-        results = [None] * count
-        with ThreadPoolExecutor(
-            max_workers=min(count, MAX_CONCURRENT_REQUESTS),
-            thread_name_prefix="dapao-seedream-v5-pro",
-        ) as executor:
-            futures = {executor.submit(cls._submit_one, *arguments): index for index in range(count)}
-            for future in as_completed(futures):
-                results[futures[future]] = future.result()
-        return results
+            return [await cls._submit_one(*arguments) for _ in range(count)]
+        limit = asyncio.Semaphore(min(count, MAX_CONCURRENT_REQUESTS))
 
-    async def generate(self, **kwargs):
-        return await asyncio.to_thread(self._generate_sync, **kwargs)
+        async def submit_one():
+            async with limit:
+                return await cls._submit_one(*arguments)
+
+        return list(await asyncio.gather(*(submit_one() for _ in range(count))))
 
-    def _generate_sync(self, **kwargs):
+    @timed_execution
+    async def generate(self, **kwargs):
         api_key = str(kwargs.get("🔑 API密钥") or "").strip()
         model_id = str(kwargs.get("🤖 模型") or MODEL_ID)
         prompt = str(kwargs.get("📝 提示词") or "").strip()
@@ -543,7 +573,8 @@ class DapaoSeedreamV5ProAllroundNode:
             if response_label not in RESPONSE_FORMATS:
                 raise ValueError(f"不支持的返回方式：{response_label}")
 
-            references = self._collect_reference_images(kwargs)
+            with span("encode"):
+                references = await asyncio.to_thread(self._collect_reference_images, kwargs)
             mode = "图生图" if references else "文生图"
             if not prompt:
                 raise ValueError("文生图或图生图模式下提示词不能为空。")
@@ -580,7 +611,7 @@ class DapaoSeedreamV5ProAllroundNode:
                 f"size={size}，count={count}，并发={concurrent and count > 1}，"
                 f"参考图={len(references)}张"
             )
-            responses = self._submit_many(
+            responses = await self._submit_many(
                 api_key,
                 timeout,
                 payload,
@@ -594,7 +625,7 @@ class DapaoSeedreamV5ProAllroundNode:
             all_records = []
             for _, _, records in responses:
                 all_records.extend(records)
-            images, masks = _images_and_masks(client, all_records)
+            images, masks = await _images_and_masks(client, all_records)
             urls = [
                 record["value"] for record in all_records
                 if record["kind"] == "url" and record["value"].startswith(("http://", "https://"))
@@ -614,6 +645,7 @@ class DapaoSeedreamV5ProAllroundNode:
                 f"⚡ 提交方式：{'并发' if concurrent and count > 1 else '单次/顺序'}\n"
                 f"💰 价格：待配置\n"
                 f"⏱️ 耗时：{elapsed:.2f}秒\n"
+                f"{execution_summary()}\n"
                 + "\n"
                 + json.dumps(
                     {
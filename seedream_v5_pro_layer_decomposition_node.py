@@ -4,18 +4,23 @@ import asyncio
 import base64
 import io
 import json
+import os
 import sys
 import time
 import traceback
 
 import numpy as np
-import requests
 import torch
 import torch.nn.functional as torch_functional
 from PIL import Image
 
+from .async_http_utils import CONNECTION_ERRORS, NETWORK_ERRORS, request as http_request, request_with_retry
+from .download_cache_utils import download_cache
 from .network_error_utils import friendly_443_status, friendly_network_error
+from .relay_policy_utils import ALL_RETRY_CLASSES, RETRY_POLICY, RETRY_RATE_LIMIT
 from .image_input_utils import IMAGE_429_HINT, resize_pil_for_input
+from .metrics_utils import QUEUE_STATUSES, TaskWaitTimer, execution_summary, span, timed_execution
+from .usage_ledger_utils import UsageRecord
 
 try:
     import comfy.model_management
@@ -33,6 +38,17 @@ SIZE_OPTIONS = ["自动", "1K", "1.5K", "2K"]
 SIZE_VALUES = {"自动": "auto", "1K": "1K", "1.5K": "1.5K", "2K": "2K"}
 OUTPUT_FORMATS = {"JPEG": "jpeg", "PNG": "png"}
 PROMPT_OPTIMIZATION = {"标准模式": "standard", "快速模式": "fast"}
+# 图层最多16个：下载并发受连接池限制，定位并发按 CPU 核数限制
+MAX_PARALLEL_LAYER_DOWNLOADS = 8
+MAX_PARALLEL_LAYER_PLACEMENTS = max(1, min(8, os.cpu_count() or 1))
+# PSD 自动定位：粗搜索图最长边、尺度采样数、坐标框先验的尺度范围、精修窗口余量（粗搜索像素）
+PSD_SEARCH_EDGE = 640.0
+PSD_COARSE_SCALES = 48
+PSD_PRIOR_SCALES = 16
+PSD_PRIOR_SPAN = 1.35
+PSD_REFINE_SCALES = 13
+PSD_WINDOW_MARGIN = 3
+PSD_MIN_SCORE = 0.25
 
 
 def _safe_print(message):
@@ -150,6 +166,12 @@ def _task_state(result):
     return (statuses[0] if statuses else ""), progress, message
 
 
+def _raw_status(result):
+    statuses = [str(layer["status"]).strip() for layer in _response_layers(result) if layer.get("status") is not None]
+    queued = [status for status in statuses if status.upper() in QUEUE_STATUSES]
+    return queued[0] if queued else (statuses[0] if statuses else "")
+
+
 def _value_record(metadata, value):
     if not isinstance(value, str) or not value:
         return None
@@ -251,72 +273,82 @@ class DapaoSeedreamLayerClient:
             "User-Agent": "ComfyUI-dapaoAPI/SeedreamV5ProLayerDecomposition",
         }
 
-    def _request_json(self, method, path, **kwargs):
+    async def _request_json(self, method, path, **kwargs):
         url = f"{self.base_url}/{path.lstrip('/')}"
-        attempts = 3 if method.upper() == "GET" else 1
-        for attempt in range(attempts):
-            try:
-                response = requests.request(
-                    method,
-                    url,
-                    headers=self._headers(),
-                    timeout=self.timeout,
-                    **kwargs,
-                )
-            except (requests.ConnectionError, requests.Timeout) as error:
-                if attempt < attempts - 1:
-                    time.sleep(attempt + 1)
-                    continue
-                if method.upper() == "GET":
-                    raise RuntimeError(f"{friendly_network_error(error, '查询任务')} 已尝试{attempts}次。") from error
-                raise RuntimeError(f"{friendly_network_error(error, '提交图层拆分任务')} 付费提交不会自动重试，以免重复扣费。") from error
-            if response.status_code >= 400:
-                if response.status_code == 443:
-                    raise RuntimeError(friendly_443_status())
-                raise DapaoSeedreamLayerAPIError(response.status_code, _response_error(response))
-            try:
-                return response.json()
-            except json.JSONDecodeError as error:
-                raise RuntimeError(f"中转站返回内容不是 JSON：{response.text[:600]}") from error
-        raise RuntimeError("中转站请求失败。")
+        is_query = method.upper() == "GET"
+        # 查询可以放心重试；付费提交只在 429（上游未受理）时重试，以免重复扣费
+        retry = RETRY_POLICY.start(retry_on=ALL_RETRY_CLASSES if is_query else (RETRY_RATE_LIMIT,))
+        try:
+            response = await request_with_retry(
+                method,
+                url,
+                retry,
+                headers=self._headers(),
+                timeout=self.timeout,
+                **kwargs,
+            )
+        except CONNECTION_ERRORS as error:
+            if is_query:
+                raise RuntimeError(f"{friendly_network_error(error, '查询任务')} 已尝试{retry.attempts}次。") from error
+            raise RuntimeError(f"{friendly_network_error(error, '提交图层拆分任务')} 付费提交不会自动重试，以免重复扣费。") from error
+        if response.status_code >= 400:
+            if response.status_code == 443:
+                raise RuntimeError(friendly_443_status())
+            raise DapaoSeedreamLayerAPIError(response.status_code, _response_error(response))
+        try:
+            return response.json()
+        except json.JSONDecodeError as error:
+            raise RuntimeError(f"中转站返回内容不是 JSON：{response.text[:600]}") from error
 
-    def generate(self, payload):
-        return self._request_json("POST", "/v1/images/generations", json=payload)
+    async def generate(self, payload):
+        with span("submit"):
+            return await self._request_json("POST", "/v1/images/generations", json=payload)
 
-    def poll(self, task_identifier, max_seconds, interval):
+    async def poll(self, task_identifier, max_seconds, interval):
         started = time.monotonic()
         progress_bar = comfy.utils.ProgressBar(100) if comfy is not None else None
-        while time.monotonic() - started < max_seconds:
-            if comfy is not None:
-                comfy.model_management.throw_exception_if_processing_interrupted()
-            result = self._request_json("GET", f"/v1/images/tasks/{task_identifier}")
-            status, progress, message = _task_state(result)
-            records = _extract_output_records(result)
-            if status == "succeeded" or records:
+        wait_timer = TaskWaitTimer(task_id=task_identifier)
+        try:
+            while time.monotonic() - started < max_seconds:
+                if comfy is not None:
+                    comfy.model_management.throw_exception_if_processing_interrupted()
+                result = await self._request_json("GET", f"/v1/images/tasks/{task_identifier}")
+                status, progress, message = _task_state(result)
+                wait_timer.observe(_raw_status(result))
+                records = _extract_output_records(result)
+                if status == "succeeded" or records:
+                    if progress_bar:
+                        progress_bar.update_absolute(100)
+                    return result
+                if status == "failed":
+                    raise RuntimeError(f"任务失败：{message or json.dumps(_sanitized_result(result), ensure_ascii=False)[:1200]}")
                 if progress_bar:
-                    progress_bar.update_absolute(100)
-                return result
-            if status == "failed":
-                raise RuntimeError(f"任务失败：{message or json.dumps(_sanitized_result(result), ensure_ascii=False)[:1200]}")
-            if progress_bar:
-                elapsed = time.monotonic() - started
-                current = min(95, int(progress)) if progress is not None else min(95, int(elapsed / max_seconds * 95))
-                progress_bar.update_absolute(current)
-            time.sleep(interval)
-        raise RuntimeError(f"图层拆分任务超过{max_seconds}秒仍未完成。")
-
-    def download(self, url):
+                    elapsed = time.monotonic() - started
+                    current = min(95, int(progress)) if progress is not None else min(95, int(elapsed / max_seconds * 95))
+                    progress_bar.update_absolute(current)
+                await asyncio.sleep(interval)
+            raise RuntimeError(f"图层拆分任务超过{max_seconds}秒仍未完成。")
+        finally:
+            wait_timer.finish()
+
+    async def download(self, url):
+        content = await asyncio.to_thread(download_cache.read_bytes, url)
+        if content is not None:
+            return content
         try:
-            response = requests.get(
-                url,
-                headers={"User-Agent": "Mozilla/5.0", "Accept": "image/*,*/*;q=0.8"},
-                timeout=max(self.timeout, 300),
-                allow_redirects=True,
-            )
+            with span("download"):
+                response = await http_request(
+                    "GET",
+                    url,
+                    headers={"User-Agent": "Mozilla/5.0", "Accept": "image/*,*/*;q=0.8"},
+                    timeout=max(self.timeout, 300),
+                    allow_redirects=True,
+                )
             response.raise_for_status()
-            return response.content
-        except requests.RequestException as error:
+        except NETWORK_ERRORS as error:
             raise RuntimeError(friendly_network_error(error, "下载图层拆分结果")) from error
+        await asyncio.to_thread(download_cache.store_bytes, url, response.content, response.headers)
+        return response.content
 
 
 def _tensor_to_png_data_uri(image_tensor):
@@ -350,7 +382,7 @@ def _tensor_to_rgb_image(image_tensor):
     return resize_pil_for_input(Image.fromarray(rgb, mode="RGB"))
 
 
-def _record_to_rgba(client, record):
+async def _record_to_rgba(client, record):
     value = record["value"]
     if record["kind"] == "base64":
         encoded = value.split(",", 1)[1] if value.startswith("data:") and "," in value else value
@@ -358,8 +390,9 @@ def _record_to_rgba(client, record):
     elif value.startswith("data:image/"):
         content = base64.b64decode(value.split(",", 1)[1])
     else:
-        content = client.download(value)
-    return Image.open(io.BytesIO(content)).convert("RGBA")
+        content = await client.download(value)
+    with span("decode", bytes=len(content)):
+        return await asyncio.to_thread(lambda: Image.open(io.BytesIO(content)).convert("RGBA"))
 
 
 def _resize_rgba(image, size):
@@ -452,48 +485,49 @@ def _alpha_crop(image):
     return rgba.crop((int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1))
 
 
-def _match_layer_to_reference(image, record, reference):
-    """Place a cropped RGBA layer back onto its source-image canvas."""
-    canvas_size = reference.size
-    cropped = _alpha_crop(image)
-    if cropped is None:
-        return Image.new("RGBA", canvas_size, (0, 0, 0, 0)), [0, 0, 0, 0], None, "透明图层为空"
+class _ReferenceFeatures:
+    """Per-decomposition view of the input image shared by every layer's placement search.
 
-    try:
-        import cv2
-    except ImportError:
-        fallback, placement, warning = _full_canvas_layer(image, record, canvas_size)
-        return fallback, placement, None, f"缺少 OpenCV，PSD使用普通定位；{warning}".rstrip("；")
+    The LAB conversion and the downscaled search copy depend only on the input
+    image, so they are computed once instead of once per layer.  ``lab`` is
+    ``None`` when OpenCV is not installed.
+    """
 
-    source_rgb = np.asarray(reference.convert("RGB"), dtype=np.uint8)
-    layer_rgb = np.asarray(cropped.convert("RGB"), dtype=np.uint8)
-    layer_alpha = np.asarray(cropped.getchannel("A"), dtype=np.uint8)
-    source_height, source_width = source_rgb.shape[:2]
-    layer_height, layer_width = layer_rgb.shape[:2]
-    max_scale = min(source_width / layer_width, source_height / layer_height)
-    if max_scale <= 0:
-        fallback, placement, warning = _full_canvas_layer(image, record, canvas_size)
-        return fallback, placement, None, f"PSD定位尺寸无效；{warning}".rstrip("；")
+    def __init__(self, reference):
+        self.size = reference.size
+        self.lab = None
+        self.search = None
+        self.search_factor = min(1.0, PSD_SEARCH_EDGE / max(self.size))
+        self.search_size = (
+            max(1, int(round(self.size[0] * self.search_factor))),
+            max(1, int(round(self.size[1] * self.search_factor))),
+        )
+        try:
+            import cv2
+        except ImportError:
+            return
+        source_rgb = np.asarray(reference.convert("RGB"), dtype=np.uint8)
+        self.lab = cv2.cvtColor(source_rgb, cv2.COLOR_RGB2LAB)
+        self.search = cv2.resize(self.lab, self.search_size, interpolation=cv2.INTER_AREA)
 
-    search_factor = min(1.0, 640.0 / max(source_width, source_height))
-    search_size = (
-        max(1, int(round(source_width * search_factor))),
-        max(1, int(round(source_height * search_factor))),
-    )
-    source_lab = cv2.cvtColor(source_rgb, cv2.COLOR_RGB2LAB)
-    layer_lab = cv2.cvtColor(layer_rgb, cv2.COLOR_RGB2LAB)
-    source_search = cv2.resize(source_lab, search_size, interpolation=cv2.INTER_AREA)
-    min_scale = min(max_scale, max(0.08, 48.0 / max(layer_width, layer_height)))
-    if max_scale / max(min_scale, 1e-6) < 1.01:
-        coarse_scales = np.array([max_scale], dtype=np.float64)
-    else:
-        coarse_scales = np.geomspace(min_scale, max_scale, num=48)
-    if min_scale <= 1.0 <= max_scale:
-        coarse_scales = np.unique(np.append(coarse_scales, 1.0))
 
-    best_score = -1.0
-    best_scale = None
-    for scale in coarse_scales:
+def _box_scale_prior(record, native_size, canvas_size, reference_size):
+    """Layer scale implied by the relay's bounding_box, in reference-image pixels."""
+    if canvas_size is None:
+        return None
+    box = _bounding_box(record, canvas_size)
+    if box is None:
+        return None
+    box_width = (box[2] - box[0]) * reference_size[0] / canvas_size[0]
+    box_height = (box[3] - box[1]) * reference_size[1] / canvas_size[1]
+    # 与 _full_canvas_layer 一致：原始图层按比例放进坐标框
+    return min(box_width / native_size[0], box_height / native_size[1])
+
+
+def _search_scales(cv2, source_search, layer_lab, layer_alpha, search_factor, scales, best):
+    """Run masked template matching at each scale; keep (score, scale, location) of the best hit."""
+    layer_height, layer_width = layer_lab.shape[:2]
+    for scale in scales:
         width = max(4, int(round(layer_width * float(scale) * search_factor)))
         height = max(4, int(round(layer_height * float(scale) * search_factor)))
         if width > source_search.shape[1] or height > source_search.shape[0]:
@@ -508,36 +542,76 @@ def _match_layer_to_reference(image, record, reference):
         if int(np.count_nonzero(mask)) < 32:
             continue
         result = cv2.matchTemplate(source_search, template, cv2.TM_CCOEFF_NORMED, mask=mask)
-        _, score, _, _ = cv2.minMaxLoc(result)
-        if np.isfinite(score) and score > best_score:
-            best_score = float(score)
-            best_scale = float(scale)
-
-    if best_scale is None or best_score < 0.25:
-        fallback, placement, warning = _full_canvas_layer(image, record, canvas_size)
-        score_text = "无有效结果" if best_scale is None else f"匹配分数{best_score:.3f}过低"
-        return fallback, placement, best_score if best_scale is not None else None, f"PSD自动定位{score_text}；{warning}".rstrip("；")
-
-    refine_low = max(min_scale, best_scale * 0.94)
-    refine_high = min(max_scale, best_scale * 1.06)
-    refine_scales = np.linspace(refine_low, refine_high, num=13)
-    for scale in refine_scales:
-        width = max(4, int(round(layer_width * float(scale) * search_factor)))
-        height = max(4, int(round(layer_height * float(scale) * search_factor)))
-        if width > source_search.shape[1] or height > source_search.shape[0]:
-            continue
-        template = cv2.resize(
-            layer_lab,
-            (width, height),
-            interpolation=cv2.INTER_AREA,
-        )
-        mask = cv2.resize(layer_alpha, (width, height), interpolation=cv2.INTER_AREA)
-        mask = np.where(mask > 24, 255, 0).astype(np.uint8)
-        result = cv2.matchTemplate(source_search, template, cv2.TM_CCOEFF_NORMED, mask=mask)
-        _, score, _, _ = cv2.minMaxLoc(result)
-        if np.isfinite(score) and score > best_score:
-            best_score = float(score)
-            best_scale = float(scale)
+        _, score, _, location = cv2.minMaxLoc(result)
+        if np.isfinite(score) and (best is None or score > best[0]):
+            best = (float(score), float(scale), location)
+    return best
+
+
+def _match_layer_to_reference(image, record, features, canvas_size=None):
+    """Place a cropped RGBA layer back onto its source-image canvas.
+
+    Coarse-to-fine search: scale and position are estimated on a <=640 px copy
+    of the reference (narrowed by the layer's bounding_box when the relay
+    returns one), then a full-resolution match runs only in a small window
+    around the coarse hit instead of over the whole canvas.  ``features`` is the
+    shared ``_ReferenceFeatures`` of the input image; ``canvas_size`` is the
+    base image size that bounding_box coordinates refer to.
+    """
+    reference_size = features.size
+    cropped = _alpha_crop(image)
+    if cropped is None:
+        return Image.new("RGBA", reference_size, (0, 0, 0, 0)), [0, 0, 0, 0], None, "透明图层为空"
+
+    if features.lab is None:
+        fallback, placement, warning = _full_canvas_layer(image, record, reference_size)
+        return fallback, placement, None, f"缺少 OpenCV，PSD使用普通定位；{warning}".rstrip("；")
+    import cv2
+
+    layer_rgb = np.asarray(cropped.convert("RGB"), dtype=np.uint8)
+    layer_alpha = np.asarray(cropped.getchannel("A"), dtype=np.uint8)
+    source_width, source_height = reference_size
+    layer_height, layer_width = layer_rgb.shape[:2]
+    max_scale = min(source_width / layer_width, source_height / layer_height)
+    if max_scale <= 0:
+        fallback, placement, warning = _full_canvas_layer(image, record, reference_size)
+        return fallback, placement, None, f"PSD定位尺寸无效；{warning}".rstrip("；")
+
+    search_factor = features.search_factor
+    search_size = features.search_size
+    source_lab = features.lab
+    source_search = features.search
+    layer_lab = cv2.cvtColor(layer_rgb, cv2.COLOR_RGB2LAB)
+    min_scale = min(max_scale, max(0.08, 48.0 / max(layer_width, layer_height)))
+
+    best = None
+    prior = _box_scale_prior(record, image.size, canvas_size, reference_size)
+    if prior is not None:
+        low = max(min_scale, prior / PSD_PRIOR_SPAN)
+        high = min(max_scale, prior * PSD_PRIOR_SPAN)
+        if low <= high:
+            prior_scales = np.geomspace(low, high, num=PSD_PRIOR_SCALES) if high / low >= 1.01 else [high]
+            best = _search_scales(cv2, source_search, layer_lab, layer_alpha, search_factor, prior_scales, best)
+    if best is None or best[0] < PSD_MIN_SCORE:
+        # 没有坐标框或坐标框附近匹配不可靠时，回到全尺度扫描
+        if max_scale / max(min_scale, 1e-6) < 1.01:
+            coarse_scales = np.array([max_scale], dtype=np.float64)
+        else:
+            coarse_scales = np.geomspace(min_scale, max_scale, num=PSD_COARSE_SCALES)
+        if min_scale <= 1.0 <= max_scale:
+            coarse_scales = np.unique(np.append(coarse_scales, 1.0))
+        best = _search_scales(cv2, source_search, layer_lab, layer_alpha, search_factor, coarse_scales, best)
+
+    if best is None or best[0] < PSD_MIN_SCORE:
+        fallback, placement, warning = _full_canvas_layer(image, record, reference_size)
+        score_text = "无有效结果" if best is None else f"匹配分数{best[0]:.3f}过低"
+        return fallback, placement, best[0] if best is not None else None, f"PSD自动定位{score_text}；{warning}".rstrip("；")
+
+    refine_low = max(min_scale, best[1] * 0.94)
+    refine_high = min(max_scale, best[1] * 1.06)
+    refine_scales = np.linspace(refine_low, refine_high, num=PSD_REFINE_SCALES)
+    best = _search_scales(cv2, source_search, layer_lab, layer_alpha, search_factor, refine_scales, best)
+    best_score, best_scale, coarse_location = best
 
     target_size = (
         min(source_width, max(1, int(round(layer_width * best_scale)))),
@@ -547,12 +621,24 @@ def _match_layer_to_reference(image, record, reference):
     template_lab = cv2.cvtColor(np.asarray(target_layer.convert("RGB"), dtype=np.uint8), cv2.COLOR_RGB2LAB)
     template_alpha = np.asarray(target_layer.getchannel("A"), dtype=np.uint8)
     full_mask = np.where(template_alpha > 24, 255, 0).astype(np.uint8)
-    result = cv2.matchTemplate(source_lab, template_lab, cv2.TM_CCOEFF_NORMED, mask=full_mask)
+
+    # 全分辨率只在粗定位附近的小窗口里匹配；窗口余量覆盖缩放取整带来的误差
+    margin = int(np.ceil(PSD_WINDOW_MARGIN / search_factor))
+    estimate_left = int(round(coarse_location[0] * source_width / search_size[0]))
+    estimate_top = int(round(coarse_location[1] * source_height / search_size[1]))
+    window_left = max(0, min(source_width - target_size[0], estimate_left - margin))
+    window_top = max(0, min(source_height - target_size[1], estimate_top - margin))
+    window_right = min(source_width, estimate_left + target_size[0] + margin)
+    window_bottom = min(source_height, estimate_top + target_size[1] + margin)
+    window_right = max(window_right, window_left + target_size[0])
+    window_bottom = max(window_bottom, window_top + target_size[1])
+    window = source_lab[window_top:window_bottom, window_left:window_right]
+    result = cv2.matchTemplate(window, template_lab, cv2.TM_CCOEFF_NORMED, mask=full_mask)
     _, full_score, _, location = cv2.minMaxLoc(result)
     if np.isfinite(full_score):
         best_score = float(full_score)
-    left, top = int(location[0]), int(location[1])
-    canvas = Image.new("RGBA", canvas_size, (0, 0, 0, 0))
+    left, top = window_left + int(location[0]), window_top + int(location[1])
+    canvas = Image.new("RGBA", reference_size, (0, 0, 0, 0))
     canvas.alpha_composite(target_layer, (left, top))
     placement = [left, top, left + target_layer.width, top + target_layer.height]
     return canvas, placement, best_score, ""
@@ -570,6 +656,40 @@ def _pil_to_rgba_tensor(image):
     return torch.from_numpy(rgba.astype(np.float32) / 255.0).unsqueeze(0)
 
 
+def _place_layer(native_rgba, record, canvas_size, features):
+    """CPU half of one layer: bounding-box canvas, PSD placement and tensors."""
+    canvas_rgba, placement, warning = _full_canvas_layer(native_rgba, record, canvas_size)
+    psd_canvas_rgba, psd_placement, psd_match_score, psd_warning = _match_layer_to_reference(
+        native_rgba,
+        record,
+        features,
+        canvas_size,
+    )
+    image, mask = _pil_to_image_and_mask(canvas_rgba)
+    return {
+        "native": native_rgba,
+        "image": image,
+        "mask": mask,
+        "placement": placement,
+        "warning": warning,
+        "psd_image": psd_canvas_rgba,
+        "psd_placement": psd_placement,
+        "psd_match_score": psd_match_score,
+        "psd_warning": psd_warning,
+    }
+
+
+async def _download_and_place_layer(client, record, base_task, features, download_limit, placement_limit):
+    async with download_limit:
+        native_rgba = await _record_to_rgba(client, record)
+    # 普通图层画布与基础图同尺寸，基础图在并发下载中，这里等它完成即可
+    canvas_size = (await base_task).size
+    # OpenCV 模板匹配会释放 GIL，多个图层可以在线程中真正并行。
+    async with placement_limit:
+        with span("place"):
+            return await asyncio.to_thread(_place_layer, native_rgba, record, canvas_size, features)
+
+
 def _z_index(record, fallback):
     value = record.get("z_index")
     if isinstance(value, bool):
@@ -641,10 +761,8 @@ class DapaoSeedreamV5ProLayerDecompositionNode:
     CATEGORY = NODE_CATEGORY
     DESCRIPTION = "使用 seedream-v5-pro/layer-decomposition 将单张图像拆成背景与最多16个透明图层 @炮老师的小课堂"
 
+    @timed_execution
     async def decompose(self, **kwargs):
-        return await asyncio.to_thread(self._decompose_sync, **kwargs)
-
-    def _decompose_sync(self, **kwargs):
         api_key = str(kwargs.get("🔑 API密钥") or "").strip()
         model_id = str(kwargs.get("🤖 模型") or MODEL_ID)
         image_tensor = kwargs.get("🖼️ 待拆分图像")
@@ -659,6 +777,7 @@ class DapaoSeedreamV5ProLayerDecompositionNode:
         submitted = {}
         final = {}
         started = time.time()
+        usage = UsageRecord("dapaoai", NODE_NAME, MODEL_ID, size_label)
 
         try:
             if not api_key:
@@ -672,8 +791,9 @@ class DapaoSeedreamV5ProLayerDecompositionNode:
             if format_label not in OUTPUT_FORMATS:
                 raise ValueError(f"不支持的基础图格式：{format_label}")
 
-            image_data, input_width, input_height = _tensor_to_png_data_uri(image_tensor)
-            input_reference = _tensor_to_rgb_image(image_tensor)
+            with span("encode"):
+                image_data, input_width, input_height = await asyncio.to_thread(_tensor_to_png_data_uri, image_tensor)
+                input_reference = await asyncio.to_thread(_tensor_to_rgb_image, image_tensor)
             payload = {
                 "model": MODEL_ID,
                 "prompt": effective_prompt,
@@ -688,19 +808,21 @@ class DapaoSeedreamV5ProLayerDecompositionNode:
                 f"input={input_width}x{input_height}，size={payload['size']}"
             )
             client = DapaoSeedreamLayerClient(api_key, timeout)
-            submitted = client.generate(payload)
+            submitted = await client.generate(payload)
             final = submitted
             records = _extract_output_records(final)
             task_identifier = _task_id(submitted)
+            usage.submitted(task_identifier)
             state, _, _ = _task_state(submitted)
             if not records and task_identifier and state in {"", "processing"}:
-                final = client.poll(task_identifier, max_poll_seconds, poll_interval)
+                final = await client.poll(task_identifier, max_poll_seconds, poll_interval)
                 records = _extract_output_records(final)
             if not records:
                 raise RuntimeError(
                     "任务完成但没有找到基础图和透明图层："
                     + json.dumps(_sanitized_result(final), ensure_ascii=False)[:1600]
                 )
+            usage.succeeded()
 
             indexed_records = list(enumerate(records))
             indexed_records.sort(key=lambda item: _z_index(item[1], item[0]))
@@ -710,25 +832,47 @@ class DapaoSeedreamV5ProLayerDecompositionNode:
             if not layer_records:
                 raise RuntimeError("模型只返回了基础图，没有返回可拆分图层；请调整图片或拆分要求后重试。")
 
-            base_rgba = _record_to_rgba(client, base_record)
+            # 基础图与所有图层并发下载；每层下载完成后立即在线程池中定位，
+            # 下载与定位流水线重叠，总耗时接近最慢的单个图层。
+            download_limit = asyncio.Semaphore(MAX_PARALLEL_LAYER_DOWNLOADS)
+            placement_limit = asyncio.Semaphore(MAX_PARALLEL_LAYER_PLACEMENTS)
+            base_task = asyncio.ensure_future(_record_to_rgba(client, base_record))
+            try:
+                # 输入图的 LAB 与搜索缩略图只算一次，所有图层共用
+                with span("place"):
+                    reference_features = await asyncio.to_thread(_ReferenceFeatures, input_reference)
+                placed_layers = await asyncio.gather(*(
+                    _download_and_place_layer(
+                        client,
+                        record,
+                        base_task,
+                        reference_features,
+                        download_limit,
+                        placement_limit,
+                    )
+                    for record in layer_records
+                ))
+                base_rgba = await base_task
+            finally:
+                if not base_task.done():
+                    base_task.cancel()
             base_image, _ = _pil_to_image_and_mask(base_rgba)
             canvas_size = base_rgba.size
             layer_images = []
             layer_masks = []
             layer_details = []
             psd_layer_items = []
-            for index, record in enumerate(layer_records, start=1):
-                native_rgba = _record_to_rgba(client, record)
-                canvas_rgba, placement, warning = _full_canvas_layer(native_rgba, record, canvas_size)
-                psd_canvas_rgba, psd_placement, psd_match_score, psd_warning = _match_layer_to_reference(
-                    native_rgba,
-                    record,
-                    input_reference,
-                )
-                image, mask = _pil_to_image_and_mask(canvas_rgba)
-                layer_images.append(image)
-                layer_masks.append(mask)
-                psd_layer_items.append({"record": record, "image": psd_canvas_rgba})
+            # gather 保持输入顺序，图层仍按 z_index 排列
+            for index, (record, placed) in enumerate(zip(layer_records, placed_layers), start=1):
+                native_rgba = placed["native"]
+                placement = placed["placement"]
+                warning = placed["warning"]
+                psd_placement = placed["psd_placement"]
+                psd_match_score = placed["psd_match_score"]
+                psd_warning = placed["psd_warning"]
+                layer_images.append(placed["image"])
+                layer_masks.append(placed["mask"])
+                psd_layer_items.append({"record": record, "image": placed["psd_image"]})
                 layer_details.append({
                     "batch_index": index - 1,
                     "z_index": _z_index(record, index),
@@ -771,7 +915,8 @@ class DapaoSeedreamV5ProLayerDecompositionNode:
                 f"🗂️ 返回结果：1张基础图 + {len(layer_records)}个透明图层\n"
                 f"📄 PSD画布：{input_reference.width}x{input_reference.height}，图层已按输入原图自动定位\n"
                 "🔌 PSD输出：请将“PSD透明图层批次”连接到“🐋保存为PSD”节点\n"
-                f"⏱️ 耗时：{elapsed:.2f}秒\n\n"
+                f"⏱️ 耗时：{elapsed:.2f}秒\n"
+                f"{execution_summary()}\n\n"
                 + json.dumps(
                     {
                         "layers": layer_details,
@@ -785,6 +930,7 @@ class DapaoSeedreamV5ProLayerDecompositionNode:
             )
             return base_image, layers_tensor, masks_tensor, "\n".join(urls), info, psd_layers_tensor
         except Exception as error:
+            usage.failed(error)
             message = f"❌ Seedream-v5-pro 图层拆分失败：{error}"
             _log_error(message)
             _log_error(traceback.format_exc())
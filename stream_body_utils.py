@@ -0,0 +1,203 @@
+"""Request bodies that are produced while they are sent.
+
+Multimodal chat payloads carry media as base64 strings.  Building the raw
+bytes, then the base64 string, then the JSON text and finally its encoded
+bytes keeps four copies of every video or audio clip alive at once.
+``StreamingJSONBody`` serializes the payload once with ``InlineMedia``
+placeholders left in place and base64-encodes each placeholder chunk by chunk
+while the body is read, so a request stays close to its raw media size.
+
+Bodies are seekable file objects with a fixed length: ``requests`` sends them
+with a Content-Length (pass ``data=body``), ``request_with_retry`` rewinds them
+between attempts and ``async_http_utils.request`` streams them through aiohttp.
+"""
+
+import base64
+import io
+import json
+import os
+import re
+import uuid
+
+
+class SegmentedBody(io.RawIOBase):
+    """Read-only, seekable concatenation of byte strings and lazy segments.
+
+    A lazy segment implements ``__len__`` and ``read_at(offset, count)``.
+    """
+
+    content_type = "application/octet-stream"
+
+    def __init__(self, segments):
+        super().__init__()
+        self._segments = [segment for segment in segments if len(segment)]
+        self._length = sum(len(segment) for segment in self._segments)
+        self._position = 0
+
+    def __len__(self):
+        return self._length
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._length
+        self._position = max(0, min(offset, self._length))
+        return self._position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length - self._position
+        chunks = []
+        start = 0
+        for segment in self._segments:
+            end = start + len(segment)
+            if size <= 0:
+                break
+            if self._position < end:
+                offset = self._position - start
+                count = min(size, end - self._position)
+                if isinstance(segment, (bytes, bytearray, memoryview)):
+                    chunk = bytes(segment[offset:offset + count])
+                else:
+                    chunk = segment.read_at(offset, count)
+                chunks.append(chunk)
+                self._position += len(chunk)
+                size -= len(chunk)
+            start = end
+        return b"".join(chunks)
+
+    def readinto(self, buffer):
+        chunk = self.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+class _StreamSegment:
+    """``size`` bytes of a seekable stream, starting at its current position."""
+
+    def __init__(self, stream, size):
+        self._stream = stream
+        self._start = stream.tell()
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    def read_at(self, offset, count):
+        self._stream.seek(self._start + offset)
+        chunk = self._stream.read(count)
+        if len(chunk) < count:
+            raise ValueError("上传过程中素材文件被截断。")
+        return chunk
+
+
+class InlineMedia:
+    """Placeholder for a base64 string inside a ``StreamingJSONBody`` payload.
+
+    ``content`` is bytes or a seekable binary stream.  With ``data_uri`` the
+    value is rendered as ``data:<mime>;base64,...``, otherwise as bare base64.
+    """
+
+    def __init__(self, content, mime_type="application/octet-stream", data_uri=True):
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            self._source = memoryview(content)
+            self.size = len(self._source)
+        else:
+            position = content.tell()
+            self.size = content.seek(0, os.SEEK_END) - position
+            content.seek(position)
+            self._source = _StreamSegment(content, self.size)
+        self.mime_type = mime_type
+        self._prefix = f"data:{mime_type};base64,".encode("ascii") if data_uri else b""
+
+    def __len__(self):
+        return len(self._prefix) + (self.size + 2) // 3 * 4
+
+    def __repr__(self):
+        return f"<InlineMedia {self.mime_type} {self.size} bytes>"
+
+    def _raw(self, start, end):
+        if isinstance(self._source, memoryview):
+            return self._source[start:end]
+        return self._source.read_at(start, end - start)
+
+    def read_at(self, offset, count):
+        chunks = []
+        if offset < len(self._prefix):
+            chunks.append(self._prefix[offset:offset + count])
+            count -= len(chunks[0])
+            offset = len(self._prefix)
+        if count > 0:
+            # base64 以 3 字节为一组编码为 4 个字符，按组对齐后截取所需区间
+            position = offset - len(self._prefix)
+            first_group = position // 4
+            last_group = (position + count + 3) // 4
+            raw = self._raw(first_group * 3, min(self.size, last_group * 3))
+            encoded = base64.b64encode(raw)
+            skip = position - first_group * 4
+            chunks.append(encoded[skip:skip + count])
+        return b"".join(chunks)
+
+
+class StreamingJSONBody(SegmentedBody):
+    """JSON request body whose ``InlineMedia`` values are base64-encoded on read."""
+
+    content_type = "application/json"
+
+    def __init__(self, payload, **dumps_kwargs):
+        token = uuid.uuid4().hex
+        media = []
+
+        def _placeholder(value):
+            if isinstance(value, InlineMedia):
+                media.append(value)
+                return f"{token}:{len(media) - 1}"
+            raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+        text = json.dumps(payload, default=_placeholder, **dumps_kwargs)
+        parts = re.split(rf"{token}:(\d+)", text)
+        segments = []
+        for index, part in enumerate(parts):
+            segments.append(media[int(part)] if index % 2 else part.encode("utf-8"))
+        super().__init__(segments)
+        self.media_count = len(media)
+
+
+class MultipartFileBody(SegmentedBody):
+    """``multipart/form-data`` body that reads the file part from a stream on demand.
+
+    Pass it as ``data=`` with ``content_type`` as the Content-Type header.
+    """
+
+    def __init__(self, field_name, filename, stream, size, mime_type, fields=None):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        head = b""
+        for name, value in (fields or {}).items():
+            head += (
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n"
+            ).encode("utf-8")
+        head += (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field_name}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: {mime_type}\r\n\r\n"
+        ).encode("utf-8")
+        tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+        super().__init__([head, _StreamSegment(stream, size), tail])
+
+
+__all__ = [
+    "InlineMedia",
+    "MultipartFileBody",
+    "SegmentedBody",
+    "StreamingJSONBody",
+]
@@ -34,7 +34,8 @@ import numpy as np
 from PIL import Image
 from typing import Tuple, Optional
 
-from .gemini3_client import encode_image_tensor
+from .gemini3_client import encode_image_tensor, run_async
+from .stream_body_utils import InlineMedia, StreamingJSONBody
 from .gemini3_file_client import GeminiFileClient, save_audio_to_file
 
 # 尝试导入 Google 官方 SDK（可选）
@@ -350,7 +351,8 @@ class UniversalAPINode:
                     # 直接读取文件并编码为 base64
                     with open(audio_path, 'rb') as f:
                         audio_data = f.read()
-                    audio_base64 = base64.b64encode(audio_data).decode('utf-8')
+                    # base64 在发送请求体时分块编码，避免整段字符串常驻内存
+                    audio_base64 = InlineMedia(audio_data, data_uri=False)
                     
                     # 获取文件扩展名
                     ext = os.path.splitext(audio_path)[1].lower()
@@ -568,7 +570,7 @@ class UniversalAPINode:
                     # JSON 请求
                     response = requests.post(
                         api_url,
-                        json=body_data,
+                        data=StreamingJSONBody(body_data),
                         params=params,
                         headers=headers,
                         timeout=timeout
@@ -586,7 +588,7 @@ class UniversalAPINode:
                 else:
                     response = requests.put(
                         api_url,
-                        json=body_data,
+                        data=StreamingJSONBody(body_data),
                         params=params,
                         headers=headers,
                         timeout=timeout
@@ -894,26 +896,20 @@ class UniversalAPINode:
         if audio is not None:
             print(f"[dapaoAPI-Universal] 处理音频")
             try:
-                import asyncio
                 # 保存音频为临时文件
                 temp_audio_path = save_audio_to_file(audio)
                 print(f"[dapaoAPI-Universal] 音频保存到: {temp_audio_path}")
                 
-                # 使用 File API 上传
+                # 使用 File API 上传（在共享后台事件循环中执行）
                 file_client = GeminiFileClient(api_key, "google")
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    file_uri = loop.run_until_complete(file_client.upload_file(temp_audio_path))
-                    parts.append({
-                        "file_data": {
-                            "mime_type": "audio/wav",
-                            "file_uri": file_uri
-                        }
-                    })
-                    print(f"[dapaoAPI-Universal] 音频上传成功: {file_uri}")
-                finally:
-                    loop.close()
+                file_uri = run_async(file_client.upload_file(temp_audio_path))
+                parts.append({
+                    "file_data": {
+                        "mime_type": "audio/wav",
+                        "file_uri": file_uri
+                    }
+                })
+                print(f"[dapaoAPI-Universal] 音频上传成功: {file_uri}")
                 
                 # 清理临时文件
                 try:
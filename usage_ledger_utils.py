@@ -0,0 +1,232 @@
+"""Append-only usage ledger for tasks submitted by dapaoAPI nodes.
+
+Node status text shows cost and upstream duration once and then it is gone.
+Every task the upstream accepted is appended as one row to a SQLite database,
+``dapao_usage_ledger.db`` beside this file: provider, node, model, channel,
+task ID, cost, upstream duration, local wall time, the local overhead between
+the two, and the outcome.  Set ``DAPAO_USAGE_LEDGER`` to another path, or to
+``0`` to turn the ledger off.
+
+Nodes open a ``UsageRecord`` before submitting, call ``submitted(task_id)``
+once the upstream accepted the task and finish with ``succeeded`` or
+``failed``.  ``aggregate`` groups the history per day, model and so on; it
+backs the ``/dapao/usage`` route.  Ledger errors are logged, never raised.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+
+LEDGER_ENV = "DAPAO_USAGE_LEDGER"
+DEFAULT_LEDGER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dapao_usage_ledger.db")
+
+GROUP_COLUMNS = ("day", "provider", "node", "model", "channel", "api_channel", "outcome")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    node TEXT NOT NULL,
+    model TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL DEFAULT '',
+    api_channel TEXT NOT NULL DEFAULT '',
+    task_id TEXT NOT NULL,
+    cost REAL,
+    upstream_seconds REAL,
+    elapsed_seconds REAL,
+    overhead_seconds REAL,
+    outcome TEXT NOT NULL,
+    error TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS usage_day ON usage (day);
+CREATE INDEX IF NOT EXISTS usage_task ON usage (task_id);
+"""
+
+
+def _log_error(message):
+    print(f"[dapaoAPI-用量账本] 错误：{message}")
+
+
+def _number(value):
+    try:
+        number = float(str(value).strip().lstrip("¥"))
+    except (TypeError, ValueError):
+        return None
+    return number if number == number else None
+
+
+class UsageLedger:
+    """SQLite table of submitted tasks; rows are only ever inserted."""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection = None
+        self._disabled = False
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = os.environ.get(LEDGER_ENV, "").strip() or DEFAULT_LEDGER_PATH
+        return self._path
+
+    def _connect(self):
+        if self._connection is None and not self._disabled:
+            if self.path == "0":
+                self._disabled = True
+                return None
+            try:
+                connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+                # WAL 模式下多个 ComfyUI 进程可以同时追加和查询
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                connection.executescript(_SCHEMA)
+                self._connection = connection
+            except sqlite3.Error as e:
+                _log_error(f"无法打开用量账本 {self.path}，本次运行不再记录：{e}")
+                self._disabled = True
+        return self._connection
+
+    def append(
+        self,
+        provider,
+        node,
+        task_id,
+        outcome,
+        model="",
+        channel="",
+        api_channel="",
+        cost=None,
+        upstream_seconds=None,
+        elapsed_seconds=None,
+        error="",
+    ):
+        """Insert one task row; ``cost`` and ``upstream_seconds`` may be API strings."""
+        cost = _number(cost)
+        upstream_seconds = _number(upstream_seconds)
+        overhead_seconds = None
+        if upstream_seconds is not None and elapsed_seconds is not None:
+            overhead_seconds = max(0.0, elapsed_seconds - upstream_seconds)
+        now = time.time()
+        row = (
+            now,
+            time.strftime("%Y-%m-%d", time.localtime(now)),
+            provider,
+            node,
+            str(model or ""),
+            str(channel or ""),
+            str(api_channel or ""),
+            str(task_id),
+            cost,
+            upstream_seconds,
+            elapsed_seconds,
+            overhead_seconds,
+            outcome,
+            str(error or "")[:500],
+        )
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+            try:
+                with connection:
+                    connection.execute(
+                        "INSERT INTO usage (created_at, day, provider, node, model, channel, api_channel, task_id, "
+                        "cost, upstream_seconds, elapsed_seconds, overhead_seconds, outcome, error) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        row,
+                    )
+            except sqlite3.Error as e:
+                _log_error(f"写入用量账本失败（taskId={task_id}）：{e}")
+
+    def _query(self, sql, params):
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return []
+            cursor = connection.execute(sql, params)
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, values)) for values in cursor.fetchall()]
+
+    def aggregate(self, group_by=("day", "model"), days=30, provider=None):
+        """Task counts, cost and average durations per ``group_by`` over the last ``days`` days."""
+        columns = [column for column in group_by if column in GROUP_COLUMNS]
+        if not columns:
+            raise ValueError(f"分组字段必须是 {', '.join(GROUP_COLUMNS)} 之一")
+        since = time.strftime("%Y-%m-%d", time.localtime(time.time() - max(0, int(days) - 1) * 86400))
+        where = "day >= ?"
+        params = [since]
+        if provider:
+            where += " AND provider = ?"
+            params.append(provider)
+        group = ", ".join(columns)
+        return self._query(
+            f"SELECT {group}, COUNT(*) AS tasks, "
+            "SUM(outcome = 'succeeded') AS succeeded, SUM(outcome != 'succeeded') AS failed, "
+            "ROUND(SUM(cost), 4) AS cost, ROUND(AVG(upstream_seconds), 3) AS avg_upstream_seconds, "
+            "ROUND(AVG(elapsed_seconds), 3) AS avg_elapsed_seconds, "
+            "ROUND(AVG(overhead_seconds), 3) AS avg_overhead_seconds "
+            f"FROM usage WHERE {where} GROUP BY {group} ORDER BY {group}",
+            params,
+        )
+
+    def recent(self, limit=50):
+        return self._query("SELECT * FROM usage ORDER BY id DESC LIMIT ?", (max(1, int(limit)),))
+
+
+ledger = UsageLedger()
+
+
+class UsageRecord:
+    """One task's ledger row, written when it finishes after a successful submit.
+
+    Tasks that were never accepted upstream are not recorded.  Synchronous
+    relay calls that return results without a task ID are recorded with an
+    empty one.
+    """
+
+    def __init__(self, provider, node, model="", channel="", api_channel=""):
+        self.fields = {"provider": provider, "node": node, "model": model, "channel": channel, "api_channel": api_channel}
+        self.task_id = None
+        self.started = time.perf_counter()
+        self._written = False
+
+    def submitted(self, task_id=""):
+        self.task_id = str(task_id or "")
+        return self
+
+    def _write(self, outcome, **fields):
+        if self._written or self.task_id is None:
+            return
+        self._written = True
+        ledger.append(
+            task_id=self.task_id,
+            outcome=outcome,
+            elapsed_seconds=time.perf_counter() - self.started,
+            **self.fields,
+            **fields,
+        )
+
+    def succeeded(self, cost=None, upstream_seconds=None):
+        self._write("succeeded", cost=cost, upstream_seconds=upstream_seconds)
+
+    def failed(self, error=""):
+        self._write("failed", error=error)
+
+
+def aggregate(group_by=("day", "model"), days=30, provider=None):
+    return ledger.aggregate(group_by, days, provider)
+
+
+__all__ = [
+    "GROUP_COLUMNS",
+    "LEDGER_ENV",
+    "UsageLedger",
+    "UsageRecord",
+    "aggregate",
+    "ledger",
+]
@@ -0,0 +1,221 @@
+"""Read ComfyUI VIDEO inputs without redundant copies.
+
+Nodes used to call ``save_to`` into a fresh temp file and then ``f.read()`` the
+whole file back before uploading, even when the video already lived on disk
+(``VideoFromFile``) or in memory (a ``BytesIO`` stream).  ``open_video_source``
+resolves a VIDEO input in this order:
+
+1. an existing file path (plain strings, dicts, ``VideoFromFile`` paths);
+2. an in-memory stream the input already holds;
+3. ``save_to`` into a spooled file that stays in memory up to
+   ``SPOOL_MEMORY_LIMIT`` (or into a temp path when the caller needs one for
+   ffmpeg/OpenCV).
+
+``stream_body_utils.MultipartFileBody`` then streams a source into a
+``requests`` upload one chunk at a time instead of building the multipart body
+in memory.
+"""
+
+import os
+import tempfile
+
+
+SPOOL_MEMORY_LIMIT = 32 * 1024 * 1024
+READ_CHUNK_SIZE = 1024 * 1024
+
+_PATH_KEYS = ("file_path", "path", "filename", "file", "video_path")
+
+
+def _is_file(value):
+    return isinstance(value, str) and bool(value.strip()) and os.path.isfile(value.strip())
+
+
+def existing_video_path(video):
+    """Path of a file the VIDEO input already lives in, or ``""``."""
+    if video is None:
+        return ""
+    if isinstance(video, str):
+        return video.strip() if _is_file(video) else ""
+    if isinstance(video, dict):
+        for key in _PATH_KEYS:
+            if _is_file(video.get(key)):
+                return video[key].strip()
+        return ""
+    if isinstance(video, (list, tuple)):
+        return existing_video_path(video[0]) if video else ""
+    # ComfyUI VideoFromFile 把来源保存在私有属性里，可能是路径也可能是 BytesIO
+    if _is_file(getattr(video, "_VideoFromFile__file", None)):
+        return video._VideoFromFile__file
+    for attr in ("path", "file_path", "filename", "file"):
+        if _is_file(getattr(video, attr, None)):
+            return getattr(video, attr)
+    if hasattr(video, "get_stream_source"):
+        try:
+            source = video.get_stream_source()
+        except Exception:
+            source = None
+        if _is_file(source):
+            return source
+    return ""
+
+
+def _existing_stream(video):
+    source = getattr(video, "_VideoFromFile__file", None)
+    if source is None and hasattr(video, "get_stream_source"):
+        try:
+            source = video.get_stream_source()
+        except Exception:
+            source = None
+    if hasattr(source, "read") and hasattr(source, "seek"):
+        return source
+    return None
+
+
+class _SpoolFile(tempfile.SpooledTemporaryFile):
+    """Spooled file whose ``name`` carries the suffix, so PyAV can infer the container."""
+
+    def __init__(self, suffix):
+        super().__init__(max_size=SPOOL_MEMORY_LIMIT, suffix=suffix)
+        self._display_name = f"dapao_video{suffix}"
+
+    @property
+    def name(self):
+        return self._display_name
+
+
+class VideoSource:
+    """A resolved VIDEO input: a file path, a readable stream, or both.
+
+    Owns any spooled or temporary file it created and removes it on ``close``.
+    """
+
+    def __init__(self, path="", stream=None, temporary_path="", owns_stream=False):
+        self.path = path
+        self._stream = stream
+        self._temporary_path = temporary_path
+        self._owns_stream = owns_stream
+        self._handles = []
+
+    @property
+    def temporary(self):
+        """Whether ``path`` is a temp file this source created (and will remove)."""
+        return bool(self._temporary_path)
+
+    @property
+    def size(self):
+        if self.path:
+            return os.path.getsize(self.path)
+        position = self._stream.tell()
+        self._stream.seek(0, os.SEEK_END)
+        size = self._stream.tell()
+        self._stream.seek(position)
+        return size
+
+    def open(self):
+        """A binary stream positioned at the start; closed together with the source."""
+        if self.path:
+            handle = open(self.path, "rb")
+            self._handles.append(handle)
+            return handle
+        self._stream.seek(0)
+        return self._stream
+
+    def read_bytes(self):
+        return self.open().read()
+
+    def ensure_path(self, suffix=".mp4"):
+        """Return a file path, writing the stream to a temp file only if there is none."""
+        if self.path:
+            return self.path
+        handle = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+        with handle:
+            stream = self.open()
+            while True:
+                chunk = stream.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                handle.write(chunk)
+        self.path = self._temporary_path = handle.name
+        return self.path
+
+    def close(self):
+        for handle in self._handles:
+            handle.close()
+        self._handles = []
+        if self._owns_stream and self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        if self._temporary_path:
+            try:
+                os.remove(self._temporary_path)
+            except OSError:
+                pass
+            self._temporary_path = ""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _save_to_path(video, suffix):
+    handle = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    handle.close()
+    try:
+        saved = video.save_to(handle.name)
+        if saved is False or not os.path.isfile(handle.name) or os.path.getsize(handle.name) <= 0:
+            raise ValueError("VIDEO 输入保存失败。")
+    except Exception:
+        try:
+            os.remove(handle.name)
+        except OSError:
+            pass
+        raise
+    return VideoSource(path=handle.name, temporary_path=handle.name)
+
+
+def _save_to_spool(video, suffix):
+    spool = _SpoolFile(suffix)
+    try:
+        saved = video.save_to(spool)
+    except Exception:
+        saved = False
+    if saved is False or spool.tell() <= 0:
+        # 只接受文件路径的 save_to（多数节点自带的视频适配器）改为写临时文件
+        spool.close()
+        return None
+    return VideoSource(stream=spool, owns_stream=True)
+
+
+def open_video_source(video, need_path=False, suffix=".mp4"):
+    """Resolve a VIDEO input to a ``VideoSource``; ``None`` when it cannot be read.
+
+    With ``need_path`` the result always has a real file path, for tools such
+    as ffmpeg or OpenCV; otherwise an in-memory stream is returned as is.
+    Errors raised by ``save_to`` itself propagate.
+    """
+    path = existing_video_path(video)
+    if path:
+        return VideoSource(path=path)
+    stream = _existing_stream(video)
+    if stream is not None:
+        source = VideoSource(stream=stream)
+        if need_path:
+            source.ensure_path(suffix)
+        return source
+    if not hasattr(video, "save_to"):
+        return None
+    if not need_path:
+        source = _save_to_spool(video, suffix)
+        if source is not None:
+            return source
+    return _save_to_path(video, suffix)
+
+
+__all__ = [
+    "SPOOL_MEMORY_LIMIT",
+    "VideoSource",
+    "existing_video_path",
+    "open_video_source",
+]
@@ -26,6 +26,7 @@ import numpy as np
 import requests
 from PIL import Image, UnidentifiedImageError
 
+from .async_http_utils import CONNECTION_ERRORS, request as http_request
 from .network_error_utils import friendly_443_status, friendly_network_error
 from .image_input_utils import IMAGE_429_HINT, resize_pil_for_input
 
@@ -612,15 +613,15 @@ class VisualStyleLLMClient:
         self.api_key = api_key
         self.timeout = timeout
 
-    def chat(self, payload):
+    async def chat(self, payload):
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "User-Agent": "ComfyUI-dapaoAPI/VisualStylePrompt",
         }
         try:
-            response = requests.post(CHAT_ENDPOINT, headers=headers, json=payload, timeout=self.timeout)
-        except (requests.ConnectionError, requests.Timeout) as error:
+            response = await http_request("POST", CHAT_ENDPOINT, headers=headers, json=payload, timeout=self.timeout)
+        except CONNECTION_ERRORS as error:
             raise RuntimeError(f"{friendly_network_error(error, '提交LLM请求')} 为避免重复扣费，LLM请求不会自动重试。") from error
         if response.status_code >= 400:
             if response.status_code == 443:
@@ -829,11 +830,6 @@ class DapaoVisualStylePromptNode:
         )
 
     async def generate_prompt(self, **kwargs):
-        # ComfyUI maps list inputs to one coroutine per item.  Offloading the
-        # blocking database/network/LLM work lets those items run concurrently.
-        return await asyncio.to_thread(self._generate_prompt_sync, **kwargs)
-
-    def _generate_prompt_sync(self, **kwargs):
         llm_response = {}
         search_payload = {}
         retrieval_report = {
@@ -873,18 +869,20 @@ class DapaoVisualStylePromptNode:
             selected_domain = kwargs.get("🗂️ 视觉领域", "自动识别")
             selected_style = kwargs.get("🎨 视觉风格卡", "自动选择")
             domain, requested_card, style_context = _style_context(request_for_llm, selected_domain, selected_style)
-            user_images = self._collect_user_images(kwargs)
+            user_images = await asyncio.to_thread(self._collect_user_images, kwargs)
             archive_references = []
 
             if retrieval_report["enabled"]:
                 try:
                     wanted = int(kwargs.get("🖼️ 联网参考数量", 2))
-                    database, search_payload = _run_archive_search(request_for_llm, max(8, wanted * 4))
+                    # 档案库下载/检索与来源图片读取仍是阻塞IO，交给线程执行。
+                    database, search_payload = await asyncio.to_thread(_run_archive_search, request_for_llm, max(8, wanted * 4))
                     retrieval_report["database_ready"] = True
                     retrieval_report["database_path"] = str(database)
                     retrieval_report["exact_hits"] = len(search_payload.get("results") or [])
                     retrieval_report["related_hits"] = len(search_payload.get("related_results") or [])
-                    archive_references, checked = _prepare_archive_references(
+                    archive_references, checked = await asyncio.to_thread(
+                        _prepare_archive_references,
                         search_payload,
                         wanted,
                         min(30, max(8, int(kwargs.get("⌛ 请求超时", 300)) // 8)),
@@ -956,7 +954,7 @@ class DapaoVisualStylePromptNode:
             }
             client = VisualStyleLLMClient(api_key, int(kwargs.get("⌛ 请求超时", 300)))
             try:
-                llm_response = client.chat(payload)
+                llm_response = await client.chat(payload)
             except RuntimeError as first_error:
                 # Some mapped LLM channels are text-capable but reject archive image content.
                 # Retry only for request/media compatibility errors; never retry auth, balance,
@@ -981,7 +979,7 @@ class DapaoVisualStylePromptNode:
                         item["status"] = "来源图片读取成功，但LLM图片请求不兼容，最终未采用"
                 archive_references = []
                 payload["messages"][1]["content"] = build_content([])
-                llm_response = client.chat(payload)
+                llm_response = await client.chat(payload)
             raw_text = _extract_response_text(llm_response)
             parsed = _parse_json(raw_text)
             prompt_zh = str(parsed.get("prompt_zh") or "").strip()
@@ -0,0 +1,42 @@
+import { app } from "../../../scripts/app.js";
+import { api } from "../../../scripts/api.js";
+
+const PREWARM_EVENT = "dapao.prewarm";
+let reported = false;
+
+function describeHost(host) {
+    if (host.reachable) {
+        return `${host.name}（${host.host}）：DNS ${host.dns_ms} ms，连接 ${host.connect_ms} ms`;
+    }
+    return `${host.name}（${host.host}）：无法连接 - ${host.error}`;
+}
+
+function showReport(report) {
+    if (reported || report?.state !== "done") return;
+    reported = true;
+    const hosts = report.hosts || [];
+    console.info(`[dapaoAPI] 连接预热完成（${report.seconds} 秒）\n${hosts.map(describeHost).join("\n")}`);
+
+    const unreachable = hosts.filter((host) => !host.reachable);
+    if (!unreachable.length) return;
+    const detail = `${unreachable.map(describeHost).join("\n")}\n请检查网络、VPN/代理、防火墙和 DNS。`;
+    const toast = app.extensionManager?.toast;
+    if (toast?.add) {
+        toast.add({ severity: "warn", summary: "dapaoAPI 连接预热：部分服务暂时无法连接", detail, life: 10000 });
+    } else {
+        console.warn(`[dapaoAPI] ${detail}`);
+    }
+}
+
+app.registerExtension({
+    name: "Dapao.Prewarm.UI",
+    async setup() {
+        api.addEventListener(PREWARM_EVENT, (event) => showReport(event.detail));
+        try {
+            const response = await api.fetchApi("/dapao/prewarm");
+            if (response.ok) showReport(await response.json());
+        } catch (error) {
+            console.warn("[dapaoAPI] 读取连接预热结果失败", error);
+        }
+    },
+});
@@ -9,6 +9,7 @@ const APP_ID_WIDGET = "🆔 应用ID";
 const INSTANCE_WIDGET = "⚙️ 实例类型";
 const EXTRA_PARAMS_WIDGET = "📋 额外节点参数JSON";
 const SETUP_VERSION = 10;
+const UPLOAD_PROGRESS_EVENT = "dapao.rh_app.upload_progress";
 const PERSISTED_WIDGETS = [
     CHANNEL_WIDGET,
     API_KEY_WIDGET,
@@ -319,12 +320,24 @@ async function uploadMediaField(node, field, buttonWidget) {
     if (!file) return;
     buttonWidget.disabled = true;
     setStatus(node, `正在上传 ${field.fieldName}...`, "loading");
+    const uploadId = `${node.id}-${Date.now()}-${Math.random().toString(36).slice(2, 8)}`;
+    const onProgress = (event) => {
+        const { upload_id: id, sent, total } = event.detail || {};
+        if (id !== uploadId) return;
+        const percent = total ? ` ${Math.min(100, Math.floor((sent / total) * 100))}%` : "";
+        setStatus(node, `正在上传 ${field.fieldName}...${percent}`, "loading");
+        node.setDirtyCanvas(true, true);
+    };
     try {
+        // 文本字段必须在 file 之前，后端边接收边转发文件
         const form = new FormData();
         form.append("api_channel", apiChannel);
         form.append("api_key", apiKey);
         form.append("media_type", field.valueType);
+        form.append("upload_id", uploadId);
+        form.append("file_size", String(file.size));
         form.append("file", file, file.name);
+        api.addEventListener(UPLOAD_PROGRESS_EVENT, onProgress);
         const response = await api.fetchApi("/dapao/rh-app/upload", { method: "POST", body: form });
         const responseText = await response.text();
         let result;
@@ -347,6 +360,7 @@ async function uploadMediaField(node, field, buttonWidget) {
     } catch (error) {
         setStatus(node, `上传失败：${error?.message || error}`, "error");
     } finally {
+        api.removeEventListener(UPLOAD_PROGRESS_EVENT, onProgress);
         buttonWidget.disabled = false;
         node.setDirtyCanvas(true, true);
     }
@@ -429,6 +443,10 @@ function addParameterWidget(node, field, value) {
     return widget;
 }
 
+function schemaSummary(config) {
+    return `${config.appName || "RH应用"} · ID ${config.webappId || "-"} · ${config.schema?.length || 0} 个参数`;
+}
+
 function applySchema(node, incoming, preserveValues = true) {
     const previous = parseConfig(node);
     const sameApplication = (
@@ -461,11 +479,7 @@ function applySchema(node, incoming, preserveValues = true) {
     }
     setDynamicInputs(node, incoming.schema || []);
     bindDynamicInputsToWidgets(node, incoming.schema || []);
-    setStatus(
-        node,
-        `${incoming.appName || "RH应用"} · ID ${incoming.webappId || "-"} · ${incoming.schema?.length || 0} 个参数`,
-        "ready",
-    );
+    setStatus(node, schemaSummary(incoming), "ready");
     refreshNodeLayout(node);
     node.setDirtyCanvas(true, true);
 }
@@ -509,7 +523,13 @@ async function refreshSchema(node, manual = false) {
         const response = await api.fetchApi("/dapao/rh-app/schema", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ api_channel: apiChannel, api_key: apiKey, webapp_id: webappId }),
+            body: JSON.stringify({
+                api_channel: apiChannel,
+                api_key: apiKey,
+                webapp_id: webappId,
+                etag: applicationChanged ? "" : String(saved.etag || ""),
+                refresh: manual,
+            }),
         });
         const responseText = await response.text();
         let result;
@@ -523,6 +543,11 @@ async function refreshSchema(node, manual = false) {
         }
         if (!response.ok || result.error) throw new Error(result.error || `HTTP ${response.status}`);
         if (node._rhAppRequestId !== requestId) return;
+        if (result.unchanged) {
+            // 参数与已应用的一致，保留现有控件和连线
+            setStatus(node, schemaSummary(saved), "ready");
+            return;
+        }
         applySchema(node, result, true);
     } catch (error) {
         if (node._rhAppRequestId !== requestId) return;